@@ -41,6 +41,7 @@ setup(
     install_requires=[
         # -*- Extra requirements: -*-
         'plone.api>=1.8.4',
+        'plone.restapi',
         'Products.GenericSetup>=1.8.2',
         'setuptools',
         'z3c.jbot',
@@ -54,6 +55,15 @@ setup(
         "python-magic"
     ],
     extras_require={
+        'async': [
+            'httpx',
+        ],
+        'zstd': [
+            'zstandard',
+        ],
+        'fast': [
+            'orjson',
+        ],
         'test': [
             'plone.app.testing',
             # Plone KGS does not use this version, because it would break
@@ -74,5 +84,7 @@ setup(
     read-data= collective.plone5migration.migration.read_data:main
     find-messy-html-documents = collective.plone5migration.migration.find_messy_html_documents:main
     fix-object-ordering-after-migration = collective.plone5migration.migration.fix_object_ordering:main
+    migration-benchmark = collective.plone5migration.migration.benchmark:main
+    generate-synthetic-export = collective.plone5migration.migration.synthetic:main
     """,
 )
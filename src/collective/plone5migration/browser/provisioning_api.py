@@ -1,4 +1,6 @@
 # -*- coding: utf8 -*_
+from Acquisition import aq_base
+from Acquisition.interfaces import IAcquirer
 from BTrees.OOBTree import OOBTree
 from DateTime.DateTime import DateTime
 from OFS.interfaces import IOrderedContainer
@@ -7,6 +9,7 @@ from plone.app.theming.browser.controlpanel import ThemingControlpanel
 from plone.protect.interfaces import IDisableCSRFProtection
 from Products.CMFPlone.factory import addPloneSite
 from Products.CMFPlone.interfaces import ISelectableConstrainTypes
+from Products.CMFPlone.utils import safe_hasattr
 from Products.Five.browser import BrowserView
 from Products.Five.utilities.marker import mark
 from Products.CMFCore.WorkflowTool import IWorkflowStatus
@@ -15,6 +18,9 @@ from plone.portlets.interfaces import IPortletAssignmentMapping
 from plone.portlets.interfaces import ILocalPortletAssignmentManager
 from plone.portlets.constants import CONTEXT_CATEGORY
 from plone.contentrules.engine.interfaces import IRuleStorage
+from plone.restapi.interfaces import IDeserializeFromJson
+from plone.restapi.services.content.utils import add
+from plone.restapi.services.content.utils import create
 from zope.component import getMultiAdapter
 from zope.container.interfaces import INameChooser
 from DateTime.DateTime import DateTime
@@ -23,7 +29,10 @@ from z3c.relationfield import RelationValue
 from zope.component import createObject
 from zope.component import getUtility
 from zope.component import getMultiAdapter
+from zope.component import queryMultiAdapter
+from zope.event import notify
 from zope.interface import alsoProvides
+from zope.lifecycleevent import ObjectCreatedEvent
 from zope.intid.interfaces import IIntIds
 
 import dateutil
@@ -115,30 +124,88 @@ class API(BrowserView):
             resolve to the first `papers` folder if the second
             `papers` folder does not exist.
         """
+        if self._lookup(path) is None:
+            raise zExceptions.NotFound(path)
+        self.request.response.setStatus(200)
+
+    def _lookup(self, path):
+        """ Return object for `path` (relative to the portal) using real
+            traversal without Acquisition or None
+        """
         #        current = self.context.restrictedTraverse("/")
         current = plone.api.portal.get()
         for c in path.split("/"):
             if not c:
                 continue
-            if c in current.objectIds():
-                current = current[c]
+            # BTree based folders provide a O(log n) lookup
+            has_key = getattr(aq_base(current), "has_key", None)
+            if has_key is not None:
+                exists = has_key(c)
             else:
-                raise zExceptions.NotFound(path)
+                exists = c in current.objectIds()
+            if not exists:
+                return None
+            current = current[c]
+        return current
+
+    def inventory(self):
+        """ Return all existing objects below `path` (relative to the portal,
+            default: the whole portal) as paginated JSON:
+
+            {
+                "items": [{"path": "some/folder", "uid": "...", "portal_type": "Folder"}],
+                "total": 4711,
+                "next": 5000
+            }
+
+            `b_start` and `b_size` select the batch, `next` is the `b_start`
+            value of the next batch or null.
+        """
+
+        path = self.request.form.get("path", "").strip("/")
+        b_start = int(self.request.form.get("b_start", 0))
+        b_size = int(self.request.form.get("b_size", 5000))
+
+        portal = plone.api.portal.get()
+        portal_path = "/".join(portal.getPhysicalPath())
+        root_path = f"{portal_path}/{path}" if path else portal_path
+
+        catalog = plone.api.portal.get_tool("portal_catalog")
+        brains = catalog.unrestrictedSearchResults(path=root_path)
+        total = len(brains)
+
+        items = list()
+        for brain in brains[b_start:b_start + b_size]:
+            items.append(
+                dict(
+                    path=brain.getPath()[len(portal_path) + 1:],
+                    uid=brain.UID,
+                    portal_type=brain.portal_type,
+                )
+            )
+
+        next_start = b_start + b_size
         self.request.response.setStatus(200)
+        self.request.response.setHeader("content-type", "application/json")
+        return json.dumps(
+            dict(
+                items=items,
+                total=total,
+                next=next_start if next_start < total else None,
+            )
+        )
 
     def setuid(self):
         """ Set given `uid` on current context object """
         data = json.loads(self.request.BODY)
-        uid = data["uid"]
-        setattr(self.context, "_plone.uuid", uid)
+        self._apply_uid(self.context, data["uid"])
         self.context.reindexObject(idxs=["UID"])
         self.request.response.setStatus(204)
 
     def set_owner(self):
         """ Set owner tuple """
         data = json.loads(self.request.BODY)
-        owner = data["owner"]
-        setattr(self.context, "_owner", owner)
+        self._apply_owner(self.context, data["owner"])
         self.context.reindexObjectSecurity()
         self.request.response.setStatus(204)
 
@@ -148,25 +215,7 @@ class API(BrowserView):
         """
 
         data = json.loads(self.request.BODY)
-        review_state = data["review_state"]
-
-        wf_tool = plone.api.portal.get_tool("portal_workflow")
-        workflows = wf_tool.getWorkflowsFor(self.context.portal_type)
-        if not workflows:
-            self.request.response.setStatus(204)
-            return
-
-        wf = workflows[0]
-        wfs = getMultiAdapter((self.context, wf), IWorkflowStatus)
-
-        new_status = dict(
-                action=None,
-                actor=None,
-                comments='Set by migration',
-                review_state=review_state,
-                time=DateTime())
-        wfs.set(new_status)
-
+        self._apply_review_state(self.context, data["review_state"])
         self.context.reindexObject(idxs=["review_state"])
         self.request.response.setStatus(204)
 
@@ -201,12 +250,7 @@ class API(BrowserView):
     def set_created_modified(self):
         """ Set given `uid` on current context object """
         data = json.loads(self.request.BODY)
-        created = data["created"]
-        modified = data["modified"]
-        if created:
-            self.context.creation_date = DateTime(created)
-        if modified:
-            self.context.modification_date = DateTime(modified)
+        self._apply_created_modified(self.context, data["created"], data["modified"])
         self.context.reindexObject(idxs=["created", "modified"])
         self.request.response.setStatus(204)
 
@@ -329,9 +373,7 @@ class API(BrowserView):
         """ Set position of container object given by `id` and `position` """
 
         data = json.loads(self.request.BODY)
-        position = int(data["position"])
-        ordered = IOrderedContainer(self.context.aq_parent)
-        ordered.moveObjectToPosition(self.context.getId(), position)
+        self._apply_position_in_parent(self.context, data["position"])
         self.request.response.setStatus(204)
 
     def set_allowed_and_addable_types(self):
@@ -456,14 +498,7 @@ class API(BrowserView):
         """ Set marker interfaces on current object """
 
         data = json.loads(self.request.BODY)
-        permissions = data["permissions"]
-        for permission in permissions:
-            acquire = permissions[permission]["acquire"]
-            roles = permissions[permission]["roles"]
-            try:
-                self.context.manage_permission(permission, roles=roles, acquire=acquire)
-            except Exception as e:
-                print(f"Unable to set {permission}: {e}")
+        self._apply_permissions(self.context, data["permissions"])
         self.context.reindexObjectSecurity()
         self.request.response.setStatus(204)
 
@@ -471,24 +506,7 @@ class API(BrowserView):
         """ Set marker interfaces on current object """
 
         data = json.loads(self.request.BODY)
-        interfaces = data["interfaces"]
-
-        for iface in interfaces:
-            module_name, iface_name = iface.rsplit(".", 1)
-            try:
-                module = importlib.import_module(module_name)
-            except ImportError as e:
-                print(f"Unable to import module {module_name}")
-                raise e
-
-            iface_object = getattr(module, iface_name, None)
-            if iface_object is None:
-                raise ValueError(
-                    f"Unable to retrieve {iface_name} from module {module_name}"
-                )
-
-            mark(self.context, iface_object)
-
+        self._apply_marker_interfaces(self.context, data["interfaces"])
         self.request.response.setStatus(204)
 
     def get_indexes(self):
@@ -505,15 +523,9 @@ class API(BrowserView):
         """ Blacklist/block parent portlets """
 
         data = json.loads(self.request.BODY)
-        portlet_manager = data["portlet_manager"]
-        blacklist = data["blacklist"]
-
-        manager = getUtility(IPortletManager, name=portlet_manager)
-        blacklist = getMultiAdapter(
-            (self.context, manager), ILocalPortletAssignmentManager
+        self._apply_portlet_blacklist(
+            self.context, data["portlet_manager"], data["blacklist"]
         )
-        blacklist.setBlacklistStatus(CONTEXT_CATEGORY, blacklist)
-
         self.request.response.setStatus(204)
 
     def add_portlet(self):
@@ -578,9 +590,7 @@ class API(BrowserView):
         """ Set layout on container """
 
         data = json.loads(self.request.BODY)
-        layout = data["layout"]
-        if layout not in []:
-            self.context.setLayout(layout)
+        self._apply_layout(self.context, data["layout"])
         self.request.response.setStatus(204)
 
     def set_default_page(self):
@@ -592,6 +602,261 @@ class API(BrowserView):
 
         self.request.response.setStatus(204)
 
+    def apply_migration_metadata(self):
+        """ Apply all post-create settings of the current context object in
+            one request (and therefore in one transaction).
+
+            Example data (all keys are optional):
+
+            {
+                "owner": [["plone_portal", "acl_users"], "ajung"],
+                "layout": "listing_view",
+                "review_state": "published",
+                "local_roles": {"roles": {"ajung": ["Editor"]}, "block": false},
+                "uid": "2f1b0c...",
+                "created": "2019/05/13 11:47:28 GMT+2",
+                "modified": "2019/05/13 11:47:28 GMT+2",
+                "position": 3,
+                "interfaces": ["plone.app.layout.navigation.interfaces.INavigationRoot"],
+                "portlet_blacklist": ["plone.leftcolumn"],
+                "permissions": {"View": {"acquire": 1, "roles": ["Manager"]}}
+            }
+
+            Each setting is applied within its own savepoint. A failing setting
+            is rolled back and reported in the `errors` mapping of the JSON
+            response (setting name -> error message) without affecting the
+            other settings. The object is reindexed once at the end.
+        """
+
+        data = json.loads(self.request.BODY)
+        errors = self._apply_metadata(self.context, data)
+
+        self.request.response.setStatus(200)
+        self.request.response.setHeader("content-type", "application/json")
+        return json.dumps(dict(errors=errors))
+
+    def bulk_create(self):
+        """ Create many objects with one request (and therefore in one
+            transaction).
+
+            Example data:
+
+            {
+                "items": [
+                    {
+                        "container": "some/folder",
+                        "data": {"@type": "Document", "id": "doc", "title": "Doc"},
+                        "metadata": {"uid": "2f1b0c...", "position": 0}
+                    }
+                ]
+            }
+
+            `container` is the path relative to the portal, `data` is the
+            plone.restapi payload for creating the object and the optional
+            `metadata` is applied as with @@apply-migration-metadata.
+
+            Each item is created within its own savepoint. A failing item is
+            rolled back and reported in `errors` without aborting the batch.
+        """
+
+        data = json.loads(self.request.BODY)
+
+        created = list()
+        errors = list()
+        for index, item in enumerate(data["items"]):
+            container_path = item["container"]
+            item_data = item["data"]
+
+            savepoint = transaction.savepoint()
+            try:
+                container = self._lookup(container_path)
+                if container is None:
+                    raise zExceptions.NotFound(container_path)
+                obj = self._create_content(container, item_data)
+                metadata_errors = self._apply_metadata(obj, item.get("metadata") or {})
+            except Exception as e:
+                savepoint.rollback()
+                errors.append(
+                    dict(
+                        index=index,
+                        container=container_path,
+                        id=item_data.get("id"),
+                        error=f"{e.__class__.__name__}: {e}",
+                    )
+                )
+                continue
+
+            created.append(
+                dict(
+                    index=index,
+                    path="/".join(obj.getPhysicalPath()),
+                    uid=obj.UID(),
+                    metadata_errors=metadata_errors,
+                )
+            )
+
+        self.request.response.setStatus(200)
+        self.request.response.setHeader("content-type", "application/json")
+        return json.dumps(dict(created=created, errors=errors))
+
+    def _create_content(self, container, data):
+        """ Create a new object inside `container` like a plone.restapi POST """
+
+        data = dict(data)
+        type_ = data.pop("@type")
+        id_ = data.get("id")
+        title = data.get("title")
+
+        obj = create(container, type_, id_=id_, title=title)
+
+        # acquisition wrap temporarily (vocabularies, tools etc. used by the
+        # deserializer) and add the unwrapped object
+        temporarily_wrapped = False
+        if IAcquirer.providedBy(obj) and not safe_hasattr(obj, "aq_base"):
+            obj = obj.__of__(container)
+            temporarily_wrapped = True
+
+        deserializer = queryMultiAdapter((obj, self.request), IDeserializeFromJson)
+        deserializer(validate_all=True, data=data, create=True)
+        if temporarily_wrapped:
+            obj = aq_base(obj)
+        if not getattr(deserializer, "notifies_create", False):
+            notify(ObjectCreatedEvent(obj))
+        return add(container, obj, rename=not bool(id_))
+
+    def _apply_metadata(self, obj, data):
+        """ Apply post-create settings `data` to `obj` and return a mapping
+            of setting name -> error message for all failed settings.
+        """
+
+        # setting name -> (function, indexes to update, security reindex)
+        appliers = [
+            ("owner", lambda v: self._apply_owner(obj, v), (), True),
+            ("layout", lambda v: self._apply_layout(obj, v), (), False),
+            ("review_state", lambda v: self._apply_review_state(obj, v), ("review_state",), True),
+            ("local_roles", lambda v: self._apply_local_roles(obj, v["roles"], v.get("block", False)), (), True),
+            ("uid", lambda v: self._apply_uid(obj, v), ("UID",), False),
+            ("created", lambda v: self._apply_created_modified(obj, v, None), ("created",), False),
+            ("modified", lambda v: self._apply_created_modified(obj, None, v), ("modified",), False),
+            ("position", lambda v: self._apply_position_in_parent(obj, v), ("getObjPositionInParent",), False),
+            ("interfaces", lambda v: self._apply_marker_interfaces(obj, v), ("object_provides",), False),
+            ("portlet_blacklist", lambda v: [self._apply_portlet_blacklist(obj, m, True) for m in v], (), False),
+            ("permissions", lambda v: self._apply_permissions(obj, v), (), True),
+        ]
+
+        errors = dict()
+        idxs = set()
+        reindex_security = False
+        for name, applier, indexes, security in appliers:
+            value = data.get(name)
+            if value in (None, "", [], {}):
+                continue
+
+            savepoint = transaction.savepoint()
+            try:
+                applier(value)
+            except Exception as e:
+                savepoint.rollback()
+                errors[name] = f"{e.__class__.__name__}: {e}"
+                continue
+
+            idxs.update(indexes)
+            reindex_security = reindex_security or security
+
+        # reindex only explicit indexes: reindexObject() without `idxs`
+        # would call notifyModified() and override the `modified` date
+        if idxs:
+            obj.reindexObject(idxs=sorted(idxs))
+        if reindex_security:
+            obj.reindexObjectSecurity()
+
+        return errors
+
+    def _apply_uid(self, obj, uid):
+        setattr(obj, "_plone.uuid", uid)
+
+    def _apply_owner(self, obj, owner):
+        setattr(obj, "_owner", owner)
+
+    def _apply_layout(self, obj, layout):
+        if layout not in []:
+            obj.setLayout(layout)
+
+    def _apply_review_state(self, obj, review_state):
+        wf_tool = plone.api.portal.get_tool("portal_workflow")
+        workflows = wf_tool.getWorkflowsFor(obj.portal_type)
+        if not workflows:
+            return
+
+        wf = workflows[0]
+        wfs = getMultiAdapter((obj, wf), IWorkflowStatus)
+
+        new_status = dict(
+                action=None,
+                actor=None,
+                comments='Set by migration',
+                review_state=review_state,
+                time=DateTime())
+        wfs.set(new_status)
+
+    def _apply_local_roles(self, obj, local_roles, block=False):
+        """ Same semantics as plone.restapi @sharing: only the roles managed
+            by the sharing view are granted (not Owner, Manager, ...) and
+            `block` disables the acquisition of local roles. The security
+            reindex is done once by `_apply_metadata`.
+        """
+
+        sharing = getMultiAdapter((obj, self.request), name="sharing")
+        entries = [
+            dict(id=userid, type="user", roles=dict((role, True) for role in roles))
+            for userid, roles in local_roles.items()
+        ]
+        sharing.update_role_settings(entries, reindex=False)
+        sharing.update_inherit(not block, reindex=False)
+
+    def _apply_created_modified(self, obj, created, modified):
+        if created:
+            obj.creation_date = DateTime(created)
+        if modified:
+            obj.modification_date = DateTime(modified)
+
+    def _apply_position_in_parent(self, obj, position):
+        ordered = IOrderedContainer(obj.aq_parent)
+        ordered.moveObjectToPosition(obj.getId(), int(position))
+
+    def _apply_marker_interfaces(self, obj, interfaces):
+        for iface in interfaces:
+            module_name, iface_name = iface.rsplit(".", 1)
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError as e:
+                print(f"Unable to import module {module_name}")
+                raise e
+
+            iface_object = getattr(module, iface_name, None)
+            if iface_object is None:
+                raise ValueError(
+                    f"Unable to retrieve {iface_name} from module {module_name}"
+                )
+
+            mark(obj, iface_object)
+
+    def _apply_portlet_blacklist(self, obj, portlet_manager, status):
+        manager = getUtility(IPortletManager, name=portlet_manager)
+        assignment_manager = getMultiAdapter(
+            (obj, manager), ILocalPortletAssignmentManager
+        )
+        assignment_manager.setBlacklistStatus(CONTEXT_CATEGORY, bool(status))
+
+    def _apply_permissions(self, obj, permissions):
+        for permission in permissions:
+            acquire = permissions[permission]["acquire"]
+            roles = permissions[permission]["roles"]
+            try:
+                obj.manage_permission(permission, roles=roles, acquire=acquire)
+            except Exception as e:
+                print(f"Unable to set {permission}: {e}")
+
     def fixup(self):
         """ Last phase fixup steps """
 
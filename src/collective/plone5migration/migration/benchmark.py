@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+# Benchmark of `migration-import` against local stand-ins for Plone and
+# ArangoDB using seeded synthetic exports (or existing collective.jsonify
+# exports)
+
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shlex
+import tempfile
+import time
+
+import attrdict
+
+from . import metrics
+from .blobstore import BlobStore
+from .blobstore import externalize_blobs
+from .import_jsondump_into_arangodb import prepare_document
+from .migration_import import LOG
+from .migration_import import Migrator
+from .migration_import import get_parser
+from .migration_import import migrate
+from .skeleton import skeleton_entry
+from .skeleton import skeleton_name
+from .sources import ArangoSource
+from .standins import InMemoryDatabase
+from .standins import StandInPlone
+from .synthetic import ExportGenerator
+from .synthetic import write_records
+
+
+SITE_ID = "plone_portal"
+ROOT_ID = "benchmark"
+COLLECTION = "portal"
+
+# name -> `migration-import` options
+CONFIGURATIONS = collections.OrderedDict(
+    [
+        ("per-setting", "--per-setting-metadata --bulk-size 1"),
+        ("metadata", "--bulk-size 1"),
+        ("bulk", ""),
+        ("workers", "--bulk-size 1 --workers 4"),
+        ("null-sink", "--sink null"),
+        ("filesystem", "--bulk-size 1 --source filesystem"),
+        ("blob-store", "--bulk-size 1 --blob-store blobs --upload-threshold 65536"),
+    ]
+)
+
+
+class BenchmarkMigrator(Migrator):
+    """ Migrator reading from an in-memory ArangoDB stand-in with skeleton
+        collection (or from the export directory for --source filesystem)
+    """
+
+    def __init__(self, config, args, documents):
+        self._documents = documents
+        super().__init__(config, args)
+
+    def _connect(self):
+        if self.args.source == "filesystem":
+            return super()._connect()
+        self.client = None
+        skeleton = [skeleton_entry(document) for document in self._documents]
+        db = InMemoryDatabase(
+            {COLLECTION: self._documents, skeleton_name(COLLECTION): skeleton}
+        )
+        self.source = ArangoSource(db, COLLECTION, skeleton_name=skeleton_name(COLLECTION))
+
+
+def _config(plone_url, folder):
+    return attrdict.AttrDict(
+        plone=dict(url=plone_url, username="admin", password="admin"),
+        site=dict(
+            id=folder.split("/")[1],
+            languages=["de", "en"],
+            default_language="de",
+            extension_ids=[],
+        ),
+        arango=dict(collection=COLLECTION),
+        migration=dict(
+            folders=[folder],
+            content_types=[],
+            excluded_content_types=[],
+        ),
+    )
+
+
+def _load_export(directory, blob_store=None):
+    """ Prepared documents of the collective.jsonify export `directory` """
+
+    documents = list()
+    for dirname, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".json"):
+                fn = os.path.join(dirname, filename)
+                with open(fn, "rb") as fp:
+                    data = json.load(fp)
+                if blob_store is not None:
+                    externalize_blobs(data, blob_store)
+                documents.append(prepare_document(data, fn))
+    return documents
+
+
+def _generator(objects, seed, binary_size):
+    return ExportGenerator(
+        objects, seed=seed, site_id=SITE_ID, root_id=ROOT_ID, blob_median=binary_size
+    )
+
+
+def _documents(objects, seed, binary_size, blob_store=None):
+    """ Prepared documents of the seeded synthetic export """
+
+    generator = _generator(objects, seed, binary_size)
+    documents = list()
+    for i, data in enumerate(generator):
+        if blob_store is not None:
+            externalize_blobs(data, blob_store)
+        documents.append(prepare_document(data, f"synthetic/{i}.json"))
+    return documents
+
+
+def _write_export(objects, seed, binary_size, directory):
+    """ Write the synthetic export as collective.jsonify directory """
+    generator = _generator(objects, seed, binary_size)
+    for i in range(objects // 1000 + 1):
+        os.makedirs(os.path.join(directory, str(i)), exist_ok=True)
+    write_records(generator, directory, list(generator.structure()))
+
+
+def run_configuration(
+    name, options, plone_url, export, folder, objects, seed, binary_size, workdir, verbose=False
+):
+    """ Run one migration with the given `migration-import` options and
+        return the measurements. Must run in a fresh process (peak RSS,
+        module level caches). Without `export` the synthetic export with
+        `objects`, `seed` and `binary_size` is used.
+    """
+
+    os.chdir(workdir)
+    if not verbose:
+        LOG.setLevel(logging.WARNING)
+
+    args = get_parser().parse_args(
+        ["--config", "benchmark", "--yes", "--journal", f"{name}-journal.db"]
+        + shlex.split(options)
+    )
+    documents = list()
+    if args.source == "filesystem":
+        if not args.source_directory:
+            args.source_directory = export or os.path.join(workdir, f"{name}-export")
+            if not export:
+                _write_export(objects, seed, binary_size, args.source_directory)
+        args.source_index = f"{name}-source.db"
+    else:
+        blob_store = BlobStore(args.blob_store) if args.blob_store else None
+        if export:
+            documents = _load_export(export, blob_store)
+        else:
+            documents = _documents(objects, seed, binary_size, blob_store)
+    config = _config(plone_url, folder)
+    metrics.REGISTRY.reset()
+
+    migrator = BenchmarkMigrator(config, args, documents)
+    ts = time.time()
+    migrate(migrator, config, args)
+    duration = time.time() - ts
+
+    snapshot = metrics.REGISTRY.snapshot()["metrics"]
+    created = sum(values["count"] for values in snapshot.get("type", {}).values())
+    requests = dict(
+        (endpoint, values["count"]) for endpoint, values in snapshot.get("http", {}).items()
+    )
+    num_requests = sum(requests.values())
+
+    return dict(
+        name=name,
+        options=options,
+        objects=created,
+        duration=round(duration, 3),
+        objects_per_second=round(created / duration, 2) if duration else None,
+        requests=num_requests,
+        requests_per_object=round(num_requests / created, 2) if created else None,
+        # ru_maxrss is reported in KB on Linux
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        requests_by_endpoint=requests,
+        aql=snapshot.get("aql", {}),
+    )
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark migration-import against local Plone/ArangoDB stand-ins"
+    )
+    parser.add_argument(
+        "-n", "--objects", type=int, default=1000, help="Number of synthetic objects"
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed for the synthetic export")
+    parser.add_argument(
+        "--binary-size",
+        type=int,
+        dest="binary_size",
+        default=16384,
+        help="Median size (bytes) of synthetic files and images",
+    )
+    parser.add_argument(
+        "-e",
+        "--export",
+        help="collective.jsonify export directory to use instead of the synthetic export",
+    )
+    parser.add_argument(
+        "-f",
+        "--folder",
+        default=f"/{SITE_ID}/{ROOT_ID}",
+        help="Folder of the export to migrate (default: root of the synthetic export)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Latency (milliseconds) of the Plone stand-in per request",
+    )
+    parser.add_argument(
+        "-c",
+        "--configuration",
+        action="append",
+        dest="configurations",
+        default=[],
+        help=f"Configuration to run: one of {', '.join(CONFIGURATIONS)} or "
+        f'NAME="migration-import options" (default: all predefined configurations)',
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=datetime.datetime.now().strftime("benchmark-%Y%m%d-%H%M%S.json"),
+        help="Output file for the results (JSON)",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Log migration progress"
+    )
+    args = parser.parse_args()
+
+    configurations = collections.OrderedDict()
+    for configuration in args.configurations or CONFIGURATIONS:
+        if "=" in configuration:
+            name, options = configuration.split("=", 1)
+        elif configuration in CONFIGURATIONS:
+            name, options = configuration, CONFIGURATIONS[configuration]
+        else:
+            parser.error(f"Unknown configuration {configuration}")
+        configurations[name] = options
+
+    plone = StandInPlone(latency=args.latency / 1000).start()
+    LOG.info(f"Plone stand-in running on {plone.url}")
+
+    results = list()
+    with tempfile.TemporaryDirectory(prefix="migration-benchmark-") as workdir:
+        for name, options in configurations.items():
+            LOG.info(f"Running configuration {name} ({options or 'default options'})")
+            plone.reset()
+
+            # one fresh process per configuration (peak RSS, module level state)
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                result = executor.submit(
+                    run_configuration,
+                    name,
+                    options,
+                    plone.url,
+                    args.export and os.path.abspath(args.export),
+                    args.folder,
+                    args.objects,
+                    args.seed,
+                    args.binary_size,
+                    workdir,
+                    args.verbose,
+                ).result()
+
+            result["bytes_received_by_plone"] = plone.bytes_received
+            results.append(result)
+            LOG.info(
+                f'{name}: {result["objects"]} objects in {result["duration"]:.2f} s, '
+                f'{result["objects_per_second"]} objects/s, '
+                f'{result["requests_per_object"]} requests/object, '
+                f'peak RSS {result["peak_rss_mb"]} MB'
+            )
+
+    plone.stop()
+
+    with open(args.output, "w") as fp:
+        json.dump(
+            dict(
+                timestamp=datetime.datetime.now().isoformat(),
+                export=args.export,
+                folder=args.folder,
+                objects=args.objects,
+                seed=args.seed,
+                binary_size=args.binary_size,
+                latency_ms=args.latency,
+                results=results,
+            ),
+            fp,
+            indent=2,
+        )
+    LOG.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
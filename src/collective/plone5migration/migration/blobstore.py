@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+# Content-addressed on-disk store for the binary data (files, images) of
+# the exported objects
+
+import base64
+import contextlib
+import hashlib
+import mmap
+import os
+import threading
+
+from .uploads import base64_length
+from .uploads import iter_base64_chunks
+
+
+class BlobStore:
+    """ Binary data stored once per SHA-256 digest as
+        `<directory>/<digest[:2]>/<digest[2:4]>/<digest>`.
+        Writes are atomic, so several processes can fill the same store.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:4], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def size(self, digest):
+        return os.path.getsize(self.path(digest))
+
+    def put(self, data):
+        """ Store `data` (bytes) and return its SHA-256 digest """
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as fp:
+                fp.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    @contextlib.contextmanager
+    def open(self, digest):
+        """ The blob `digest` as read-only memory map (bytes for empty blobs) """
+
+        with open(self.path(digest), "rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    def read(self, digest, size=-1):
+        """ The first `size` bytes (default: all) of the blob `digest` """
+        with open(self.path(digest), "rb") as fp:
+            return fp.read(size)
+
+    def iter_chunks(self, digest, chunk_size):
+        with self.open(digest) as data:
+            for i in range(0, len(data), chunk_size):
+                yield data[i:i + chunk_size]
+
+
+def externalize_blobs(data, store):
+    """ Move the base64 data of all `_datafield_*` fields of the exported
+        object `data` into `store`. The fields keep `content_type` and
+        `filename` and get `sha256` and `size` instead of `data`.
+        Returns the number of base64 characters removed from `data`.
+    """
+
+    removed = 0
+    for name, field in data.items():
+        if not name.startswith("_datafield_") or not isinstance(field, dict):
+            continue
+        if field.get("data") is None:
+            continue
+        b64_data = field.pop("data")
+        binary = base64.b64decode(b64_data)
+        field["sha256"] = store.put(binary)
+        field["size"] = len(binary)
+        removed += len(b64_data)
+    return removed
+
+
+def strip_binary_data(data):
+    """ Copy of the exported object `data` without the base64 data of its
+        `_datafield_*` fields (`content_type`, `filename` etc. are kept)
+    """
+
+    data = dict(data)
+    for name, field in data.items():
+        if name.startswith("_datafield_") and isinstance(field, dict) and "data" in field:
+            field = dict(field)
+            del field["data"]
+            data[name] = field
+    return data
+
+
+def _stored(field, store):
+    if store is None:
+        raise ValueError(
+            f"Binary data {field['sha256']} is kept in a blob store but no blob store is configured"
+        )
+    return store
+
+
+def field_size(field):
+    """ Size of the binary data of an exported file/image field """
+    if "sha256" in field:
+        return field["size"]
+    return base64_length(field["data"])
+
+
+def field_base64(field, store=None):
+    """ base64 data of an exported file/image field (inline or from `store`) """
+    if "sha256" in field:
+        with _stored(field, store).open(field["sha256"]) as data:
+            return base64.b64encode(data).decode("ascii")
+    return field["data"]
+
+
+def field_bytes(field, store=None, size=-1):
+    """ The first `size` bytes (default: all) of the binary data of an
+        exported file/image field
+    """
+    if "sha256" in field:
+        return _stored(field, store).read(field["sha256"], size)
+    b64_data = field["data"]
+    if size < 0:
+        return base64.b64decode(b64_data)
+    # decode only the leading base64 characters (4 characters encode 3 bytes,
+    # some slack for line breaks)
+    prefix = "".join(b64_data[: (size // 3 + 1) * 4 + size // 16].split())
+    prefix = prefix[: len(prefix) // 4 * 4]
+    return base64.b64decode(prefix)[:size]
+
+
+def iter_field_chunks(field, chunk_size, store=None):
+    """ The binary data of an exported file/image field in chunks of
+        (about) `chunk_size` bytes
+    """
+    if "sha256" in field:
+        return _stored(field, store).iter_chunks(field["sha256"], chunk_size)
+    return iter_base64_chunks(field["data"], chunk_size)
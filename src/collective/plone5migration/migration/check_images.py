@@ -14,10 +14,12 @@ import tqdm
 import yaml
 import attrdict
 import multiprocessing
-import base64
-import io
-import PIL.Image
 
+from .blobstore import field_bytes
+from .blobstore import field_size
+from .sniffing import HEADER_SIZE
+from .sniffing import image_info
+from .sniffing import verify_image
 from .migration_import import Migrator
 from .logger import get_logger
 
@@ -25,57 +27,95 @@ LOG = get_logger("image_check.log", stdout=False)
 LOG.info("Starting image check")
 
 
+# ImageChecker of the worker process (see _init_worker())
+_checker = None
+
+
+def _init_worker(config, args):
+    """ Pool initializer: one ImageChecker (ArangoDB connection) per process """
+    global _checker
+    _checker = ImageChecker(config, args)
+
+
+def _check_chunk(rows):
+    """ Check the images of `rows` in a worker process. Returns the number
+        of checked images and the list of error messages.
+    """
+    return len(rows), _checker.check_chunk(rows)
+
+
 class ImageChecker(Migrator):
     def check_images(self):
-        query = f"""
-            FOR doc in  {self.collection_name}
-                FILTER doc._type == 'Image'
-                RETURN {{path: doc._path,
-                        _key: doc._key
-                       }}
-                """
-
         LOG.info("Querying database for images")
 
-        result = self._query_aql(query)
+        result = self._query("objects_by_type", portal_type="Image")
         result = [r for r in result]
 
         LOG.info(f"Found {len(result)} images")
-        pool = multiprocessing.Pool(processes=self.args.number_processes)
-        with pool as p:
-            result = list(
-                tqdm.tqdm(p.imap(self._check_image, result), total=len(result))
-            )
 
-    def _check_image(self, row):
-
-        key = row["_key"]
-        json_data = self._object_by_key(key)
+        # workers receive chunks of rows and fetch each chunk with one query
+        chunk_size = self.args.chunk_size
+        chunks = [result[i:i + chunk_size] for i in range(0, len(result), chunk_size)]
+        num_errors = 0
+        with tqdm.tqdm(total=len(result)) as progress, multiprocessing.Pool(
+            processes=self.args.number_processes,
+            initializer=_init_worker,
+            initargs=(self.config, self.args),
+        ) as pool:
+            for num_checked, errors in pool.imap_unordered(_check_chunk, chunks):
+                for error in errors:
+                    LOG.error(error)
+                num_errors += len(errors)
+                progress.update(num_checked)
+
+        LOG.info(f"Checked {len(result)} images: {num_errors} errors")
+
+    def check_chunk(self, rows):
+        """ Fetch the image data of all `rows` with one query and check them """
+
+        keys = [row["_key"] for row in rows]
+        documents = self._fetch_chunk(keys, ["_datafield_image"])
+        errors = list()
+        for row in rows:
+            errors.extend(self._check_image(row, documents.get(row["_key"])))
+        return errors
+
+    def _check_image(self, row, json_data):
+        """ Check the image of `row` (document `json_data`) and return the
+            list of error messages
+        """
 
         try:
             image_field = json_data["_datafield_image"]
-        except KeyError as e:
-            LOG.error(f"ERROR: {row['path']}: {e}")
-            return
+        except (KeyError, TypeError) as e:
+            return [f"ERROR: {row['path']}: {e}"]
+
+        errors = list()
 
-        image_data = image_field["data"]
-        image_data = base64.b64decode(image_data)
+        # identify format and dimensions from the header, decode the complete
+        # image only if the header does not fit into HEADER_SIZE or for --verify
         img = None
         try:
-            img = PIL.Image.open(io.BytesIO(image_data))
-            #            LOG.error(f"OK: {row['path']}")
-        except OSError as e:
-            LOG.error(f"ERROR: {row['path']}: {e}")
-        except PIL.Image.DecompressionBombError as e:
-            LOG.error(f"ERROR: {row['path']}: {e}")
-        except UnboundLocalError as e:
-            # https://github.com/python-pillow/Pillow/issues/3769
-            LOG.error(f"ERROR: {row['path']}: {e}")
+            header = field_bytes(image_field, self.blob_store, HEADER_SIZE)
+            try:
+                img = image_info(header)
+            except OSError:
+                if field_size(image_field) <= len(header):
+                    raise
+            if img is None or getattr(self.args, "verify", False):
+                img = verify_image(field_bytes(image_field, self.blob_store))
+        except Exception as e:
+            # any error (undecodable data, decompression bomb, UnboundLocalError
+            # of https://github.com/python-pillow/Pillow/issues/3769, missing
+            # --blob-store, ...) is reported for this image only
+            errors.append(f"ERROR: {row['path']}: {e}")
 
         if img and img.format == 'TIFF':
-            ct = image_field['content_type']
-            if ct != 'image/tiff': 
-                 LOG.error(f"ERROR: {row['path']}: TIFF disguised as {ct}")
+            ct = image_field.get('content_type')
+            if ct != 'image/tiff':
+                errors.append(f"ERROR: {row['path']}: TIFF disguised as {ct}")
+        return errors
+
 
 def main():
 
@@ -91,6 +131,25 @@ def main():
         help="Number of processes (parallel checks)",
         type=int,
     )
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        dest="chunk_size",
+        default=100,
+        type=int,
+        help="Number of images per task (fetched by the worker with one query)",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Decode and verify the complete image data (slow, detects truncated images)",
+    )
+    parser.add_argument(
+        "--blob-store",
+        dest="blob_store",
+        default=None,
+        help="Blob store directory used by import-jsondump-into-arangodb --blob-store",
+    )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="Verbose mode (timing)"
     )
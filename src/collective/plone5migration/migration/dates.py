@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Date normalization for collective.jsonify exports.
+#
+# collective.jsonify produces only a few fixed date formats: ISO8601
+# (2020-08-25T17:00:00+02:00) for Dublin Core dates and the string
+# representation of Zope DateTime (2020/08/25 17:00:00.123 GMT+2) for
+# Archetypes date fields. These are parsed with strict parsers, anything
+# else is handed over to dateparser (slow). Parsed values are kept in a
+# bounded LRU cache.
+
+import datetime
+import functools
+import re
+import threading
+
+import dateparser
+
+
+CACHE_SIZE = 65536
+
+ZOPE_DATETIME_REGEX = re.compile(
+    r"^(\d{4})/(\d{1,2})/(\d{1,2})"  # date
+    r"(?:[ T](\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?"  # optional time
+    r"(?:\s*(?:GMT|UTC)(?:([+-])(\d{1,2})(?::?(\d{2}))?)?)?$"  # optional GMT offset
+)
+
+_lock = threading.Lock()
+_counters = dict(iso=0, zope=0, dateparser=0, failed=0)
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def _parse_iso(s):
+    """ Strict ISO8601 parser """
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    try:
+        return datetime.datetime.fromisoformat(s)
+    except ValueError:
+        return None
+
+
+def _parse_zope(s):
+    """ Strict parser for the string representation of Zope DateTime """
+    match = ZOPE_DATETIME_REGEX.match(s)
+    if match is None:
+        return None
+
+    year, month, day, hour, minute, second, fraction, sign, tz_hours, tz_minutes = match.groups()
+    microsecond = int((fraction or "0")[:6].ljust(6, "0"))
+    tzinfo = None
+    if sign:
+        offset = datetime.timedelta(hours=int(tz_hours), minutes=int(tz_minutes or 0))
+        tzinfo = datetime.timezone(-offset if sign == "-" else offset)
+    elif "GMT" in s or "UTC" in s:
+        tzinfo = datetime.timezone.utc
+
+    try:
+        return datetime.datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour or 0),
+            int(minute or 0),
+            int(second or 0),
+            microsecond,
+            tzinfo=tzinfo,
+        )
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_date(s):
+    """ Parse a date string into a `datetime.datetime`. Returns None
+        for strings that can not be parsed at all.
+    """
+
+    s = s.strip()
+    dt = _parse_iso(s)
+    if dt is not None:
+        _count("iso")
+        return dt
+
+    dt = _parse_zope(s)
+    if dt is not None:
+        _count("zope")
+        return dt
+
+    dt = dateparser.parse(s)
+    _count("dateparser" if dt is not None else "failed")
+    return dt
+
+
+def stats():
+    """ Cache hits/misses and the number of dates handled by each parser
+        (counted per cache miss)
+    """
+
+    info = parse_date.cache_info()
+    with _lock:
+        result = dict(_counters)
+    result.update(hits=info.hits, misses=info.misses, cached=info.currsize)
+    return result
+
+
+def report(log):
+    """ Log date parsing statistics """
+
+    s = stats()
+    log.info(
+        f'Dates: {s["hits"]} cache hits, {s["misses"]} misses '
+        f'(iso: {s["iso"]}, zope: {s["zope"]}, dateparser: {s["dateparser"]}, failed: {s["failed"]})'
+    )
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# Streaming reader for collective.jsonify exports: directories, tar/zip
+# archives, compressed JSON files and JSON Lines
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tarfile
+import time
+import zipfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIONS = (".gz", ".bz2", ".xz", ".zst")
+
+
+def _split_compression(path):
+    """ "export.tar.gz" -> ("export.tar", ".gz") """
+    name = os.path.basename(path).lower()
+    for suffix in COMPRESSIONS:
+        if name.endswith(suffix):
+            return name[: -len(suffix)], suffix
+    if name.endswith(".tgz"):
+        return name[:-4] + ".tar", ".gz"
+    return name, None
+
+
+def open_stream(path):
+    """ Binary stream of the (decompressed) content of `path` """
+
+    name, compression = _split_compression(path)
+    if compression == ".gz":
+        return gzip.open(path, "rb")
+    if compression == ".bz2":
+        return bz2.open(path, "rb")
+    if compression == ".xz":
+        return lzma.open(path, "rb")
+    if compression == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} requires the `zstandard` package")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.BufferedReader(reader)
+    return open(path, "rb")
+
+
+class ExportReader:
+    """ Iterate over the exported objects of `path` as (name, data) without
+        unpacking anything to disk. `path` is either
+
+        - a directory with one JSON file per object (`data` is None, the
+          file is read by the consumer)
+        - a tar archive (optionally gz/bz2/xz/zst compressed) or zip archive
+          with one JSON file per object, read as a stream
+        - a single (optionally compressed) JSON file
+        - a JSON Lines file (.jsonl/.ndjson, optionally compressed) with one
+          object per line
+
+        `imported` maps names to (size, mtime) of the previous import
+        (manifest): entries with the same size and mtime are skipped without
+        reading them and counted in `unchanged`. Entries without a
+        reliable mtime (JSON Lines) are always returned. `seen` maps the
+        names of all entries to (size, mtime).
+    """
+
+    def __init__(self, path, imported=None):
+        self.path = path
+        self.imported = imported or dict()
+        self.seen = dict()
+        self.unchanged = 0
+
+    def _unchanged(self, name, size, mtime):
+        self.seen[name] = (size, mtime)
+        if mtime is not None and self.imported.get(name, ())[:2] == (size, mtime):
+            self.unchanged += 1
+            return True
+        return False
+
+    def __iter__(self):
+        if os.path.isdir(self.path):
+            return self._iter_directory()
+
+        name, compression = _split_compression(self.path)
+        if name.endswith(".tar"):
+            return self._iter_tar()
+        if name.endswith(".zip") and compression is None:
+            return self._iter_zip()
+        if name.endswith((".jsonl", ".ndjson")):
+            return self._iter_lines()
+        return self._iter_file()
+
+    def _iter_directory(self):
+        for dirname, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                fn = os.path.join(dirname, filename)
+                if fn.endswith(".json"):
+                    st = os.stat(fn)
+                    if not self._unchanged(fn, st.st_size, st.st_mtime):
+                        yield fn, None
+
+    def _iter_tar(self):
+        # stream mode: members are read strictly sequentially
+        with open_stream(self.path) as stream, tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith(".json"):
+                    continue
+                name = f"{self.path}:{member.name}"
+                if self._unchanged(name, member.size, float(member.mtime)):
+                    continue
+                yield name, tar.extractfile(member).read()
+
+    def _iter_zip(self):
+        with zipfile.ZipFile(self.path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith(".json"):
+                    continue
+                name = f"{self.path}:{info.filename}"
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                if self._unchanged(name, info.file_size, mtime):
+                    continue
+                yield name, archive.read(info)
+
+    def _iter_lines(self):
+        with open_stream(self.path) as stream:
+            for lineno, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                name = f"{self.path}:{lineno}"
+                self._unchanged(name, len(line), None)
+                yield name, line
+
+    def _iter_file(self):
+        st = os.stat(self.path)
+        if self._unchanged(self.path, st.st_size, st.st_mtime):
+            return
+        with open_stream(self.path) as stream:
+            yield self.path, stream.read()
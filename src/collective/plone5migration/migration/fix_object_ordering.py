@@ -33,15 +33,8 @@ def main():
     migrator = Migrator(config, args)
 
     # read all folders first
-    query = """
-        FOR doc in import
-            filter doc._type == 'Folder'
-            limit 10000000
-            RETURN  {path: doc._path, position: doc._gopip}
-    """
-
     print('Reading folders ')
-    result = migrator._query_aql(query)
+    result = migrator._query("positions_by_type", portal_type="Folder")
     print('Got data')
 
     folders = list()
@@ -55,13 +48,7 @@ def main():
         folder_path = r['path']
         print(i, folder_path)
 
-        query = """
-            FOR doc in import
-                filter doc._parent_path == '%s'
-                RETURN  {path: doc._path, position: doc._gopip}
-        """ % folder_path
-
-        result = migrator._query_aql(query)
+        result = migrator._query("positions_by_parent", parent_path=folder_path)
         positions = list()
         for j, r2 in enumerate(result):
             positions.append(r2)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# asyncio based HTTP transport for the migration (requires `httpx`)
+
+import asyncio
+import threading
+
+
+# methods retried after errors (`method_whitelist` of the requests transport)
+RETRY_METHODS = ("HEAD", "GET", "POST", "DELETE", "PUT")
+
+
+class AsyncHTTPEngine:
+    """ HTTP transport with the interface of a `requests.Session`
+        (get/post/put/patch/delete/head) backed by one `httpx.AsyncClient`.
+
+        The client runs inside an asyncio event loop in a background thread
+        and keeps a pool of keep-alive connections. Any number of threads may
+        issue requests at the same time, at most `concurrency` requests are
+        in flight. `submit()` returns a future and allows to keep several
+        requests in flight from a single thread.
+
+        Failed requests are retried like `urllib3.util.retry.Retry(total=retries,
+        backoff_factor=backoff_factor, method_whitelist=retry_methods)` used
+        by the `requests` transport: connection errors (nothing sent) always,
+        other transport errors and `status_forcelist` responses only for
+        `retry_methods` (not for PATCH, e.g. TUS upload chunks).
+
+        `transport` is passed to `httpx.AsyncClient` (e.g. a mock transport).
+    """
+
+    def __init__(
+        self,
+        concurrency=16,
+        retries=6,
+        backoff_factor=20,
+        status_forcelist=(500, 502, 503, 504),
+        retry_methods=RETRY_METHODS,
+        timeout=None,
+        transport=None,
+    ):
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError(
+                "The httpx HTTP engine requires `httpx` (pip install collective.plone5migration[async])"
+            )
+
+        self.httpx = httpx
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.retry_methods = retry_methods
+        # callables invoked with each final response (like requests' response hooks)
+        self.hooks = []
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+        async def setup():
+            self._semaphore = asyncio.Semaphore(concurrency)
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=concurrency, max_keepalive_connections=concurrency
+                ),
+                timeout=timeout,
+                transport=transport,
+            )
+
+        self._run(setup())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _backoff(self, retry):
+        """ Sleep time before the given retry (same as urllib3) """
+        if retry <= 1:
+            return 0
+        return self.backoff_factor * (2 ** (retry - 1))
+
+    async def _request(self, method, url, auth=None, **kw):
+        if auth is not None and not isinstance(auth, tuple):
+            # requests.auth.HTTPBasicAuth
+            auth = (auth.username, auth.password)
+
+        # requests accepts raw bodies as `data`, httpx as `content`
+        data = kw.pop("data", None)
+        if isinstance(data, (str, bytes)):
+            kw["content"] = data
+        elif data is not None:
+            kw["data"] = data
+
+        retry_method = method.upper() in self.retry_methods
+        retry = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await self._client.request(method, url, auth=auth, **kw)
+            except self.httpx.TransportError as e:
+                connect_error = isinstance(e, (self.httpx.ConnectError, self.httpx.ConnectTimeout))
+                if retry >= self.retries or not (retry_method or connect_error):
+                    raise
+            else:
+                if (
+                    not retry_method
+                    or response.status_code not in self.status_forcelist
+                    or retry >= self.retries
+                ):
+                    for hook in self.hooks:
+                        hook(response)
+                    return response
+
+            retry += 1
+            await asyncio.sleep(self._backoff(retry))
+
+    def submit(self, method, url, **kw):
+        """ Send a request and return a `concurrent.futures.Future` for the response """
+        return asyncio.run_coroutine_threadsafe(
+            self._request(method, url, **kw), self._loop
+        )
+
+    def request(self, method, url, **kw):
+        """ Send a request and wait for the response """
+        return self.submit(method, url, **kw).result()
+
+    def get(self, url, **kw):
+        return self.request("GET", url, **kw)
+
+    def head(self, url, **kw):
+        return self.request("HEAD", url, **kw)
+
+    def post(self, url, **kw):
+        return self.request("POST", url, **kw)
+
+    def put(self, url, **kw):
+        return self.request("PUT", url, **kw)
+
+    def patch(self, url, **kw):
+        return self.request("PATCH", url, **kw)
+
+    def delete(self, url, **kw):
+        return self.request("DELETE", url, **kw)
+
+    def close(self):
+        """ Close all connections and stop the event loop """
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -3,17 +3,244 @@
 # This scripts imports a JSON export made with `collective.jsonify` into
 # ArangoDB (database: collective, collection: portal by default)
 
-import os
 import json
 import argparse
+import functools
+import hashlib
+import multiprocessing
+import threading
+import time
 import furl
 import tqdm
 import uuid
 from arango import ArangoClient
 
+from .blobstore import BlobStore
+from .blobstore import externalize_blobs
+from .export_reader import ExportReader
+from .manifest import ImportManifest
+from .skeleton import create_skeleton_indexes
+from .skeleton import rebuild_skeleton
+from .skeleton import skeleton_entry
+from .skeleton import skeleton_name
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 import_dir = "/home/ajung/content_plone_portal_2019-05-13-11-47-28/"
 
+# unique indexes (reloads are upserts by _key derived from _path)
+UNIQUE_INDEXES = [
+    ["_path"],
+]
+
+# indexes used by the migration queries
+INDEXES = [
+    ["_paths_all[*]"],
+    ["_directly_provided[*]"],
+    ["relatedItems[*]"],
+    ["hasRelatedItems"],
+    ["_parent_path"],
+    ["_object_id"],
+    ["review_state"],
+    ["_type"],
+    ["_uid"],
+    ["_gopip"],
+]
+
+
+def document_key(path):
+    """ Deterministic `_key` for the exported object `path`: re-imports of
+        the same object produce the same key, so caches, journals and
+        checkpoints keyed by `_key` stay valid
+    """
+    return uuid.uuid5(uuid.NAMESPACE_URL, path).hex
+
+
+def prepare_document(data, filename, key=None):
+    """ Add the attributes used by the migration to the exported object `data`
+        (from the JSON file `filename`). `key` is the `_key` of the document
+        (default: derived from `_path`).
+    """
+
+    # precalculate all parent paths
+    all_paths = list()
+    paths2 = data["_path"].split("/")
+    paths2 = [p for p in paths2 if p]
+    for i in range(1, len(paths2)):
+        all_paths.append("/" + "/".join(paths2[:i]))
+    relative_path = "/".join(paths2[1:])
+    parent_path = '/' + '/'.join(paths2[:-1])
+    data['_parent_path'] = parent_path
+    data["_paths_all"] = all_paths
+    data["_relative_path"] = relative_path
+    data["hasRelatedItems"] = len(data.get("relatedItems", ())) > 0
+    data["_import_type"] = "content"  # mark imported content as content
+    data["_object_id"] = data["_id"]  # original object id
+    del data["_id"]  # don't mess up with ArangoDB _id magic
+    data["_key"] = key or document_key(data["_path"])  # provide our own unique key
+    data["_json_filename"] = filename  # JSON import filename
+    return data
+
+
+def load_document(entry, blob_store=None):
+    """ Parse and prepare the exported object of an `ExportReader` entry
+        (name, raw JSON or None for files to be read here). Runs in the
+        worker processes. Binary data is moved into `blob_store` if given.
+        Returns (name, document, size, sha256, error).
+    """
+
+    filename, raw = entry
+    try:
+        if raw is None:
+            with open(filename, "rb") as fp:
+                raw = fp.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        size = len(raw)
+        if blob_store is not None:
+            size -= externalize_blobs(data, blob_store)
+        return filename, prepare_document(data, filename), size, digest, None
+    except Exception as e:
+        return filename, None, 0, None, str(e)
+
+
+def _batches(results, batch_size, batch_bytes):
+    """ Group the results of `load_document` into batches of at most
+        `batch_size` documents or `batch_bytes` bytes (JSON size)
+    """
+
+    batch = list()
+    size = 0
+    for result in results:
+        batch.append(result)
+        size += result[2]
+        if len(batch) >= batch_size or size >= batch_bytes:
+            yield batch
+            batch = list()
+            size = 0
+    if batch:
+        yield batch
+
+
+def create_indexes(collection, index_type="hash", sparse=False):
+    """ Create all `UNIQUE_INDEXES` and `INDEXES` on `collection` and
+        report the time per index
+    """
+
+    for fields in UNIQUE_INDEXES + INDEXES:
+        ts = time.time()
+        unique = fields in UNIQUE_INDEXES
+        if index_type == "persistent":
+            collection.add_persistent_index(fields=fields, unique=unique, sparse=sparse)
+        else:
+            collection.add_hash_index(fields=fields, unique=unique, sparse=sparse)
+        print(
+            f"{'unique ' if unique else ''}{index_type} index on {', '.join(fields)} "
+            f"created in {time.time() - ts:.1f} seconds"
+        )
+
+
+class BatchImporter:
+    """ Imports batches of `load_document` results into `collection` and the
+        `skeleton` collection. `imported` are the files of the previous import
+        (name -> (size, mtime, sha256, _key), see `ImportManifest`), `seen` the
+        (size, mtime) of the files read (`ExportReader.seen`).
+    """
+
+    def __init__(self, collection, skeleton, imported, seen):
+        self.collection = collection
+        self.skeleton = skeleton
+        self.imported = imported
+        self.seen = seen
+        # _key of documents whose object moved to another _path
+        self.stale_keys = set()
+        self.written_keys = set()
+        self.num_added = 0
+        self.num_changed = 0
+        self.num_unchanged = 0
+        self.num_imported = 0
+        self.num_errors = 0
+
+    def classify(self, batch):
+        """ Split `batch` into the documents to be written (new and changed
+            files) and the manifest entries (filename, size, mtime, sha256,
+            _key) of all parsed files
+        """
+
+        documents = list()
+        entries = list()
+        for fn, document, size, digest, error in batch:
+            if error is not None:
+                print(f"Unable to parse {fn} ({error})")
+                self.num_errors += 1
+                continue
+
+            previous = self.imported.get(fn)
+            if previous is not None:
+                if previous[2] == digest:
+                    # touched but unchanged
+                    self.num_unchanged += 1
+                    entries.append((fn,) + self.seen[fn] + (digest, previous[3]))
+                    continue
+                if previous[3] != document["_key"]:
+                    self.stale_keys.add(previous[3])
+                self.num_changed += 1
+            else:
+                self.num_added += 1
+            documents.append(document)
+            self.written_keys.add(document["_key"])
+            entries.append((fn,) + self.seen[fn] + (digest, document["_key"]))
+        return documents, entries
+
+    def import_batch(self, batch):
+        """ Write the new and changed documents of `batch` (one bulk import
+            per collection). Returns the manifest entries and the number of
+            errors of the bulk imports.
+        """
+
+        documents, entries = self.classify(batch)
+        if not documents:
+            return entries, 0
+
+        # idempotent upserts by the deterministic _key
+        result = self.collection.import_bulk(
+            documents, halt_on_error=False, details=True, on_duplicate="replace"
+        )
+        self.num_imported += result["created"] + result.get("updated", 0)
+        for detail in result.get("details", ()):
+            print(detail)
+
+        skeleton_result = self.skeleton.import_bulk(
+            [skeleton_entry(document) for document in documents],
+            halt_on_error=False,
+            details=True,
+            on_duplicate="replace",
+        )
+        for detail in skeleton_result.get("details", ()):
+            print(detail)
+
+        errors = result["errors"] + skeleton_result["errors"]
+        self.num_errors += errors
+        return entries, errors
+
+    def remove(self, batch_size):
+        """ Delete the documents of removed files and of moved objects once
+            all files have been read. Returns the removed files.
+        """
+
+        removed = [fn for fn in self.imported if fn not in self.seen]
+        # objects of removed files may live on in another file (same _path)
+        keys = set(self.imported[fn][3] for fn in removed) | self.stale_keys
+        keys = [dict(_key=key) for key in sorted(keys - self.written_keys)]
+        for i in range(0, len(keys), batch_size):
+            self.collection.delete_many(keys[i:i + batch_size])
+            self.skeleton.delete_many(keys[i:i + batch_size])
+        return removed
+
 
 def main():
 
@@ -34,11 +261,80 @@ def main():
         "-i",
         "--import-directory",
         default=import_dir,
-        help="Import directory with JSON files",
+        help="Import directory with JSON files or tar/zip archive (optionally gz, bz2, xz "
+        "or zst compressed), compressed JSON file or JSON Lines file (.jsonl) to be "
+        "read as a stream",
     )
     parser.add_argument(
         "-x", "--drop-collection", action="store_true", help="Drop collection"
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of processes parsing JSON files",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        dest="batch_size",
+        default=1000,
+        help="Maximum number of documents per bulk import request",
+    )
+    parser.add_argument(
+        "--batch-bytes",
+        type=int,
+        dest="batch_bytes",
+        default=64 * 1024 * 1024,
+        help="Maximum size (bytes of JSON) of the documents per bulk import request",
+    )
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        dest="defer_indexes",
+        help="Import into an unindexed collection and create the indexes afterwards",
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=("hash", "persistent"),
+        dest="index_type",
+        default="hash",
+        help="Type of the created indexes",
+    )
+    parser.add_argument(
+        "--sparse-indexes",
+        action="store_true",
+        dest="sparse_indexes",
+        help="Create sparse indexes (documents without the attribute are not indexed)",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        default=None,
+        help="Manifest (SQLite) of the imported files for incremental imports: "
+        "only new and changed files are imported, documents of removed files are deleted",
+    )
+    parser.add_argument(
+        "--blob-store",
+        dest="blob_store",
+        default=None,
+        help="Directory of a content-addressed store for binary data: files and "
+        "images are stored there once per SHA-256 instead of inline (base64) in the documents",
+    )
+    parser.add_argument(
+        "--skeleton-collection",
+        dest="skeleton_collection",
+        default=None,
+        help="Collection holding the tree structure for structural queries "
+        "(default: <collection>_skeleton)",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Upsert the documents into an existing collection (partial or parallel reloads)",
+    )
 
     args = parser.parse_args()
     print(f"connection={args.connection_url}")
@@ -51,68 +347,108 @@ def main():
     client = ArangoClient(hosts=args.connection_url)
     db = client.db(args.database, username=args.username, password=args.password)
 
+    manifest = ImportManifest(args.manifest) if args.manifest else None
+    existing = db.has_collection(args.collection) and not args.drop_collection
+
     if not db.has_collection(args.collection):
         db.create_collection(name=args.collection)
-    else:
-        if not args.drop_collection:
-            raise RuntimeError("collection already exists - drop it first")
+        if manifest:
+            manifest.reset()
+    elif args.drop_collection:
         print("truncating existing collection")
         db.delete_collection(args.collection)
         print("truncating existing collection...DONE")
         db.create_collection(name=args.collection)
+        if manifest:
+            manifest.reset()
+    elif not manifest and not args.update:
+        raise RuntimeError(
+            "collection already exists - drop it first or use --manifest/--update"
+        )
 
     collection = db[args.collection]
-    collection.add_hash_index(fields=["_paths_all[*]"])
-    collection.add_hash_index(fields=["_directly_provided[*]"])
-    collection.add_hash_index(fields=["relatedItems[*]"])
-    collection.add_hash_index(fields=["hasRelatedItems"])
-    collection.add_hash_index(fields=["_path"])
-    collection.add_hash_index(fields=["_parent_path"])
-    collection.add_hash_index(fields=["_object_id"])
-    collection.add_hash_index(fields=["review_state"])
-    collection.add_hash_index(fields=["_type"])
-    collection.add_hash_index(fields=["_uid"])
-    collection.add_hash_index(fields=["_gopip"])
-
-    files = list()
-    for dirname, dirnames, filenames in os.walk(args.import_directory):
-        for filename in filenames:
-            fn = os.path.join(dirname, filename)
-            if fn.endswith(".json"):
-                files.append(fn)
-
-    num_files = len(files)
-    for i in tqdm.tqdm(range(num_files)):
-
-        fn = files[i]
-        with open(fn) as fp:
-            try:
-                data = json.load(fp)
-            except Exception as e:
-                print(f"Unable to parse {fn} ({e}")
-                continue
 
+    # slim copy of the tree structure (updated with every batch)
+    skeleton_collection = args.skeleton_collection or skeleton_name(args.collection)
+    if args.drop_collection and db.has_collection(skeleton_collection):
+        db.delete_collection(skeleton_collection)
+    rebuild = False
+    if not db.has_collection(skeleton_collection):
+        db.create_collection(name=skeleton_collection)
+        rebuild = existing
+    skeleton = db[skeleton_collection]
+
+    if not args.defer_indexes:
+        create_indexes(collection, args.index_type, args.sparse_indexes)
+        create_skeleton_indexes(skeleton, args.sparse_indexes)
+
+    if rebuild:
+        print(f"building skeleton collection {skeleton_collection} from {args.collection}")
+        rebuild_skeleton(db, args.collection, skeleton, args.batch_size)
+
+    # name -> (size, mtime, sha256, _key) of the previous import
+    imported = manifest.load() if manifest else dict()
+
+    # entries are streamed from the directory or archive (nothing is unpacked)
+    reader = ExportReader(args.import_directory, imported)
+    importer = BatchImporter(collection, skeleton, imported, reader.seen)
+    ts = time.time()
+    progress = tqdm.tqdm(unit=" objects")
+
+    # the pool reads its input eagerly: limit the number of entries in flight
+    in_flight = threading.BoundedSemaphore(args.workers * 64)
+
+    def throttled(entries):
+        for entry in entries:
+            in_flight.acquire()
+            yield entry
+
+    def released(results):
+        for result in results:
+            in_flight.release()
+            yield result
+
+    # parse in worker processes, import in batches (one request per batch)
+    blob_store = BlobStore(args.blob_store) if args.blob_store else None
+    load = functools.partial(load_document, blob_store=blob_store)
+    with multiprocessing.Pool(args.workers) as pool:
+        results = released(pool.imap_unordered(load, throttled(reader), chunksize=16))
+        for i, batch in enumerate(_batches(results, args.batch_size, args.batch_bytes)):
+            entries, errors = importer.import_batch(batch)
+
+            # files of batches with errors are imported again by the next run
+            if manifest and not errors:
+                manifest.update(entries)
+
+            progress.update(len(batch))
+            progress.set_postfix(
+                batch=i + 1, imported=importer.num_imported, errors=importer.num_errors
+            )
+
+    progress.close()
+    importer.num_unchanged += reader.unchanged
+    removed = importer.remove(args.batch_size)
+    if manifest and removed:
+        manifest.remove(removed)
+
+    duration = time.time() - ts
+    print(
+        f"{importer.num_imported} documents imported, {importer.num_errors} errors in "
+        f"{duration:.1f} seconds "
+        f"({importer.num_imported / duration if duration else 0:.1f} documents/s)"
+    )
+    if manifest:
+        print(
+            f"{importer.num_added} added, {importer.num_changed} changed, "
+            f"{len(removed)} removed, {importer.num_unchanged} unchanged"
+        )
+        manifest.close()
 
-        # precalculate all parent paths
-        all_paths = list()
-        paths2 = data["_path"].split("/")
-        paths2 = [p for p in paths2 if p]
-        for i in range(1, len(paths2)):
-            all_paths.append("/" + "/".join(paths2[:i]))
-        relative_path = "/".join(paths2[1:])
-        parent_path = '/' + '/'.join(paths2[:-1])
-        data['_parent_path'] = parent_path
-        data["_paths_all"] = all_paths
-        data["_relative_path"] = relative_path
-        data["hasRelatedItems"] = len(data.get("relatedItems", ())) > 0
-        data["_import_type"] = "content"  # mark imported content as content
-        data["_object_id"] = data["_id"]  # original object id
-        del data["_id"]  # don't mess up with ArangoDB _id magic
-        data["_key"] = str(uuid.uuid4())  # provide our own unique key, some UUID here
-        data["_json_filename"] = fn  # JSON import filename
-
-        # save it back to ArangoDB
-        collection.insert(data)
+    if args.defer_indexes:
+        ts = time.time()
+        create_indexes(collection, args.index_type, args.sparse_indexes)
+        create_skeleton_indexes(skeleton, args.sparse_indexes)
+        print(f"Indexes created in {time.time() - ts:.1f} seconds")
 
 
 if __name__ == "__main__":
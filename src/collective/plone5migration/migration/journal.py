@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# Persistent checkpoint journal for resumable migrations
+
+import json
+import sqlite3
+import threading
+import time
+
+
+class MigrationJournal:
+    """ Append-only on-disk journal (SQLite in WAL mode) recording
+
+        - the phases each object (by `_key`) has passed
+          (e.g. `created`, `metadata`, `portlets`, `default_page`)
+        - the deferred bookkeeping of the migrator (`kind` is the name of
+          the related Migrator attribute e.g. `_deferred_default_pages`)
+
+        The journal is safe to use from several threads.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS phases (
+                _key TEXT NOT NULL,
+                phase TEXT NOT NULL,
+                path TEXT,
+                timestamp REAL,
+                PRIMARY KEY (_key, phase))"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS deferred (
+                kind TEXT NOT NULL,
+                _key TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (kind, _key))"""
+        )
+
+    def is_empty(self):
+        """ Check if the journal has no entries """
+        with self._lock:
+            return not any(
+                self._db.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+                for table in ("phases", "deferred")
+            )
+
+    def reset(self):
+        """ Remove all entries (new migration) """
+        with self._lock:
+            self._db.execute("DELETE FROM phases")
+            self._db.execute("DELETE FROM deferred")
+
+    def mark(self, _key, phase, path=None):
+        """ Record that `_key` passed `phase` """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO phases VALUES (?, ?, ?, ?)",
+                (_key, phase, path, time.time()),
+            )
+
+    def is_done(self, _key, phase):
+        """ Check if `_key` already passed `phase` """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM phases WHERE _key = ? AND phase = ?", (_key, phase)
+            ).fetchone()
+        return row is not None
+
+    def count(self, phase):
+        """ Number of objects that passed `phase` """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM phases WHERE phase = ?", (phase,)
+            ).fetchone()[0]
+
+    def record(self, kind, _key, value):
+        """ Record deferred bookkeeping `value` for `_key` """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO deferred VALUES (?, ?, ?)",
+                (kind, _key, json.dumps(value)),
+            )
+
+    def load(self, kind):
+        """ Return all deferred bookkeeping of the given `kind` as dict """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT _key, value FROM deferred WHERE kind = ?", (kind,)
+            ).fetchall()
+        return dict((_key, json.loads(value)) for _key, value in rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Manifest of the export files imported into ArangoDB (incremental imports)
+
+import sqlite3
+
+
+class ImportManifest:
+    """ On-disk manifest (SQLite) of all imported export files with size,
+        mtime, SHA-256 of the content and the `_key` of the document created
+        from the file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._db = sqlite3.connect(filename, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                filename TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                sha256 TEXT,
+                _key TEXT)"""
+        )
+
+    def reset(self):
+        """ Remove all entries (full import) """
+        self._db.execute("DELETE FROM files")
+
+    def load(self):
+        """ All entries as dict filename -> (size, mtime, sha256, _key) """
+        rows = self._db.execute("SELECT filename, size, mtime, sha256, _key FROM files")
+        return dict((row[0], tuple(row[1:])) for row in rows)
+
+    def update(self, entries):
+        """ Add or replace entries (filename, size, mtime, sha256, _key) """
+        self._db.execute("BEGIN")
+        self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", entries)
+        self._db.execute("COMMIT")
+
+    def remove(self, filenames):
+        self._db.execute("BEGIN")
+        self._db.executemany("DELETE FROM files WHERE filename = ?", [(fn,) for fn in filenames])
+        self._db.execute("COMMIT")
+
+    def close(self):
+        self._db.close()
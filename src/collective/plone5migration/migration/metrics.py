@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+# Metrics registry for the migration: latency percentiles and transferred
+# bytes per provisioning endpoint, AQL query, portal_type and method.
+# Exported as JSON file and/or Prometheus text format over HTTP.
+
+import contextlib
+import http.server
+import json
+import os
+import random
+import threading
+import time
+
+# number of latency samples kept per metric for percentile calculation
+RESERVOIR_SIZE = 4096
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Metric:
+    """ Count, total time, transferred bytes and a reservoir sample of
+        latencies (seconds) for one metric
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.samples = []
+
+    def observe(self, duration, sent=0, received=0):
+        self.count += 1
+        self.total += duration
+        self.bytes_sent += sent
+        self.bytes_received += received
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(duration)
+        else:
+            # reservoir sampling: every observation has the same chance to be kept
+            index = random.randrange(self.count)
+            if index < RESERVOIR_SIZE:
+                self.samples[index] = duration
+
+    def percentiles(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {p: 0.0 for p in PERCENTILES}
+        return {p: samples[min(int(p * len(samples)), len(samples) - 1)] for p in PERCENTILES}
+
+    def as_dict(self):
+        result = dict(
+            count=self.count,
+            total=round(self.total, 6),
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+        )
+        for p, value in self.percentiles().items():
+            result[f"p{int(p * 100)}"] = round(value, 6)
+        return result
+
+
+class MetricsRegistry:
+    """ Thread-safe registry of metrics grouped by kind
+        (`http`, `aql`, `type`, `method`) and name
+    """
+
+    def __init__(self):
+        self._metrics = dict()
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+
+    def observe(self, kind, name, duration, sent=0, received=0):
+        """ Record one observation of `duration` seconds """
+        with self._lock:
+            metric = self._metrics.get((kind, name))
+            if metric is None:
+                metric = self._metrics[(kind, name)] = Metric()
+            metric.observe(duration, sent, received)
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+            self._started = time.time()
+
+    def snapshot(self):
+        """ All metrics as nested dict {kind: {name: {...}}} """
+        with self._lock:
+            result = dict(uptime=round(time.time() - self._started, 3), metrics={})
+            for (kind, name), metric in sorted(self._metrics.items()):
+                result["metrics"].setdefault(kind, {})[name] = metric.as_dict()
+        return result
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """ All metrics in the Prometheus text exposition format """
+
+        lines = []
+        metrics = self.snapshot()["metrics"]
+        for kind, entries in sorted(metrics.items()):
+            prefix = f"plone5migration_{kind}"
+            lines.append(f"# TYPE {prefix}_seconds summary")
+            for name, values in sorted(entries.items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                for p in PERCENTILES:
+                    lines.append(
+                        f'{prefix}_seconds{{name="{label}",quantile="{p}"}} {values[f"p{int(p * 100)}"]}'
+                    )
+                lines.append(f'{prefix}_seconds_sum{{name="{label}"}} {values["total"]}')
+                lines.append(f'{prefix}_seconds_count{{name="{label}"}} {values["count"]}')
+            for direction in ("sent", "received"):
+                lines.append(f"# TYPE {prefix}_bytes_{direction}_total counter")
+                for name, values in sorted(entries.items()):
+                    label = name.replace("\\", "\\\\").replace('"', '\\"')
+                    lines.append(
+                        f'{prefix}_bytes_{direction}_total{{name="{label}"}} {values[f"bytes_{direction}"]}'
+                    )
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, filename):
+        """ Write a JSON snapshot atomically to `filename` """
+        tmp = f"{filename}.tmp"
+        with open(tmp, "w") as fp:
+            fp.write(self.to_json())
+        os.replace(tmp, filename)
+
+    def start_export(self, filename, interval=30):
+        """ Write a JSON snapshot to `filename` every `interval` seconds """
+
+        def export():
+            while not self._stop.wait(interval):
+                self.write_json(filename)
+
+        thread = threading.Thread(target=export, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def start_server(self, port, host="127.0.0.1"):
+        """ Serve `/metrics` (Prometheus) and `/metrics.json` on a local port """
+
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics.json":
+                    body, content_type = registry.to_json(), "application/json"
+                elif self.path in ("/", "/metrics"):
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        """ Stop the periodic export and the HTTP server """
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._stop = threading.Event()
+
+
+# global registry used by the migration
+REGISTRY = MetricsRegistry()
+
+
+def observe(kind, name, duration, sent=0, received=0):
+    """ Record an observation in the global registry """
+    REGISTRY.observe(kind, name, duration, sent, received)
+
+
+@contextlib.contextmanager
+def timer(kind, name):
+    """ Record the duration of a `with` block in the global registry """
+    ts = time.time()
+    try:
+        yield
+    finally:
+        observe(kind, name, time.time() - ts)
@@ -5,8 +5,6 @@
 
 import re
 
-import base64
-import magic
 import sys
 import os
 import json
@@ -15,9 +13,10 @@ import pprint
 import traceback
 import datetime
 import itertools
+import urllib.parse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import argparse
-import dateparser
-from dateutil.parser import parse
 import tqdm
 import yaml
 import furl
@@ -29,7 +28,27 @@ from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from arango import ArangoClient
 
+from . import dates
+from . import metrics
+from .http_engine import AsyncHTTPEngine
+from .http_engine import RETRY_METHODS
+from .journal import MigrationJournal
 from .pfg import PFGMigrator
+from .blobstore import BlobStore
+from .blobstore import field_base64
+from .blobstore import field_bytes
+from .blobstore import field_size
+from .blobstore import iter_field_chunks
+from .skeleton import skeleton_name
+from .sniffing import HEADER_SIZE
+from .sniffing import mime_type
+from .sources import ArangoSource
+from .sources import FilesystemSource
+from .uploads import tus_metadata
+from .scheduler import CreationScheduler
+from .sink import FileSink
+from .sink import NullSink
+from .sink import report_throughput
 from .topic import TopicMigrator
 from .yes_no import query_yes_no
 from .logger import get_logger
@@ -85,14 +104,51 @@ SUPPORTED_MARKER_INTERFACES = [
     "plone.app.layout.navigation.interfaces.INavigationRoot",
 ]
 
-PARENT_EXISTS_CACHE = dict()
+# deferred bookkeeping attributes of the Migrator persisted in the journal
+JOURNALED_ATTRIBUTES = [
+    "_all_related_items",
+    "_all_imagerefs",
+    "_deferred_uids",
+    "_deferred_default_pages",
+    "_content_with_portlets",
+]
 
-VERBOSE = False
+# number of paths per @@inventory request
+INVENTORY_BATCH_SIZE = 10000
+
+# number of documents fetched from ArangoDB per request
+DOCUMENT_CHUNK_SIZE = 200
+
+# projections (document attributes) for passes without binary data
+POST_CREATE_FIELDS = [
+    "_path",
+    "_type",
+    "_uid",
+    "_gopip",
+    "_owner",
+    "_layout",
+    "_annotations",
+    "_directly_provided",
+    "_ac_local_roles",
+    "_ac_local_roles_block",
+    "_portlets_blacklist",
+    "_permissions",
+    "review_state",
+    "relatedItems",
+    "creation_date",
+    "modification_date",
+]
+FOLDER_CONSTRAINTS_FIELDS = [
+    "_relative_path",
+    "constrainTypesMode",
+    "immediatelyAddableTypes",
+    "locallyAllowedTypes",
+]
+PORTLETS_FIELDS = ["_portlets"]
+DEFERRED_UIDS_FIELDS = ["_path"]
+DEFAULT_PAGE_FIELDS = ["_path", "_defaultpage"]
 
-# for start/event of events, we need to substract 4 hours
-# due to improper export with improper TZ offset (of 2 hours)
-# and a miscalcuation in plone.restapi
-OFFSET_HOURS = 4
+VERBOSE = False
 
 URL_REGEX = re.compile(
         r'^(?:http|ftp)s?://' # http:// or https://
@@ -104,9 +160,12 @@ URL_REGEX = re.compile(
 
 
 def to_iso8601(s):
-    """ Convert format like 2020-08-25T17:00:00+02:00 to ISO8601 """
-    dt = parse(s)
-    dt = dt - datetime.timedelta(hours=OFFSET_HOURS)
+    """ Convert format like 2020/08/25 17:00:00 GMT+2 to ISO8601 (the
+        GMT offset is kept, no correction needed for Zope DateTime strings)
+    """
+    dt = dates.parse_date(s)
+    if dt is None:
+        raise ValueError(f"Unable to parse date: {s}")
     return dt.isoformat()
 
 
@@ -136,12 +195,9 @@ def timeit(method):
         ts = time.time()
         result = method(*args, **kw)
         te = time.time()
-        if "log_time" in kw:
-            name = kw.get("log_name", method.__name__.upper())
-            kw["log_time"][name] = int((te - ts) * 1000)
-        else:
-            if VERBOSE:
-                LOG.info("%r  %2.2f ms" % (method.__name__, (te - ts) * 1000))
+        metrics.observe("method", method.__name__, te - ts)
+        if VERBOSE:
+            LOG.info("%r  %2.2f ms" % (method.__name__, (te - ts) * 1000))
         return result
 
     return timed
@@ -149,10 +205,9 @@ def timeit(method):
 
 def check_204_response(response):
     if response.status_code == 204 and response.text:
-        LOG.info("HTTP 204 response return response with message body")
-        import pdb
-
-        pdb.set_trace()
+        LOG.warning(
+            f"HTTP 204 response with message body: {response.request.url}: {response.text}"
+        )
 
 
 class Migrator:
@@ -162,17 +217,7 @@ class Migrator:
         self.config = config  # YAML configutation
         self.args = args  # command line options
 
-        # ArangoDB connection
-        arango = self.config.arango
-        f = furl.furl(arango.url)
-        self.client = ArangoClient(hosts=arango.url)
-        self.db = self.client.db(
-            arango.database, username=arango.username, password=arango.password
-        )
-        if not self.db.has_collection(arango.collection):
-            raise MigrationError(f'collection "{arango.collection}" does not exist')
-        self.collection_name = arango.collection
-        self.collection = self.db[arango.collection]
+        self._connect()
         self._subdepartments = []
         self._all_related_items = dict()  # list of _key values of migrated content
         self._all_imagerefs = dict()  # maps UID of News Item to UID of imageref
@@ -182,40 +227,276 @@ class Migrator:
             dict()
         )  # all processed (_key, resouce_path) attribute from content
 
-        self.requests_session = requests.Session()
-        retries = Retry(
-            total=6,
-            backoff_factor=20,
-            status_forcelist=[500, 502, 503, 504],
-            method_whitelist=("HEAD", "GET", "POST", "DELETE", "PUT"),
+        # checkpoint journal (resumable migrations)
+        self.journal = None
+        if getattr(self.args, "journal", None):
+            self.journal = MigrationJournal(self.args.journal)
+            if getattr(self.args, "resume", False):
+                self._load_journal()
+            elif self.journal.is_empty() or getattr(self.args, "reset_journal", False):
+                self.journal.reset()
+            else:
+                self.journal.close()
+                raise ValueError(
+                    f"Journal {self.args.journal} contains a previous migration: "
+                    "continue it with --resume or start a new migration with --reset-journal"
+                )
+        elif getattr(self.args, "resume", False):
+            raise ValueError("--resume requires a checkpoint journal (--journal)")
+
+        # _key -> (exported field, content type, filename) of large binaries
+        # uploaded after the creation of the object
+        self._pending_uploads = dict()
+
+        # binary data moved out of the documents by the importer (--blob-store)
+        self.blob_store = None
+        if getattr(self.args, "blob_store", None):
+            self.blob_store = BlobStore(self.args.blob_store)
+
+        # relative paths of all existing objects on the target site (see load_inventory())
+        self.inventory = None
+
+        self._local = threading.local()
+        self._http_engine = None
+        sink = getattr(self.args, "sink", "http")
+        if sink == "null":
+            self._http_engine = NullSink()
+            self._http_engine.hooks["response"].append(self._observe_response)
+        elif sink == "file":
+            self._http_engine = FileSink(self.args.sink_file)
+            self._http_engine.hooks["response"].append(self._observe_response)
+        elif getattr(self.args, "http_engine", "requests") == "httpx":
+            # every worker issues blocking requests: the number of requests
+            # in flight is limited by the number of workers (the transport
+            # does not change the scheduling mode)
+            workers = getattr(self.args, "workers", 1)
+            concurrency = getattr(self.args, "concurrency", None) or workers
+            if concurrency > workers:
+                LOG.warning(
+                    f"--concurrency {concurrency} exceeds --workers {workers}: "
+                    f"at most {workers} requests will be in flight"
+                )
+            self._http_engine = AsyncHTTPEngine(concurrency=concurrency)
+            self._http_engine.hooks.append(self._observe_response)
+
+    def _connect(self):
+        """ Source of the exported content (--source): ArangoDB collection
+            or collective.jsonify export directory
+        """
+
+        if getattr(self.args, "source", "arango") == "filesystem":
+            directory = self.args.source_directory
+            if not directory or not os.path.isdir(directory):
+                raise MigrationError(f'export directory "{directory}" does not exist')
+            self.source = FilesystemSource(directory, self.args.source_index, log=LOG)
+            return
+
+        arango = self.config.arango
+        f = furl.furl(arango.url)
+        self.client = ArangoClient(hosts=arango.url)
+        db = self.client.db(
+            arango.database, username=arango.username, password=arango.password
+        )
+        if not db.has_collection(arango.collection):
+            raise MigrationError(f'collection "{arango.collection}" does not exist')
+        skeleton = arango.get("skeleton_collection") or skeleton_name(arango.collection)
+        if not db.has_collection(skeleton):
+            LOG.warning(
+                f'No skeleton collection "{skeleton}" - structural queries scan the documents'
+            )
+            skeleton = None
+        self.source = ArangoSource(
+            db,
+            arango.collection,
+            cache=arango.get("query_cache", False),
+            skeleton_name=skeleton,
+        )
+
+    @property
+    def requests_session(self):
+        """ One requests session per thread (used by parallel workers) or the
+            shared async HTTP engine or request sink (--sink)
+        """
+
+        if self._http_engine is not None:
+            return self._http_engine
+
+        session = getattr(self._local, "requests_session", None)
+        if session is None:
+            session = requests.Session()
+            retries = Retry(
+                total=6,
+                backoff_factor=20,
+                status_forcelist=[500, 502, 503, 504],
+                method_whitelist=RETRY_METHODS,
+            )
+            session.mount("http://", HTTPAdapter(max_retries=retries))
+            session.mount("https://", HTTPAdapter(max_retries=retries))
+            session.hooks["response"].append(self._observe_response)
+            self._local.requests_session = session
+        return session
+
+    def _observe_response(self, response, *args, **kw):
+        """ Record latency and transferred bytes of an HTTP response (requests
+            response hook, also used for httpx responses)
+        """
+
+        request = response.request
+        body = getattr(request, "body", None)
+        if body is None:
+            body = getattr(request, "content", None) or b""  # httpx
+        path = urllib.parse.urlparse(str(request.url)).path
+        endpoint = "content"  # plone.restapi content URL
+        for segment in reversed(path.split("/")):
+            if segment.startswith("@"):
+                endpoint = segment
+                break
+        metrics.observe(
+            "http",
+            f"{request.method} {endpoint}",
+            response.elapsed.total_seconds(),
+            sent=len(body),
+            received=len(response.content),
+        )
+
+    def close(self):
+        """ Release resources held by the migrator """
+        if self._http_engine is not None:
+            self._http_engine.close()
+        if self.journal is not None:
+            self.journal.close()
+        self.source.close()
+
+    def _load_journal(self):
+        """ Rebuild the deferred bookkeeping from the journal (--resume) """
+
+        for name in JOURNALED_ATTRIBUTES:
+            getattr(self, name).update(self.journal.load(name))
+        LOG.info(
+            f'Resuming migration from {self.journal.filename}: {self.journal.count("created")} objects already created'
+        )
+
+    def _defer(self, name, _key, value):
+        """ Remember deferred bookkeeping `value` in the attribute `name` (and
+            the journal). Empty values (nothing deferred) are not recorded.
+        """
+
+        if not value:
+            return
+        getattr(self, name)[_key] = value
+        if self.journal is not None:
+            self.journal.record(name, _key, value)
+
+    def _journal(self, _key, phase, path=None):
+        """ Record that `_key` passed the given migration `phase` """
+        if self.journal is not None:
+            self.journal.mark(_key, phase, path)
+
+    def _journaled(self, _key, phase):
+        """ Check if `_key` passed the given migration `phase` in a previous run """
+        return (
+            self.journal is not None
+            and getattr(self.args, "resume", False)
+            and self.journal.is_done(_key, phase)
         )
-        self.requests_session.mount("http://", HTTPAdapter(max_retries=retries))
-        self.requests_session.mount("https://", HTTPAdapter(max_retries=retries))
+
+    def _resume_object(self, path, _key):
+        """ Check if the object `_key` has been created by a previous run and
+            apply missing post-create settings. Returns True if the object
+            must not be created again.
+        """
+
+        if not self._journaled(_key, "created"):
+            return False
+
+        if not self._journaled(_key, "metadata"):
+            object_data = self.fetch(_key, POST_CREATE_FIELDS)
+            self._post_create(path, object_data)
+            self._journal(_key, "metadata", path)
+        return True
 
     @timeit
-    def _query_aql(self, query):
-        result = self.db.aql.execute(query)
+    def _query(self, name, batch_size=None, **bind_vars):
+        """ Execute the named query `name` from the query catalog """
+        result = self.source.query(name, batch_size=batch_size, **bind_vars)
         return result
 
     @timeit
     def _object_by_key(self, key):
-        result = self.collection.get(dict(_key=key))
+        result = self.fetch(key)
         return result
 
+    @timeit
+    def fetch(self, key, fields=None):
+        """ Return the document for `key` (None for an unknown key).
+            `fields` restricts the document to the given attributes
+            (projection) e.g. in order to avoid loading binary data.
+        """
+
+        if fields is None:
+            return self.source.get(key)
+
+        result = self._query("document", key=key, fields=["_key"] + list(fields))
+        result = [r for r in result]
+        return result[0] if result else None
+
+    def _objects_by_keys(self, keys, fields=None):
+        """ Generator returning the documents for all `keys` (in order of
+            `keys`, None for unknown keys). Documents are fetched in chunks of
+            `--fetch-chunk-size` documents and the next chunk is read ahead in
+            a background thread while the current chunk is processed.
+            `fields` restricts the documents to the given attributes.
+            Without `fields` the documents come without the base64 data of
+            their binary fields (see `_binary_field()`) so that the memory
+            used by a chunk does not depend on the size of files and images.
+        """
+
+        keys = list(keys)
+        chunk_size = getattr(self.args, "fetch_chunk_size", DOCUMENT_CHUNK_SIZE)
+        chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+        if not chunks:
+            return
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._fetch_chunk, chunks[0], fields)
+            for i, chunk in enumerate(chunks):
+                documents = future.result()
+                if i + 1 < len(chunks):
+                    future = executor.submit(self._fetch_chunk, chunks[i + 1], fields)
+                for key in chunk:
+                    yield documents.get(key)
+
+    @timeit
+    def _fetch_chunk(self, keys, fields=None):
+        """ Fetch documents for `keys` with one request as dict _key -> document
+            (without binary data if no `fields` are given)
+        """
+
+        if fields is None:
+            result = self._query("documents_without_binaries", batch_size=len(keys), keys=keys)
+        else:
+            result = self._query(
+                "documents",
+                batch_size=len(keys),
+                keys=keys,
+                fields=["_key"] + list(fields),
+            )
+        return dict((doc["_key"], doc) for doc in result)
+
+    def _binary_field(self, _key, object_data, name):
+        """ The exported file/image field `name` of `object_data`. Documents
+            prefetched by `_objects_by_keys()` come without the base64 data
+            which is then fetched for this object only.
+        """
+
+        field = object_data[name]
+        if "data" not in field and "sha256" not in field:
+            field = self.fetch(_key, [name])[name]
+        return field
+
     @timeit
     def _object_by_path(self, path):
-        query = f"""
-            FOR doc in  {self.collection_name}
-                FILTER doc._path == '{path}'
-                RETURN {{path: doc._path,
-                        portal_type: doc._type,
-                        id: doc._id,
-                        title: doc.title,
-                        _key: doc._key
-                       }}
-                """
-
-        result = self._query_aql(query)
+        result = self._query("object_by_path", path=path)
         result = [r for r in result]
         if len(result) == 1:
             return result[0]
@@ -228,7 +509,9 @@ class Migrator:
         """ Convert a date string from collective.jsonify export format to ISO8601 """
         if s in (None, "None"):
             return None
-        dt = dateparser.parse(s)
+        dt = dates.parse_date(s)
+        if dt is None:
+            raise ValueError(f"Unable to parse date: {s}")
         return dt.isoformat()
 
     @property
@@ -260,6 +543,10 @@ class Migrator:
             for d in response.json()['items']:
                 self.vocabularies[name][d['token']] = d['title']
 
+    def _get_subdepartments(self):
+        """ Known subdepartments (empty list = no validation) """
+        return self._subdepartments
+
     def _check_value_in_vocabulary(self, vocabulary_name, value):
         """ Check if the given `value` (aka a "token") exists in the given remote vocabulary """
 
@@ -344,6 +631,9 @@ class Migrator:
     def remote_exists(self, path):
         """ Check if the given `path` exists on the remote Plone site """
 
+        if self.inventory is not None:
+            return path.strip("/") in self.inventory
+
         url = f"{self.config.plone.url}/{self.config.site.id}/@@remote-exists"
         response = self.requests_session.get(url, auth=self._auth, params=dict(path=path))
         if response.status_code in [200, 204]:
@@ -355,6 +645,45 @@ class Migrator:
             response=response,
         )
 
+    @timeit
+    def load_inventory(self, path=""):
+        """ Load the paths of all existing objects of the target site (below
+            `path`) using @@inventory. Afterwards `remote_exists()` is an
+            in-memory lookup. The inventory is updated for each created object.
+        """
+
+        LOG.info(f"Loading inventory of target site")
+        url = f"{self.config.plone.url}/{self.config.site.id}/@@inventory"
+        inventory = set()
+        b_start = 0
+        while b_start is not None:
+            response = self.requests_session.get(
+                url,
+                auth=self._auth,
+                headers=self._json_headers,
+                params=dict(path=path, b_start=b_start, b_size=INVENTORY_BATCH_SIZE),
+            )
+            if response.status_code != 200:
+                raise MigrationError(
+                    f"Inventory failed for {url}: {response.text}", response=response
+                )
+            result = response.json()
+            inventory.update(item["path"] for item in result["items"])
+            b_start = result["next"]
+
+        self.inventory = inventory
+        LOG.info(f"Inventory: {len(inventory)} existing objects")
+
+    def _skip_existing(self, path):
+        """ Check if `path` exists already on the target site and must be skipped
+            (--skip-existing)
+        """
+
+        if self.args.skip_existing and self.inventory is not None and path in self.inventory:
+            LOG.info(f"EXISTS: {path}")
+            return True
+        return False
+
     @timeit
     def remote_exists_old(self, path):
         """ Check if the given `path` exists on the remote Plone site """
@@ -371,24 +700,224 @@ class Migrator:
         )
 
     @timeit
-    def _create_object(self, path, _key):
-        """ Create remote content for the given path and the _key data """
+    def _create_object(self, path, _key, object_data=None):
+        """ Create remote content for the given path and the _key data
+            (`object_data` is the already fetched document, if available)
+        """
+
+        if self._resume_object(path, _key) or self._skip_existing(path):
+            return
+
+        ts = time.time()
+        try:
+            prepared = self._prepare_object(path, _key, object_data)
+        except Exception:
+            # release the binary data remembered for the upload
+            self._pending_uploads.pop(_key, None)
+            raise
+        if prepared is None:
+            return
+        resource_path, data, object_data = prepared
+        metrics.observe("prepare", object_data["_type"], time.time() - ts)
+        self._send_object(path, _key, resource_path, data, object_data)
+
+    def _send_object(self, path, _key, resource_path, data, object_data):
+        """ Create the prepared object with a plone.restapi POST, upload
+            large binary data and apply all post-create settings
+        """
+
+        #        LOG.info('Creating', resource_path, data)
+        ts = time.time()
+        url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}"
 
-        object_data = self._object_by_key(_key)
+        # large binary data to upload after the creation (released by this
+        # call, also if the creation fails)
+        upload = self._pending_uploads.pop(_key, None)
 
         post_create_data = {}
-        default_page_data = None
 
-        # UIDs must be assigned after full migration
-        self._deferred_uids[_key] = dict()
+        result = self.requests_session.post(
+            url,
+            auth=self._auth,
+            headers=self._json_headers,
+            data=json.dumps(data, cls=CustomJSONEncoder),
+        )
+        if result.status_code not in (200, 201):
+            raise MigrationError(result.text, response=result)
+
+        if upload:
+            self._upload_blob(path, *upload)
+
+        self._journal(_key, "created", path)
+        if self.inventory is not None:
+            self.inventory.add(path)
+
+        self._post_create(path, object_data)
+        self._journal(_key, "metadata", path)
+
+        if post_create_data:
+            url2 = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/{data['id']}"
+            result2 = self.requests_session.patch(
+                url2,
+                auth=self._auth,
+                headers=self._json_headers,
+                data=json.dumps(post_create_data, cls=CustomJSONEncoder),
+            )
+            if result2.status_code != 204:
+                raise MigrationError(result.text, response=result2)
+
+        metrics.observe("type", object_data["_type"], time.time() - ts)
+
+    @timeit
+    def _create_objects_bulk(self, items):
+        """ Create remote content for a list of (path, _key) tuples using
+            @@bulk-create. Items are sent in batches limited by
+            `--bulk-size` (number of items) and `--bulk-bytes` (payload size).
+        """
+
+        batch = list()
+        batch_bytes = 0
+        num_items = len(items)
+        documents = self._objects_by_keys(_key for path, _key in items)
+        for i, ((path, _key), object_data) in enumerate(zip(items, documents)):
+            LOG.info(f"{i+1}/{num_items} {path}")
+            try:
+                if self._resume_object(path, _key) or self._skip_existing(path):
+                    continue
+                ts = time.time()
+                prepared = self._prepare_object(path, _key, object_data)
+            except Exception as e:
+                self._pending_uploads.pop(_key, None)
+                LOG.info(f"MigrationError: {path}: {e}", exc_info=True)
+                continue
+            if prepared is None:
+                continue
+
+            resource_path, data, object_data = prepared
+            if _key in self._pending_uploads:
+                # large binaries are uploaded separately after creation
+                try:
+                    self._send_object(path, _key, resource_path, data, object_data)
+                except Exception as e:
+                    LOG.info(f"MigrationError: {path}: {e}", exc_info=True)
+                continue
+
+            item = dict(container=resource_path, data=data)
+            if not self.args.per_setting_metadata:
+                item["metadata"] = self._migration_metadata(object_data)
+            encoded = json.dumps(item, cls=CustomJSONEncoder)
+            metrics.observe("prepare", object_data["_type"], time.time() - ts)
+
+            if batch and (
+                len(batch) >= self.args.bulk_size
+                or batch_bytes + len(encoded) > self.args.bulk_bytes
+            ):
+                self._send_bulk_batch(batch)
+                batch = list()
+                batch_bytes = 0
+
+            batch.append((path, object_data, encoded))
+            batch_bytes += len(encoded)
+
+        if batch:
+            self._send_bulk_batch(batch)
+
+    @timeit
+    def _send_bulk_batch(self, batch):
+        """ Send one batch of (path, object_data, encoded item) to @@bulk-create """
+
+        LOG.info(f"bulk-create: {len(batch)} items")
+        url = f"{self.config.plone.url}/{self.config.site.id}/@@bulk-create"
+        # items are already JSON encoded (for measuring the batch size)
+        body = '{"items": [' + ", ".join(encoded for _, _, encoded in batch) + "]}"
+        ts = time.time()
+        try:
+            result = self.requests_session.post(
+                url, auth=self._auth, headers=self._json_headers, data=body
+            )
+            if result.status_code != 200:
+                raise MigrationError(
+                    f"Error creating objects: {url}: {result.text}", response=result
+                )
+        except Exception as e:
+            for path, _, _ in batch:
+                LOG.info(f"MigrationError: {path}: {e}", exc_info=True)
+            return
+
+        result = result.json()
+        for error in result["errors"]:
+            path = batch[error["index"]][0]
+            LOG.info(f'MigrationError: {path}: {error["error"]}')
+
+        for created in result["created"]:
+            path, object_data, _ = batch[created["index"]]
+            self._journal(object_data["_key"], "created", path)
+            if self.inventory is not None:
+                self.inventory.add(path)
+            for name, error in created["metadata_errors"].items():
+                LOG.error(f"Error setting {name} for {path}: {error}")
+            try:
+                self._post_create(path, object_data, metadata_applied=True)
+            except Exception as e:
+                LOG.info(f"MigrationError: {path}: {e}", exc_info=True)
+                continue
+            self._journal(object_data["_key"], "metadata", path)
+
+        # the batch time is distributed evenly over its items
+        duration = (time.time() - ts) / len(batch)
+        for _, object_data, _ in batch:
+            metrics.observe("type", object_data["_type"], duration)
+
+    def _post_create(self, path, object_data, metadata_applied=False):
+        """ Apply all post-create settings to the created object `path`.
+            `metadata_applied` indicates that @@bulk-create already applied the
+            @@apply-migration-metadata settings.
+        """
+
+        if self.args.per_setting_metadata:
+            self._set_owner(path, object_data)
+            self._set_layout(path, object_data)
+    #        self._set_default_page(path, object_data)
+            self._set_unavailable(path, object_data)
+            self._set_review_state(path, object_data)
+            self._set_related_items(path, object_data)
+            self._set_local_roles(path, object_data)
+
+            self._set_uid(path, object_data)
+            self._set_created_modified(path, object_data)
+            # apply folder restrictions after migration because otherwise we can not migrate properly
+            #        self._set_allowed_and_addable_types(path, object_data)
+            self._set_position_in_parent(path, object_data)
+            self._set_marker_interfaces(path, object_data)
+            self._set_portlet_blacklist(path, object_data)
+            self._set_permissions(path, object_data)
+        else:
+            # collective.unavailable provides its own view
+            self._set_unavailable(path, object_data)
+            if not metadata_applied:
+                self._apply_migration_metadata(path, object_data)
+
+    #        self._set_portlets(path, object_data)
+
+    def _prepare_object(self, path, _key, object_data=None):
+        """ Prepare the plone.restapi data for creating remote content for
+            the given path and the _key data. Returns a tuple
+            (resource_path, data, object_data) or None if the object must
+            not be created.
+        """
+
+        if object_data is None:
+            object_data = self._object_by_key(_key)
+
+        default_page_data = None
 
         default_page = object_data.get('_defaultpage')
         if default_page:
-            self._deferred_default_pages[_key] = default_page
+            self._defer("_deferred_default_pages", _key, default_page)
 
         # have portlets
         if object_data.get("_portlets"):
-            self._content_with_portlets[_key] = path
+            self._defer("_content_with_portlets", _key, path)
 
         # _type is always available
         # _meta_type is available from a particular JSON export version on
@@ -424,7 +953,7 @@ class Migrator:
 
         related_items = object_data.get("relatedItems", ())
         if related_items:
-            self._all_related_items[object_data["_uid"]] = related_items
+            self._defer("_all_related_items", object_data["_uid"], related_items)
 
         effective = self._to_iso8601(object_data.get("effectiveDate"))
         if effective:
@@ -443,7 +972,7 @@ class Migrator:
 
             all_subdepartments = self._get_subdepartments()
             subdepartment = object_data.get("subdepartment", "")
-            if subdepartment and not subdepartment in all_subdepartments:
+            if subdepartment and all_subdepartments and not subdepartment in all_subdepartments:
                 LOG.error(f"Unknown subdepartment {subdepartment} for {path} ")
                 subdepartment = ''
             data["subdepartment"] = subdepartment
@@ -468,7 +997,7 @@ class Migrator:
 
         elif object_data["_type"] == "File":
             try:
-                file_data = object_data["_datafield_file"]
+                file_data = self._binary_field(_key, object_data, "_datafield_file")
             except KeyError:
                 LOG.info(
                     f"ERROR: JSON export has no _datafield_file for {path} - SKIPPING"
@@ -476,7 +1005,7 @@ class Migrator:
                 return
 
             data["file"] = {
-                "data": file_data["data"],
+                "data": self._inline_data(_key, file_data, file_data["content_type"], file_data["filename"]),
                 "encoding": "base64",
                 "content-type": file_data["content_type"],
                 "filename": file_data["filename"],
@@ -484,7 +1013,7 @@ class Migrator:
 
         elif object_data["_type"] == "Image":
             try:
-                img_data = object_data["_datafield_image"]
+                img_data = self._binary_field(_key, object_data, "_datafield_image")
             except KeyError:
                 LOG.info(
                     f"ERROR: JSON export has no _datafield_image for {path} - SKIPPING"
@@ -496,12 +1025,10 @@ class Migrator:
             # images like BMPs are exported with content_type application/octet-stream which
             # are not properly recognized by plone.restapi
             if not ct.startswith("image/"):
-                mime = magic.Magic(mime=True)
-                image_data = base64.b64decode(img_data["data"])
-                ct = mime.from_buffer(image_data)
+                ct = mime_type(field_bytes(img_data, self.blob_store, HEADER_SIZE))
 
             data["image"] = {
-                "data": img_data["data"],
+                "data": self._inline_data(_key, img_data, ct, img_data["filename"]),
                 "encoding": "base64",
                 "content-type": ct,
                 "filename": img_data["filename"],
@@ -524,8 +1051,7 @@ class Migrator:
             )
 
         elif object_data["_type"] == "RichFolder":
-            import pdb; pdb.set_trace()
-            data["_type"] = 'Folder'
+            data["@type"] = 'Folder'
 
         elif object_data["_type"] == "FormFolder":
             self._migrate_FormFolder(data, object_data)
@@ -533,51 +1059,65 @@ class Migrator:
         elif object_data["_type"] == "Topic":
             self._migrate_Topic(data, object_data)
 
-
         resource_path = "/".join(path.split("/")[:-1])
-        #        LOG.info('Creating', resource_path, data)
-        url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}"
-
+        return resource_path, data, object_data
 
-        result = self.requests_session.post(
-            url,
-            auth=self._auth,
-            headers=self._json_headers,
-            data=json.dumps(data, cls=CustomJSONEncoder),
-        )
-        if result.status_code not in (200, 201):
-            raise MigrationError(result.text, response=result)
+    def _inline_data(self, _key, field, content_type, filename):
+        """ Return the base64 data of the exported file/image `field` to embed
+            into the JSON request for creating a File or Image. Data larger
+            than `--upload-threshold` bytes is replaced with an empty
+            placeholder and uploaded in chunks after the creation of the object.
+        """
 
+        threshold = getattr(self.args, "upload_threshold", 0)
+        if not threshold or field_size(field) <= threshold:
+            return field_base64(field, self.blob_store)
 
-        self._set_owner(path, object_data)
-        self._set_layout(path, object_data)
-#        self._set_default_page(path, object_data)
-        self._set_unavailable(path, object_data)
-        self._set_review_state(path, object_data)
-        self._set_related_items(path, object_data)
-        self._set_local_roles(path, object_data)
+        self._pending_uploads[_key] = (field, content_type, filename)
+        return ""
 
-        self._set_uid(path, object_data)
-        self._set_created_modified(path, object_data)
-        # apply folder restrictions after migration because otherwise we can not migrate properly
-        #        self._set_allowed_and_addable_types(path, object_data)
-        self._set_position_in_parent(path, object_data)
-        self._set_marker_interfaces(path, object_data)
-        self._set_portlet_blacklist(path, object_data)
-        self._set_permissions(path, object_data)
+    @timeit
+    def _upload_blob(self, resource_path, field, content_type, filename):
+        """ Replace the primary field (file/image) of `resource_path` with the
+            data of the exported `field` using the TUS protocol of
+            plone.restapi (@tus-replace). The data is sent in chunks of
+            `--upload-chunk-size` bytes (decoded from base64 or read from the
+            blob store).
+        """
 
-    #        self._set_portlets(path, object_data)
+        url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/@tus-replace"
+        headers = {
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": str(field_size(field)),
+            "Upload-Metadata": tus_metadata(
+                **{"filename": filename or "", "content-type": content_type}
+            ),
+        }
+        result = self.requests_session.post(url, auth=self._auth, headers=headers)
+        if result.status_code != 201:
+            raise MigrationError(
+                f"Error starting upload: {url}: {result.text}", response=result
+            )
 
-        if post_create_data:
-            url2 = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/{data['id']}"
-            result2 = self.requests_session.patch(
-                url2,
+        location = result.headers["Location"]
+        offset = 0
+        for chunk in iter_field_chunks(field, self.args.upload_chunk_size, self.blob_store):
+            result = self.requests_session.patch(
+                location,
                 auth=self._auth,
-                headers=self._json_headers,
-                data=json.dumps(post_create_data, cls=CustomJSONEncoder),
+                headers={
+                    "Tus-Resumable": "1.0.0",
+                    "Upload-Offset": str(offset),
+                    "Content-Type": "application/offset+octet-stream",
+                },
+                data=chunk,
             )
-            if result2.status_code != 204:
-                raise MigrationError(result.text, response=result2)
+            if result.status_code != 204:
+                raise MigrationError(
+                    f"Error uploading chunk (offset {offset}): {location}: {result.text}",
+                    response=result,
+                )
+            offset += len(chunk)
 
     @timeit
     def _migrate_FormFolder(self, data, object_data):
@@ -592,20 +1132,7 @@ class Migrator:
 
         # query for subobjects by path
         form_path = object_data["_path"]
-        query = f"""
-            FOR doc in  {self.collection_name}
-                FILTER '{form_path}' in doc._paths_all
-                SORT doc._gopip
-                RETURN {{path: doc._path,
-                        portal_type: doc._type,
-                        id: doc._id,
-                        title: doc.title,
-                        _key: doc._key,
-                        position_in_parent: doc._gopip
-                       }}
-                """
-
-        result = self._query_aql(query)
+        result = self._query("children_by_position", path=form_path)
         _keys = [r["_key"] for r in result]
 
         pfg_migrator = PFGMigrator(
@@ -623,20 +1150,7 @@ class Migrator:
 
         # query for subobjects by path
         form_path = object_data["_path"]
-        query = f"""
-            FOR doc in  {self.collection_name}
-                FILTER '{form_path}' in doc._paths_all
-                SORT doc._gopip
-                RETURN {{path: doc._path,
-                        portal_type: doc._type,
-                        id: doc._id,
-                        title: doc.title,
-                        _key: doc._key,
-                        position_in_parent: doc._gopip
-                       }}
-                """
-
-        result = self._query_aql(query)
+        result = self._query("children_by_position", path=form_path)
         _keys = [r["_key"] for r in result]
 
         topic_migrator = TopicMigrator(
@@ -671,6 +1185,65 @@ class Migrator:
                 f"Error setting UID: {url}: {result.text}", response=result
             )
 
+    def _migration_metadata(self, object_data):
+        """ Collect all post-create settings of an object as expected by
+            @@apply-migration-metadata
+        """
+
+        local_roles = object_data["_ac_local_roles"]
+        if local_roles:
+            local_roles = dict(
+                roles=local_roles,
+                block=object_data.get("_ac_local_roles_block", False),
+            )
+
+        blacklist = object_data.get("_portlets_blacklist", {})
+
+        return dict(
+            owner=self._owner(object_data),
+            layout=self._layout(object_data),
+            review_state=object_data.get("review_state"),
+            local_roles=local_roles,
+            uid=object_data["_uid"],
+            created=object_data.get("creation_date"),
+            modified=object_data.get("modification_date"),
+            position=object_data["_gopip"],
+            interfaces=self._marker_interfaces(object_data),
+            portlet_blacklist=[
+                portlet_manager
+                for portlet_manager in ("plone.leftcolumn", "plone.rightcolumn")
+                if blacklist.get(portlet_manager)
+            ],
+            permissions=self._permissions(object_data),
+        )
+
+    @timeit
+    def _apply_migration_metadata(self, resource_path, object_data):
+        """ Apply all post-create settings with a single request """
+
+        metadata = self._migration_metadata(object_data)
+        url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/@@apply-migration-metadata"
+        result = self.requests_session.post(
+            url,
+            auth=self._auth,
+            headers=self._json_headers,
+            data=json.dumps(metadata, cls=CustomJSONEncoder),
+        )
+        if result.status_code != 200:
+            raise MigrationError(
+                f"Error applying migration metadata: {url}: {result.text}",
+                response=result,
+            )
+
+        errors = result.json()["errors"]
+        for name, error in errors.items():
+            LOG.error(f"Error setting {name} for {resource_path}: {error}")
+        if errors:
+            raise MigrationError(
+                f"Error applying migration metadata: {url}: {', '.join(errors)}",
+                response=result,
+            )
+
     @timeit
     def _set_deferred_uids(self, resource_path, mapping):
         """ added portlets """
@@ -687,12 +1260,15 @@ class Migrator:
         )
         check_204_response(result)
 
+    def _owner(self, object_data):
+        """ Owner tuple for the target site """
+        return (['plone_portal', 'acl_users'], object_data['_owner'])
+
     @timeit
     def _set_owner(self, resource_path, object_data):
         """ added portlets """
 
-        owner = object_data['_owner']
-        owner = (['plone_portal', 'acl_users'], owner)
+        owner = self._owner(object_data)
 
         url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/@@set-owner"
 #        LOG.info(f'_set_owner(path: "{resource_path}":\n{pprint.pformat(owner)}')
@@ -819,18 +1395,16 @@ class Migrator:
                 f"Error setting default page: {url}: {result.text}", response=result
             )
 
-    @timeit
-    def _set_layout(self, resource_path, object_data):
-        """ Set default page
-        """
+    def _layout(self, object_data):
+        """ Map the exported layout to a Plone 5 layout (None = keep default layout) """
 
         layout = object_data.get('_layout')
         if not layout:
-            return
+            return None
 
         # see PCM-1818
         if layout in ('fg_base_view_p3', 'blog_view', 'facetednavigation_view', 'list.html', 'sliderview', 'phddefense_view', 'manualgroup_view'):
-            return
+            return None
 
         if layout == 'atct_album_view':
             layout = 'album_view'
@@ -852,6 +1426,16 @@ class Migrator:
         if layout in ('sortable_view', 'sortable_view_unbatched', 'folder_tabular_view'):
             layout = 'tabular_view'
 
+        return layout
+
+    @timeit
+    def _set_layout(self, resource_path, object_data):
+        """ Set default page
+        """
+
+        layout = self._layout(object_data)
+        if not layout:
+            return
 
         url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/@@set-layout"
         result = self.requests_session.post(
@@ -978,14 +1562,19 @@ class Migrator:
                     response=result,
                 )
 
+    def _permissions(self, object_data):
+        """ Exported permission settings without ignored permissions """
+
+        permissions = object_data.get("_permissions", {})
+        return dict(
+            [(k, v) for k, v in permissions.items() if k not in IGNORED_PERMISSIONS]
+        )
+
     @timeit
     def _set_permissions(self, resource_path, object_data):
         """ Set marker interfaces """
 
-        permissions = object_data.get("_permissions", ())
-        permissions = dict(
-            [(k, v) for k, v in permissions.items() if k not in IGNORED_PERMISSIONS]
-        )
+        permissions = self._permissions(object_data)
 
         if permissions:
             url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/@@set-permissions"
@@ -1003,15 +1592,20 @@ class Migrator:
                     response=result,
                 )
 
-    @timeit
-    def _set_marker_interfaces(self, resource_path, object_data):
-        """ Set marker interfaces """
+    def _marker_interfaces(self, object_data):
+        """ Directly provided marker interfaces supported by the migration """
 
         directly_provided = object_data.get("_directly_provided", ())
-        directly_provided = [
+        return [
             iface for iface in directly_provided if iface in SUPPORTED_MARKER_INTERFACES
         ]
 
+    @timeit
+    def _set_marker_interfaces(self, resource_path, object_data):
+        """ Set marker interfaces """
+
+        directly_provided = self._marker_interfaces(object_data)
+
         if directly_provided:
             url = f"{self.config.plone.url}/{self.config.site.id}/{resource_path}/@@set-marker-interfaces"
             result = self.requests_session.post(
@@ -1150,36 +1744,55 @@ class Migrator:
         LOG.info("*" * 80)
 
         # remove remote folder before migration
-        if self.args.remove_remote_folders:
+        if self.args.remove_remote_folders and not self.args.resume:
             self._delete_resource(folder_name)
+            if self.inventory is not None:
+                relative_path = "/".join(folder_name.split("/")[2:])
+                self.inventory = set(
+                    p for p in self.inventory
+                    if p != relative_path and not p.startswith(relative_path + "/")
+                )
 
-        query = f"""
-            FOR doc in  {self.collection_name}
-                FILTER '{folder_name}' in doc._paths_all || '{folder_name}' == doc._path
-                LIMIT 99999999999
-                RETURN {{path: doc._path,
-                        portal_type: doc._type,
-                        id: doc._id,
-                        title: doc.title,
-                        _key: doc._key
-                       }}
-                """
-
-        result = self._query_aql(query)
+        result = self._query("subtree", path=folder_name)
         result = sorted(result, key=lambda x: x["portal_type"])
 
-        # group exportable items by portal_type
-        result_by_portal_type = itertools.groupby(result, lambda x: x["portal_type"])
-
-        # recreate folder structure
-        result_by_portal_type = itertools.groupby(result, lambda x: x["portal_type"])
         all_folder_keys = list()  # remember folder keys for later
 
         # remember top-level folder for folder constraints
         folder_data = self._object_by_path(folder_name)
         all_folder_keys.append(folder_data["_key"])
 
-        import pdb; pdb.set_trace()
+        if self.args.workers > 1:
+            all_folder_keys.extend(self._migrate_items_parallel(folder_name, result))
+        else:
+            all_folder_keys.extend(self._migrate_items(result))
+
+        # final fixup for folders
+        folder_keys = [
+            key for key in all_folder_keys if not self._journaled(key, "folder_constraints")
+        ]
+        documents = self._objects_by_keys(folder_keys, FOLDER_CONSTRAINTS_FIELDS)
+        for key, object_data in zip(folder_keys, documents):
+            # add folder restrictions to folderish objects
+            self._set_allowed_and_addable_types(
+                object_data["_relative_path"], object_data
+            )
+            self._journal(key, "folder_constraints")
+
+        # migrate all relatedItems after all content has been created
+        self._update_all_related_items()
+        self._update_all_imagerefs()
+
+    def _migrate_items(self, result):
+        """ Create all folders (sorted by depth) and then all other content
+            grouped by portal_type. `result` must be sorted by portal_type.
+            Returns the _key values of all created folderish objects.
+        """
+
+        folder_keys = list()
+
+        # recreate folder structure
+        result_by_portal_type = itertools.groupby(result, lambda x: x["portal_type"])
         for portal_type, items in result_by_portal_type:
 
             if portal_type not in FOLDERISH_PT:
@@ -1188,38 +1801,14 @@ class Migrator:
 
             # sort folder paths by depth
             items = sorted(items, key=lambda x: x["path"].count("/"))
-            import pdb; pdb.set_trace()
+            folder_keys.extend(item["_key"] for item in items)
+            items = self._unfinished(items)
             num_items = len(items)
-            for i, item in enumerate(items):
+            documents = self._objects_by_keys(item["_key"] for item in items)
+            for i, (item, object_data) in enumerate(zip(items, documents)):
 
                 LOG.info(f"{i+1}/{num_items} Folder {item['path']}")
-                path_components = item["path"].split("/")
-                path_components = [
-                    pc for pc in path_components if pc and pc != self.config.site.id
-                ]
-
-                # construct all parent paths and check if they exist on the target site
-                # and if necessary recreate the related content
-                for i in range(len(path_components)):
-                    parent_path = "/".join(path_components[:i])
-                    if not parent_path:
-                        continue
-
-                    # check if parent_path exists on remote_portal
-                    if parent_path in PARENT_EXISTS_CACHE:
-                        parent_path_exists = True
-                    else:
-                        parent_path_exists = self.remote_exists(parent_path)
-                        PARENT_EXISTS_CACHE[parent_path] = True
-
-                    # parent path exists -> nothing to do
-                    if parent_path_exists:
-                        continue
-
-                    # create new folderish object
-                    parent_path_full = f"/{self.config.site.id}/{parent_path}"
-                    parent_data = self._object_by_path(parent_path_full)
-                    self._create_object(parent_path, parent_data["_key"])
+                self._create_parents(item["path"])
 
                 # now reconstruct item content after we are sure that the parent
                 # structure exists
@@ -1227,8 +1816,7 @@ class Migrator:
                 item_path = "/".join(
                     item["path"].split("/")[2:]
                 )  # omit empty "" and portal_id
-                self._create_object(item_path, item["_key"])
-                all_folder_keys.append(item["_key"])
+                self._create_object(item_path, item["_key"], object_data)
 
         # now content
         # we need to re-groupby because groupby() returns an iterator
@@ -1239,68 +1827,152 @@ class Migrator:
             if portal_type in FOLDERISH_PT:
                 continue
 
-            if (
-                self.config.migration.excluded_content_types
-                and portal_type in self.config.migration.content_types
-            ):
-                LOG.info(
-                    f'Skipping processing of "{portal_type}" due to `excluded_content_types` configuration'
-                )
+            if self._skip_portal_type(portal_type):
                 continue
 
-            if (
-                self.config.migration.content_types
-                and not portal_type in self.config.migration.content_types
-            ):
-                LOG.info(
-                    f'Skipping processing of "{portal_type}" due to `content_types` configuration'
+            items = self._unfinished(items)
+            num_items = len(items)
+
+            if portal_type in PROCESSED_TYPES and self.args.bulk_size > 1:
+                LOG.info(f"Processing portal_type: {portal_type} (bulk)")
+                self._create_objects_bulk(
+                    [
+                        ("/".join(item["path"].split("/")[2:]), item["_key"])
+                        for item in items
+                    ]
                 )
                 continue
 
-            items = [x for x in items]
-            num_items = len(items)
-            for i, item in enumerate(items):
-
-                if portal_type in PROCESSED_TYPES:
-                    item_path = "/".join(
-                        item["path"].split("/")[2:]
-                    )  # omit empty "" and portal_id
-                    LOG.info(f"{i+1}/{num_items} {portal_type} {item_path}")
-                    try:
-                        self._create_object(item_path, item["_key"])
-                    except Exception as e:
-                        LOG.info(f'MigrationError: {item["path"]}: {e}', exc_info=True)
+            if portal_type not in PROCESSED_TYPES:
+                continue
 
-        # final fixup for folders
-        for key in all_folder_keys:
-            object_data = self._object_by_key(key)
-            # add folder restrictions to folderish objects
-            self._set_allowed_and_addable_types(
-                object_data["_relative_path"], object_data
+            documents = self._objects_by_keys(item["_key"] for item in items)
+            for i, (item, object_data) in enumerate(zip(items, documents)):
+
+                item_path = "/".join(
+                    item["path"].split("/")[2:]
+                )  # omit empty "" and portal_id
+                LOG.info(f"{i+1}/{num_items} {portal_type} {item_path}")
+                try:
+                    self._create_object(item_path, item["_key"], object_data)
+                except Exception as e:
+                    LOG.info(f'MigrationError: {item["path"]}: {e}', exc_info=True)
+
+        return folder_keys
+
+    def _unfinished(self, items):
+        """ Filter out all items completed by a previous run (--resume) """
+        return [item for item in items if not self._journaled(item["_key"], "metadata")]
+
+    def _migrate_items_parallel(self, folder_name, result):
+        """ Create all folders and content using the CreationScheduler with
+            `--workers` threads. Returns the _key values of all created
+            folderish objects.
+        """
+
+        items = list()
+        for portal_type, type_items in itertools.groupby(result, lambda x: x["portal_type"]):
+            if portal_type in FOLDERISH_PT:
+                items.extend(type_items)
+            elif portal_type in PROCESSED_TYPES and not self._skip_portal_type(portal_type):
+                items.extend(type_items)
+
+        # the parents of the top-level folder must exist before dispatching
+        self._create_parents(folder_name)
+
+        folder_keys = list()
+
+        def create(item):
+            item_path = "/".join(item["path"].split("/")[2:])  # omit empty "" and portal_id
+            LOG.info(f'{item["portal_type"]} {item_path}')
+            self._create_object(item_path, item["_key"])
+            if item["portal_type"] in FOLDERISH_PT:
+                folder_keys.append(item["_key"])
+
+        LOG.info(f"Processing {len(items)} items with {self.args.workers} workers")
+        scheduler = CreationScheduler(create, workers=self.args.workers, log=LOG)
+        scheduler.run(items)
+        return folder_keys
+
+    def _skip_portal_type(self, portal_type):
+        """ Check `portal_type` against the content type filters of the configuration """
+
+        if (
+            self.config.migration.excluded_content_types
+            and portal_type in self.config.migration.content_types
+        ):
+            LOG.info(
+                f'Skipping processing of "{portal_type}" due to `excluded_content_types` configuration'
             )
+            return True
 
-        # migrate all relatedItems after all content has been created
-        self._update_all_related_items()
-        self._update_all_imagerefs()
+        if (
+            self.config.migration.content_types
+            and not portal_type in self.config.migration.content_types
+        ):
+            LOG.info(
+                f'Skipping processing of "{portal_type}" due to `content_types` configuration'
+            )
+            return True
+
+        return False
+
+    def _create_parents(self, path):
+        """ Recreate all missing parent folders of the given (full) `path`
+            on the target site
+        """
+
+        path_components = path.split("/")
+        path_components = [
+            pc for pc in path_components if pc and pc != self.config.site.id
+        ]
+
+        # construct all parent paths and check if they exist on the target site
+        # and if necessary recreate the related content
+        for i in range(len(path_components)):
+            parent_path = "/".join(path_components[:i])
+            if not parent_path:
+                continue
+
+            # parent path exists on remote portal (inventory) -> nothing to do
+            if self.remote_exists(parent_path):
+                continue
+
+            # create new folderish object (added to the inventory)
+            parent_path_full = f"/{self.config.site.id}/{parent_path}"
+            parent_data = self._object_by_path(parent_path_full)
+            self._create_object(parent_path, parent_data["_key"])
+
+    def _pending(self, mapping, phase):
+        """ Keys of `mapping` that did not pass `phase` in a previous run (--resume) """
+        return [_key for _key in mapping if not self._journaled(_key, phase)]
 
     def migrate_portlets(self):
-        for _key, resource_path in self._content_with_portlets.items():
-            object_data = self._object_by_key(_key)
+        keys = self._pending(self._content_with_portlets, "portlets")
+        for _key, object_data in zip(keys, self._objects_by_keys(keys, PORTLETS_FIELDS)):
+            resource_path = self._content_with_portlets[_key]
             self._set_portlets(resource_path, object_data)
+            self._journal(_key, "portlets")
 
     def migrate_deferred_uids(self):
-        for _key, mapping in self._deferred_uids.items():
-            object_data = self._object_by_key(_key)
-            if mapping:
-                self._set_deferred_uids(object_data['_path'], mapping)
+        # only objects with a non-empty mapping need an update
+        keys = [
+            _key for _key in self._pending(self._deferred_uids, "deferred_uids")
+            if self._deferred_uids[_key]
+        ]
+        for _key, object_data in zip(keys, self._objects_by_keys(keys, DEFERRED_UIDS_FIELDS)):
+            self._set_deferred_uids(object_data['_path'], self._deferred_uids[_key])
+            self._journal(_key, "deferred_uids")
 
     def migrate_deferred_default_pages(self):
-        for _key, default_page in self._deferred_default_pages.items():
-            object_data = self._object_by_key(_key)
+        keys = self._pending(self._deferred_default_pages, "default_page")
+        for _key, object_data in zip(keys, self._objects_by_keys(keys, DEFAULT_PAGE_FIELDS)):
             self._set_default_page(object_data['_path'], object_data)
+            self._journal(_key, "default_page")
 
 
-def main():
+def get_parser():
+    """ Commandline options of `migration-import` """
 
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -1322,6 +1994,33 @@ def main():
         default=False,
         help="Incremental import - don't wipe out target plone site",
     )
+    parser.add_argument(
+        "--journal",
+        dest="journal",
+        default=None,
+        help="Checkpoint journal (SQLite) for resuming a migration with --resume (default: no journal)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        default=False,
+        help="Resume a crashed migration from the journal (implies --keep-site)",
+    )
+    parser.add_argument(
+        "--reset-journal",
+        action="store_true",
+        dest="reset_journal",
+        default=False,
+        help="Start a new migration with an existing journal (its entries are removed)",
+    )
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        dest="skip_existing",
+        default=False,
+        help="Incremental import - skip objects already existing on the target site",
+    )
     parser.add_argument(
         "-r",
         "--remove-root-folders",
@@ -1330,13 +2029,141 @@ def main():
         default=False,
         help="Incremental import - remote root folders before import",
     )
+    parser.add_argument(
+        "--per-setting-metadata",
+        action="store_true",
+        dest="per_setting_metadata",
+        default=False,
+        help="Apply post-create settings with one request per setting (instead of @@apply-migration-metadata)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        dest="workers",
+        default=1,
+        help="Number of parallel workers for content creation (1 = sequential migration)",
+    )
+    parser.add_argument(
+        "--sink",
+        choices=["http", "null", "file"],
+        dest="sink",
+        default="http",
+        help="Send requests to Plone (http), discard them (null) or write them as JSONL to --sink-file (file)",
+    )
+    parser.add_argument(
+        "--sink-file",
+        dest="sink_file",
+        default="migration-requests.jsonl",
+        help="Output file for --sink file",
+    )
+    parser.add_argument(
+        "--http-engine",
+        choices=["requests", "httpx"],
+        dest="http_engine",
+        default="requests",
+        help="HTTP transport: blocking `requests` sessions or an asyncio based `httpx` engine",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        dest="concurrency",
+        default=None,
+        help="Maximum number of requests in flight (httpx engine only, default: --workers)",
+    )
+    parser.add_argument(
+        "--bulk-size",
+        type=int,
+        dest="bulk_size",
+        default=50,
+        help="Number of non-folderish objects created per @@bulk-create request (1 = one request per object)",
+    )
+    parser.add_argument(
+        "--bulk-bytes",
+        type=int,
+        dest="bulk_bytes",
+        default=10 * 1024 * 1024,
+        help="Maximum payload size in bytes of a @@bulk-create request",
+    )
+    parser.add_argument(
+        "--upload-threshold",
+        type=int,
+        dest="upload_threshold",
+        default=10 * 1024 * 1024,
+        help="Files and images larger than this size (bytes) are uploaded in chunks via @tus-replace (0 = never)",
+    )
+    parser.add_argument(
+        "--upload-chunk-size",
+        type=int,
+        dest="upload_chunk_size",
+        default=4 * 1024 * 1024,
+        help="Chunk size (bytes) for uploads via @tus-replace",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        dest="metrics_file",
+        default=None,
+        help="Export metrics (latency percentiles, bytes) periodically as JSON to this file",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=int,
+        dest="metrics_interval",
+        default=30,
+        help="Interval (seconds) for writing --metrics-file",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        dest="metrics_port",
+        default=None,
+        help="Serve metrics in Prometheus text format on http://127.0.0.1:<port>/metrics",
+    )
+    parser.add_argument(
+        "--fetch-chunk-size",
+        type=int,
+        dest="fetch_chunk_size",
+        default=DOCUMENT_CHUNK_SIZE,
+        help="Number of documents fetched from ArangoDB per request",
+    )
+    parser.add_argument(
+        "--blob-store",
+        dest="blob_store",
+        default=None,
+        help="Blob store directory used by import-jsondump-into-arangodb --blob-store",
+    )
+    parser.add_argument(
+        "--source",
+        choices=("arango", "filesystem"),
+        default="arango",
+        help="Read the exported content from ArangoDB (default) or directly from "
+        "the collective.jsonify export directory (--source-directory)",
+    )
+    parser.add_argument(
+        "--source-directory",
+        dest="source_directory",
+        default=None,
+        help="collective.jsonify export directory for --source filesystem",
+    )
+    parser.add_argument(
+        "--source-index",
+        dest="source_index",
+        default="migration-source.db",
+        help="SQLite index of the export directory for --source filesystem "
+        "(updated incrementally on each run)",
+    )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="Verbose mode (timing)"
     )
     parser.add_argument(
         "-l", "--log-requests", action="store_true", help="Requests low-level logging"
     )
-    args = parser.parse_args()
+    return parser
+
+
+def main():
+
+    args = get_parser().parse_args()
 
     if args.verbose:
         global VERBOSE
@@ -1369,6 +2196,17 @@ def main():
 
     # prepare Migrator instance with YAML configuration and commandline options
     migrator = Migrator(config, args)
+    migrate(migrator, config, args)
+
+
+def migrate(migrator, config, args):
+    """ Run the complete migration with the given Migrator instance """
+
+    if args.metrics_file:
+        metrics.REGISTRY.start_export(args.metrics_file, args.metrics_interval)
+    if args.metrics_port:
+        metrics.REGISTRY.start_server(args.metrics_port)
+        LOG.info(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
 
     # check languages (triggers an exception if language configuration is missing)
     default_language = migrator.default_language
@@ -1384,7 +2222,9 @@ def main():
             raise ValueError(f"No source information found for {name}")
         LOG.info(f"Precheck OK for {name}")
 
-    if not args.keep_site:
+    if args.resume:
+        LOG.info("Skipping site creation (resuming migration)")
+    elif not args.keep_site:
         if args.ignore_safety_questions:
             migrator.create_plone_site()
         else:
@@ -1400,6 +2240,8 @@ def main():
     LOG.info(f"Migration prepare")
     migrator.prepare()
 
+    migrator.load_inventory()
+
     LOG.info(f"Reading vocabularies")
     migrator.read_vocabularies(INTROSPECT_VOCABULARIES)
 
@@ -1407,13 +2249,27 @@ def main():
 
     # run real migration
     for name in config.migration.folders:
-        migrator.migrate_folder(name)
+        with metrics.timer("phase", f"migrate_folder {name}"):
+            migrator.migrate_folder(name)
 
-    migrator.migrate_portlets()
-    migrator.migrate_deferred_uids()
-    migrator.migrate_deferred_default_pages()
+    with metrics.timer("phase", "migrate_portlets"):
+        migrator.migrate_portlets()
+    with metrics.timer("phase", "migrate_deferred_uids"):
+        migrator.migrate_deferred_uids()
+    with metrics.timer("phase", "migrate_deferred_default_pages"):
+        migrator.migrate_deferred_default_pages()
 
     migrator.fixup()
+    migrator.source.report(LOG)
+    dates.report(LOG)
+    if args.sink != "http":
+        report_throughput(LOG)
+    migrator.close()
+
+    if args.metrics_file:
+        metrics.REGISTRY.write_json(args.metrics_file)
+        LOG.info(f"Metrics written to {args.metrics_file}")
+    metrics.REGISTRY.stop()
 
 
 if __name__ == "__main__":
@@ -77,6 +77,18 @@ class PFGMigrator:
         self.object_data = object_data
         self.child_keys = child_keys
         self.migrator = migrator
+        self._children = None
+
+    @property
+    def children(self):
+        """ Exported data of all child objects (fetched once in chunks) """
+        if self._children is None:
+            self._children = [
+                child_data
+                for child_data in self.migrator._objects_by_keys(self.child_keys)
+                if child_data is not None
+            ]
+        return self._children
 
     def _inspect_fieldsets(self):
 
@@ -95,8 +107,7 @@ class PFGMigrator:
             title="Default (end)", description="Default (end)", items=[]
         )
 
-        for _key in self.child_keys:
-            child_data = self.migrator._object_by_key(_key)
+        for child_data in self.children:
 
             if child_data["_type"] == "FieldsetFolder":
                 fieldsets[child_data["id"]] = dict(
@@ -105,8 +116,7 @@ class PFGMigrator:
                     items=[],
                 )
 
-        for _key in self.child_keys:
-            child_data = self.migrator._object_by_key(_key)
+        for child_data in self.children:
             if child_data["_type"] in ("FieldsetFolder", "FormFolder"):
                 continue
 
@@ -167,8 +177,7 @@ class PFGMigrator:
         fields_added = list()
         action_fields_added = list()
 
-        for _key in self.child_keys:
-            json_data = self.migrator._object_by_key(_key)
+        for json_data in self.children:
 
             try:
                 type_ = json_data["_type"]
@@ -478,10 +487,7 @@ class PFGMigrator:
         try:
             actions_root = lxml.etree.fromstring(actions_xml)
         except Exception as e:
-            print(e)
-            import pdb
-
-            pdb.set_trace()
+            raise ValueError(f"Invalid actions.xml generated for {self.object_data['_path']}: {e}")
 
         # build model.xml
         fieldsets_xml = list()
@@ -521,10 +527,7 @@ class PFGMigrator:
         try:
             fields_root = lxml.etree.fromstring(fields_xml)
         except Exception as e:
-            print(e)
-            import pdb
-
-            pdb.set_trace()
+            raise ValueError(f"Invalid fields.xml generated for {self.object_data['_path']}: {e}")
 
         fields_xml = replace_expressions(fields_xml)
         root = lxml.etree.fromstring(fields_xml)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+# Catalog of named, parameterized AQL queries used by the migration
+
+import collections
+import threading
+import time
+
+from . import metrics
+
+
+# All queries use the bind parameter `@@collection` for the collection name
+QUERIES = {
+    # stub of the object with the given `path`
+    "object_by_path": """
+        FOR doc IN @@collection
+            FILTER doc._path == @path
+            RETURN {path: doc._path,
+                    portal_type: doc._type,
+                    id: doc._id,
+                    title: doc.title,
+                    _key: doc._key
+                   }
+    """,
+    # stubs of the object with the given `path` and all its subobjects
+    "subtree": """
+        FOR doc IN @@collection
+            FILTER @path IN doc._paths_all || @path == doc._path
+            LIMIT 99999999999
+            RETURN {path: doc._path,
+                    parent_path: doc._parent_path,
+                    portal_type: doc._type,
+                    id: doc._id,
+                    title: doc.title,
+                    _key: doc._key,
+                    position_in_parent: doc._gopip
+                   }
+    """,
+    # stubs of all subobjects of `path` sorted by position in parent
+    # (FormFolder and Topic children)
+    "children_by_position": """
+        FOR doc IN @@collection
+            FILTER @path IN doc._paths_all
+            SORT doc._gopip
+            RETURN {path: doc._path,
+                    portal_type: doc._type,
+                    id: doc._id,
+                    title: doc.title,
+                    _key: doc._key,
+                    position_in_parent: doc._gopip
+                   }
+    """,
+    # path and _key of all objects of the given `portal_type`
+    "objects_by_type": """
+        FOR doc IN @@collection
+            FILTER doc._type == @portal_type
+            RETURN {path: doc._path,
+                    _key: doc._key
+                   }
+    """,
+    # path and position of all objects of the given `portal_type`
+    "positions_by_type": """
+        FOR doc IN @@collection
+            FILTER doc._type == @portal_type
+            LIMIT 10000000
+            RETURN {path: doc._path, position: doc._gopip}
+    """,
+    # path and position of all direct children of `parent_path`
+    "positions_by_parent": """
+        FOR doc IN @@collection
+            FILTER doc._parent_path == @parent_path
+            RETURN {path: doc._path, position: doc._gopip}
+    """,
+    # document `key` restricted to the attributes `fields`
+    "document": """
+        LET doc = DOCUMENT(@@collection, @key)
+        FILTER doc != null
+        RETURN KEEP(doc, @fields)
+    """,
+    # documents for all `keys` restricted to the attributes `fields`
+    "documents": """
+        FOR doc IN DOCUMENT(@@collection, @keys)
+            RETURN KEEP(doc, @fields)
+    """,
+    # documents for all `keys` without the base64 `data` of their binary
+    # fields (`_datafield_*`, see blobstore.strip_binary_data)
+    "documents_without_binaries": """
+        FOR doc IN DOCUMENT(@@collection, @keys)
+            LET binaries = ATTRIBUTES(doc)[* FILTER STARTS_WITH(CURRENT, "_datafield_") && IS_OBJECT(doc[CURRENT])]
+            RETURN MERGE(doc, ZIP(binaries, binaries[* RETURN UNSET(doc[CURRENT], "data")]))
+    """,
+}
+
+# Structural queries against the skeleton collection (see skeleton.py) with
+# the same results as the corresponding `QUERIES`. `@@collection` is the
+# skeleton collection, `@documents` the name of the document collection.
+# Subtrees are ranges of `_tree_key`, so all filters and sorts are covered
+# by the persistent indexes of the skeleton. ArangoDB compares strings by
+# ICU collation (not byte order): the range may also contain siblings like
+# `/plone/folder-archive` or `/plone/News` for `/plone/folder` or
+# `/plone/news`, the exact STARTS_WITH filter removes them.
+SKELETON_QUERIES = {
+    "object_by_path": """
+        FOR doc IN @@collection
+            FILTER doc._path == @path
+            RETURN {path: doc._path,
+                    portal_type: doc._type,
+                    id: CONCAT(@documents, "/", doc._key),
+                    title: doc.title,
+                    _key: doc._key
+                   }
+    """,
+    # sorted by `_tree_key` (parents before children)
+    "subtree": """
+        FOR doc IN @@collection
+            FILTER doc._tree_key >= CONCAT(@path, "/") && doc._tree_key < CONCAT(@path, "0")
+            FILTER STARTS_WITH(doc._tree_key, CONCAT(@path, "/"))
+            SORT doc._tree_key
+            RETURN {path: doc._path,
+                    parent_path: doc._parent_path,
+                    portal_type: doc._type,
+                    id: CONCAT(@documents, "/", doc._key),
+                    title: doc.title,
+                    _key: doc._key,
+                    position_in_parent: doc._gopip,
+                    depth: doc.depth
+                   }
+    """,
+    "children_by_position": """
+        FOR doc IN @@collection
+            FILTER doc._tree_key > CONCAT(@path, "/") && doc._tree_key < CONCAT(@path, "0")
+            FILTER STARTS_WITH(doc._tree_key, CONCAT(@path, "/"))
+            SORT doc._gopip
+            RETURN {path: doc._path,
+                    portal_type: doc._type,
+                    id: CONCAT(@documents, "/", doc._key),
+                    title: doc.title,
+                    _key: doc._key,
+                    position_in_parent: doc._gopip
+                   }
+    """,
+    "objects_by_type": """
+        FOR doc IN @@collection
+            FILTER doc._type == @portal_type
+            RETURN {path: doc._path,
+                    _key: doc._key
+                   }
+    """,
+    "positions_by_type": """
+        FOR doc IN @@collection
+            FILTER doc._type == @portal_type
+            RETURN {path: doc._path, position: doc._gopip}
+    """,
+    # sorted by position
+    "positions_by_parent": """
+        FOR doc IN @@collection
+            FILTER doc._parent_path == @parent_path
+            SORT doc._gopip
+            RETURN {path: doc._path, position: doc._gopip}
+    """,
+}
+
+
+class QueryCatalog:
+    """ Execute the named queries of `QUERIES` with bind variables so that
+        ArangoDB can reuse the query plan and values never need escaping.
+        With a `skeleton_name` the structural queries run against the
+        skeleton collection (`SKELETON_QUERIES`).
+
+        `cache` enables the ArangoDB query result cache (requires the cache
+        mode `demand` on the server). For each query name the number of
+        calls and the total time until the first result batch is available
+        are recorded.
+    """
+
+    def __init__(self, db, collection_name, cache=False, skeleton_name=None):
+        self.db = db
+        self.collection_name = collection_name
+        self.skeleton_name = skeleton_name
+        self.cache = cache
+        self.stats = collections.defaultdict(lambda: dict(count=0, total=0.0))
+        self._lock = threading.Lock()
+
+    def execute(self, name, batch_size=None, **bind_vars):
+        """ Execute the query `name` with the given bind variables and return the cursor """
+
+        if self.skeleton_name and name in SKELETON_QUERIES:
+            query = SKELETON_QUERIES[name]
+            bind_vars["@collection"] = self.skeleton_name
+            if "@documents" in query:
+                bind_vars["documents"] = self.collection_name
+        else:
+            query = QUERIES[name]
+            bind_vars["@collection"] = self.collection_name
+
+        ts = time.time()
+        cursor = self.db.aql.execute(
+            query, bind_vars=bind_vars, cache=self.cache, batch_size=batch_size
+        )
+        duration = time.time() - ts
+
+        metrics.observe("aql", name, duration)
+        with self._lock:
+            self.stats[name]["count"] += 1
+            self.stats[name]["total"] += duration
+        return cursor
+
+    def report(self, log):
+        """ Log call statistics of all queries """
+
+        for name, stats in sorted(self.stats.items()):
+            average = stats["total"] / stats["count"] * 1000
+            log.info(
+                f'AQL {name}: {stats["count"]} calls, {stats["total"]:.2f} s total, {average:.2f} ms average'
+            )
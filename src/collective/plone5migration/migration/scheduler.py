@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# Dependency-aware parallel scheduler for content creation
+
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CreationScheduler:
+    """ Create content in parallel while respecting the parent -> child
+        dependencies given by `path` and `parent_path` of each item.
+
+        The children of one parent are always created sequentially (in order
+        of `position_in_parent`) by one task in order to avoid ConflictErrors
+        on the ordered container. Different parents (subtrees) are processed
+        in parallel by a pool of `workers` threads. A task for the children
+        of an item is dispatched as soon as the item itself has been created.
+    """
+
+    def __init__(self, create, workers=4, log=None):
+        """
+            `create` - callable(item) creating the remote object for `item`
+            `workers` - number of worker threads
+            `log` - logger
+        """
+
+        self.create = create
+        self.workers = workers
+        self.log = log
+        self.children = collections.defaultdict(list)
+        self.stats = collections.Counter()
+        self._pending = 0
+        self._condition = threading.Condition()
+
+    def run(self, items):
+        """ Create all `items` (dicts with `path`, `parent_path` and
+            `position_in_parent`). Items whose parent is not part of `items`
+            are expected to have an existing parent on the target site.
+        """
+
+        paths = set(item["path"] for item in items)
+        roots = collections.defaultdict(list)
+        for item in items:
+            if item["parent_path"] in paths:
+                self.children[item["parent_path"]].append(item)
+            else:
+                roots[item["parent_path"]].append(item)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        with self._executor:
+            for parent_path, children in roots.items():
+                self._submit(parent_path, children)
+
+            with self._condition:
+                while self._pending:
+                    self._condition.wait()
+
+        if self.log:
+            self.log.info(f"Scheduler finished: {dict(self.stats)}")
+        return self.stats
+
+    def _submit(self, parent_path, items):
+        with self._condition:
+            self._pending += 1
+        self._executor.submit(self._create_children, parent_path, items)
+
+    def _create_children(self, parent_path, items):
+        """ Create all `items` of the given parent one after another """
+
+        try:
+            items = sorted(items, key=lambda x: x.get("position_in_parent") or 0)
+            for item in items:
+                try:
+                    self.create(item)
+                except Exception as e:
+                    skipped = self._count_subtree(item["path"])
+                    self._count("failed")
+                    self._count("skipped", skipped)
+                    if self.log:
+                        self.log.info(
+                            f'MigrationError: {item["path"]}: {e} ({skipped} subobjects skipped)',
+                            exc_info=True,
+                        )
+                    continue
+
+                self._count("created")
+                children = self.children.get(item["path"])
+                if children:
+                    self._submit(item["path"], children)
+        finally:
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def _count(self, name, value=1):
+        with self._condition:
+            self.stats[name] += value
+
+    def _count_subtree(self, path):
+        """ Number of all items below `path` """
+        children = self.children.get(path, ())
+        return len(children) + sum(self._count_subtree(c["path"]) for c in children)
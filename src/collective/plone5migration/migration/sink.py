@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# Request sinks replacing the HTTP transport for dry runs (--sink null|file)
+
+import datetime
+import json
+import threading
+import urllib.parse
+
+from . import metrics
+
+
+class SinkRequest:
+    """ Minimal stand-in for `requests.PreparedRequest` """
+
+    def __init__(self, method, url, body):
+        self.method = method
+        self.url = url
+        self.body = body
+
+
+class SinkResponse:
+    """ Minimal stand-in for `requests.Response` """
+
+    elapsed = datetime.timedelta(0)
+
+    def __init__(self, request, status_code, result=None, headers=None):
+        self.request = request
+        self.status_code = status_code
+        self.text = json.dumps(result) if result is not None else ""
+        self.content = self.text.encode("utf-8")
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class NullSink:
+    """ Drop-in replacement for `requests.Session` (get/post/put/patch/delete/head)
+        that sends nothing. Each request is answered with the response the
+        provisioning API and plone.restapi return on success, so the complete
+        migration pipeline (ArangoDB reads, FormFolder/Topic translation,
+        JSON encoding) runs without a Plone site.
+    """
+
+    def __init__(self):
+        self.hooks = dict(response=[])
+        self._lock = threading.Lock()
+
+    def _endpoint(self, url):
+        """ Last `@...` segment of the URL path or "" for content URLs """
+        path = urllib.parse.urlparse(url).path
+        for segment in reversed(path.split("/")):
+            if segment.startswith("@"):
+                return segment
+        return ""
+
+    def _respond(self, method, url, body):
+        """ Status code, JSON result and headers for a successful request """
+
+        endpoint = self._endpoint(url)
+        if method == "HEAD" or endpoint == "@@remote-exists":
+            return 404, None, None
+        if method == "DELETE":
+            return 204, None, None
+        if endpoint == "@vocabularies":
+            return 200, dict(items=[]), None
+        if endpoint == "@@inventory":
+            return 200, dict(items=[], total=0, next=None), None
+        if endpoint == "@@recreate-plone-site":
+            return 201, None, None
+        if endpoint == "@tus-replace":
+            if method == "POST":
+                return 201, None, dict(Location=f"{url}/upload")
+            return 204, None, None
+        if endpoint == "@@bulk-create":
+            items = json.loads(body)["items"]
+            created = [
+                dict(index=i, path="", uid="", metadata_errors={})
+                for i in range(len(items))
+            ]
+            return 200, dict(created=created, errors=[]), None
+        if endpoint == "@@apply-migration-metadata":
+            return 200, dict(errors={}), None
+        if endpoint in ("@@prepare", "@@fixup") or endpoint.startswith("@workflow"):
+            return 200, {}, None
+        if endpoint == "" and method == "POST":
+            # plone.restapi content creation
+            return 201, {"@id": url}, None
+        return 204, None, None
+
+    def _write(self, method, url, body):
+        """ Hook for subclasses: record the request """
+
+    def request(self, method, url, data=None, params=None, **kw):
+        if kw.get("json") is not None:
+            data = json.dumps(kw["json"])
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        body = data or b""
+
+        self._write(method, url, body)
+        status_code, result, headers = self._respond(method, url, body)
+        response = SinkResponse(SinkRequest(method, url, body), status_code, result, headers)
+        for hook in self.hooks["response"]:
+            hook(response)
+        return response
+
+    def get(self, url, **kw):
+        return self.request("GET", url, **kw)
+
+    def head(self, url, **kw):
+        return self.request("HEAD", url, **kw)
+
+    def post(self, url, **kw):
+        return self.request("POST", url, **kw)
+
+    def put(self, url, **kw):
+        return self.request("PUT", url, **kw)
+
+    def patch(self, url, **kw):
+        return self.request("PATCH", url, **kw)
+
+    def delete(self, url, **kw):
+        return self.request("DELETE", url, **kw)
+
+    def close(self):
+        pass
+
+
+class FileSink(NullSink):
+    """ Like `NullSink` but every request is written as one JSON line
+        (method, url, body) to `filename`. Binary bodies (upload chunks)
+        are recorded by size only.
+    """
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+        self._fp = open(filename, "w")
+
+    def _write(self, method, url, body):
+        try:
+            body = json.loads(body) if body else None
+        except ValueError:
+            body = dict(size=len(body))
+        line = json.dumps(dict(method=method, url=url, body=body))
+        with self._lock:
+            self._fp.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+def report_throughput(log):
+    """ Log duration and throughput per migration phase and per portal_type
+        (preparation of the payload and creation) from the metrics registry
+    """
+
+    snapshot = metrics.REGISTRY.snapshot()["metrics"]
+    for name, values in snapshot.get("phase", {}).items():
+        log.info(f'Phase {name}: {values["total"]:.2f} s')
+
+    for kind, label in (("prepare", "Prepare"), ("type", "Create")):
+        for name, values in snapshot.get(kind, {}).items():
+            rate = values["count"] / values["total"] if values["total"] else 0.0
+            log.info(
+                f'{label} {name}: {values["count"]} in {values["total"]:.2f} s ({rate:.1f}/s)'
+            )
+
+    requests = snapshot.get("http", {})
+    total = sum(values["count"] for values in requests.values())
+    sent = sum(values["bytes_sent"] for values in requests.values())
+    log.info(f"Requests: {total} ({sent / 1024 / 1024:.1f} MB payload)")
+    for name, values in sorted(requests.items()):
+        log.info(f'Requests {name}: {values["count"]} ({values["bytes_sent"]} bytes)')
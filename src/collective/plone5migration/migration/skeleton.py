@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# Skeleton collection: slim copy of the tree structure of the exported
+# content for index-only structural queries (see queries.SKELETON_QUERIES)
+
+import time
+
+
+# portal types containing subobjects
+FOLDERISH_TYPES = (
+    "Plone Site",
+    "Folder",
+    "RichFolder",
+    "Large Plone Folder",
+    "FormFolder",
+    "FieldsetFolder",
+    "Topic",
+)
+
+# persistent indexes of the skeleton collection (fields, unique)
+SKELETON_INDEXES = [
+    (["_path"], True),
+    (["_tree_key"], False),
+    (["_parent_path", "_gopip"], False),
+    (["_type"], False),
+    (["_uid"], False),
+]
+
+
+def skeleton_name(collection_name):
+    """ Default name of the skeleton collection of `collection_name` """
+    return f"{collection_name}_skeleton"
+
+
+def skeleton_entry(document):
+    """ Skeleton entry for a prepared document (see `prepare_document`).
+
+        `_tree_key` is the path with a trailing slash: all objects of the
+        subtree of `path` (including `path`) are the entries whose
+        `_tree_key` starts with `CONCAT(path, "/")` (found by the index
+        range `CONCAT(path, "/") <= _tree_key < CONCAT(path, "0")`) and
+        sorting by `_tree_key` lists parents before their children.
+    """
+
+    path = document["_path"]
+    return dict(
+        _key=document["_key"],
+        _path=path,
+        _parent_path=document["_parent_path"],
+        _tree_key=path + "/",
+        depth=path.count("/"),
+        _type=document.get("_type"),
+        folderish=document.get("_type") in FOLDERISH_TYPES,
+        _gopip=document.get("_gopip"),
+        _uid=document.get("_uid"),
+        title=document.get("title"),
+    )
+
+
+def create_skeleton_indexes(skeleton, sparse=False):
+    """ Create the persistent indexes of the skeleton collection and report
+        the time per index
+    """
+
+    for fields, unique in SKELETON_INDEXES:
+        ts = time.time()
+        skeleton.add_persistent_index(fields=fields, unique=unique, sparse=sparse)
+        print(
+            f"skeleton index on {', '.join(fields)} created in {time.time() - ts:.1f} seconds"
+        )
+
+
+def rebuild_skeleton(db, collection_name, skeleton, batch_size=1000):
+    """ Rebuild the skeleton collection from all documents of `collection_name` """
+
+    cursor = db.aql.execute(
+        """
+        FOR doc IN @@collection
+            RETURN KEEP(doc, "_key", "_path", "_parent_path", "_type", "_gopip", "_uid", "title")
+        """,
+        bind_vars={"@collection": collection_name},
+        batch_size=batch_size,
+    )
+    skeleton.truncate()
+    batch = list()
+    for document in cursor:
+        batch.append(skeleton_entry(document))
+        if len(batch) == batch_size:
+            skeleton.import_bulk(batch, on_duplicate="replace")
+            batch = list()
+    if batch:
+        skeleton.import_bulk(batch, on_duplicate="replace")
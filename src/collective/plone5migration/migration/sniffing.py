@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Identification of binary data (MIME type, image format and dimensions)
+# from the leading bytes only
+
+import io
+import threading
+
+import magic
+
+try:
+    import PIL.Image
+except ImportError:
+    PIL = None
+
+
+# number of leading bytes used for sniffing: enough for libmagic and for
+# the image headers (JPEG: SOF marker after EXIF/ICC segments)
+HEADER_SIZE = 64 * 1024
+
+_local = threading.local()
+
+
+def mime_type(header):
+    """ MIME type of the data starting with `header` (one `magic.Magic`
+        instance per thread, libmagic is not thread-safe)
+    """
+
+    mime = getattr(_local, "magic", None)
+    if mime is None:
+        mime = _local.magic = magic.Magic(mime=True)
+    return mime.from_buffer(header)
+
+
+class ImageInfo:
+    """ Format and dimensions of an image read from its header """
+
+    def __init__(self, format, width, height):
+        self.format = format
+        self.width = width
+        self.height = height
+
+    def __repr__(self):
+        return f"<ImageInfo {self.format} {self.width}x{self.height}>"
+
+
+def _require_pil():
+    if PIL is None:
+        raise RuntimeError("image sniffing requires Pillow")
+
+
+def image_info(header):
+    """ `ImageInfo` from the leading bytes of an image. PIL parses only the
+        header on open, the pixel data is not decoded. Raises the errors of
+        `PIL.Image.open` (OSError, DecompressionBombError, ...) e.g. if the
+        header is longer than `header`.
+    """
+
+    _require_pil()
+    with PIL.Image.open(io.BytesIO(header)) as img:
+        return ImageInfo(img.format, img.width, img.height)
+
+
+def verify_image(data):
+    """ Check the complete image `data` for corruption (raises the errors
+        of `PIL.Image.open` and `Image.verify`)
+    """
+
+    _require_pil()
+    with PIL.Image.open(io.BytesIO(data)) as img:
+        img.verify()
+        return ImageInfo(img.format, img.width, img.height)
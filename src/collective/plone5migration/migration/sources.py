@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+
+# Sources of the exported content for the migration: ArangoDB (default)
+# or the collective.jsonify export directory with a local SQLite index
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from . import metrics
+from .blobstore import strip_binary_data
+from .import_jsondump_into_arangodb import document_key
+from .import_jsondump_into_arangodb import prepare_document
+from .queries import QUERIES
+from .queries import QueryCatalog
+
+
+class ArangoSource:
+    """ Exported content stored in an ArangoDB collection
+        (see `import_jsondump_into_arangodb.py`). Structural queries use the
+        skeleton collection `skeleton_name` if given.
+
+        Every source provides
+
+        - `query(name, batch_size=None, **bind_vars)`: result of the named
+          query `name` from `queries.QUERIES` (iterable of dicts)
+        - `get(key)`: the full document for `key` or None
+        - `get_many(keys)`: the full documents for all known `keys`
+        - `report(log)` and `close()`
+    """
+
+    def __init__(self, db, collection_name, cache=False, skeleton_name=None):
+        self.db = db
+        self.collection_name = collection_name
+        self.collection = db[collection_name]
+        self.queries = QueryCatalog(
+            db, collection_name, cache=cache, skeleton_name=skeleton_name
+        )
+
+    def query(self, name, batch_size=None, **bind_vars):
+        return self.queries.execute(name, batch_size=batch_size, **bind_vars)
+
+    def get(self, key):
+        return self.collection.get(dict(_key=key))
+
+    def get_many(self, keys):
+        return self.collection.get_many(keys)
+
+    def report(self, log):
+        self.queries.report(log)
+
+    def close(self):
+        pass
+
+
+class FilesystemSource:
+    """ Exported content read directly from the collective.jsonify export
+        `directory` (no ArangoDB required).
+
+        The SQLite `index_filename` stores the attributes used by the named
+        queries (`_path`, `_parent_path`, `_paths_all`, `_type`, `_uid`,
+        `_gopip`, `title`) together with the JSON file of each object. The
+        index is updated incrementally for new, changed and removed files on
+        startup. Documents are read on demand from their JSON files and
+        prepared like the ArangoDB import does (`prepare_document`).
+
+        Query timings are recorded under the same metric names as the AQL
+        queries (`aql` metrics) so both sources can be compared directly.
+    """
+
+    name = "filesystem"
+
+    # indexes with another schema version are rebuilt
+    schema_version = 2
+
+    def __init__(self, directory, index_filename, log=None):
+        self.directory = os.path.abspath(directory)
+        self.index_filename = index_filename
+        self.stats = dict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(index_filename, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != self.schema_version:
+            self._db.executescript(
+                """
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS documents;
+                DROP TABLE IF EXISTS paths_all;
+                """
+            )
+            self._db.execute(f"PRAGMA user_version = {self.schema_version}")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                filename TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL);
+            CREATE TABLE IF NOT EXISTS documents (
+                _key TEXT PRIMARY KEY,
+                _path TEXT NOT NULL,
+                _parent_path TEXT,
+                _type TEXT,
+                _uid TEXT,
+                _gopip INTEGER,
+                title TEXT,
+                filename TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS paths_all (
+                path TEXT NOT NULL,
+                _key TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS documents_path ON documents (_path);
+            CREATE INDEX IF NOT EXISTS documents_parent_path ON documents (_parent_path);
+            CREATE INDEX IF NOT EXISTS documents_type ON documents (_type);
+            CREATE INDEX IF NOT EXISTS documents_uid ON documents (_uid);
+            CREATE INDEX IF NOT EXISTS documents_filename ON documents (filename);
+            CREATE INDEX IF NOT EXISTS paths_all_path ON paths_all (path);
+            CREATE INDEX IF NOT EXISTS paths_all_key ON paths_all (_key);
+            """
+        )
+        self.update_index(log)
+
+    def _files(self):
+        for dirname, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    yield os.path.join(dirname, filename)
+
+    def update_index(self, log=None):
+        """ Index new and changed JSON files of the export directory and
+            remove the entries of deleted files (one transaction)
+        """
+
+        ts = time.time()
+        num_indexed = 0
+        errors = 0
+        seen = set()
+        with self._lock:
+            indexed = dict(
+                (filename, (size, mtime))
+                for filename, size, mtime in self._db.execute(
+                    "SELECT filename, size, mtime FROM files"
+                )
+            )
+
+            self._db.execute("BEGIN")
+            for filename in self._files():
+                seen.add(filename)
+                st = os.stat(filename)
+                if indexed.get(filename) == (st.st_size, st.st_mtime):
+                    continue
+                try:
+                    with open(filename, "rb") as fp:
+                        data = json.loads(fp.read())
+                except ValueError as e:
+                    if log:
+                        log.error(f"Unable to parse {filename} ({e})")
+                    errors += 1
+                    continue
+                self._index_file(filename, st, [data])
+                num_indexed += 1
+
+            removed = set(indexed) - seen
+            for filename in removed:
+                self._delete_file_entries(filename)
+                self._db.execute("DELETE FROM files WHERE filename = ?", (filename,))
+            self._db.execute("COMMIT")
+
+        if log:
+            log.info(
+                f"Export index {self.index_filename}: {num_indexed} files indexed, "
+                f"{len(removed)} removed, {errors} errors ({time.time() - ts:.2f} s)"
+            )
+
+    def _index_file(self, filename, st, objects):
+        """ Replace the index entries of `filename` by `objects`
+            (list of exported data)
+        """
+
+        documents = list()
+        paths_all = list()
+        for data in objects:
+            key = document_key(data["_path"])
+            data = prepare_document(data, filename, key=key)
+            documents.append(
+                (
+                    key,
+                    data["_path"],
+                    data["_parent_path"],
+                    data.get("_type"),
+                    data.get("_uid"),
+                    data.get("_gopip"),
+                    data.get("title"),
+                    filename,
+                )
+            )
+            paths_all.extend((path, key) for path in data["_paths_all"])
+
+        self._delete_file_entries(filename)
+        self._db.executemany(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            documents,
+        )
+        self._db.executemany("INSERT INTO paths_all VALUES (?, ?)", paths_all)
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+            (filename, st.st_size, st.st_mtime),
+        )
+
+    def _delete_file_entries(self, filename):
+        self._db.execute(
+            "DELETE FROM paths_all WHERE _key IN (SELECT _key FROM documents WHERE filename = ?)",
+            (filename,),
+        )
+        self._db.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+
+    def _select(self, sql, *params):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _load(self, key, filename):
+        """ Read and prepare the document `key` from its JSON file """
+
+        with open(filename, "rb") as fp:
+            data = json.loads(fp.read())
+        data = prepare_document(data, filename, key=key)
+        data["_id"] = f"{self.name}/{key}"
+        return data
+
+    def _stubs(self, rows, *fields):
+        """ Stubs like the named queries return them for rows of
+            (_key, _path, _type, title, _parent_path, _gopip)
+        """
+
+        result = list()
+        for key, path, portal_type, title, parent_path, position in rows:
+            stub = dict(
+                path=path,
+                portal_type=portal_type,
+                id=f"{self.name}/{key}",
+                title=title,
+                _key=key,
+            )
+            if "parent_path" in fields:
+                stub["parent_path"] = parent_path
+            if "position_in_parent" in fields:
+                stub["position_in_parent"] = position
+            result.append(stub)
+        return result
+
+    def query(self, name, batch_size=None, **bind_vars):
+        if name not in QUERIES:
+            raise KeyError(f"Unknown query {name}")
+
+        ts = time.time()
+        result = getattr(self, f"_{name}")(**bind_vars)
+        duration = time.time() - ts
+
+        metrics.observe("aql", name, duration)
+        with self._lock:
+            stats = self.stats.setdefault(name, dict(count=0, total=0.0))
+            stats["count"] += 1
+            stats["total"] += duration
+        return iter(result)
+
+    _STUB_COLUMNS = "d._key, d._path, d._type, d.title, d._parent_path, d._gopip"
+
+    def _object_by_path(self, path):
+        rows = self._select(
+            f"SELECT {self._STUB_COLUMNS} FROM documents d WHERE d._path = ?", path
+        )
+        return self._stubs(rows)
+
+    def _subtree(self, path):
+        rows = self._select(
+            f"""SELECT {self._STUB_COLUMNS} FROM documents d WHERE d._path = ?
+                UNION
+                SELECT {self._STUB_COLUMNS} FROM documents d
+                JOIN paths_all p ON p._key = d._key WHERE p.path = ?""",
+            path,
+            path,
+        )
+        return self._stubs(rows, "parent_path", "position_in_parent")
+
+    def _children_by_position(self, path):
+        rows = self._select(
+            f"""SELECT {self._STUB_COLUMNS} FROM documents d
+                JOIN paths_all p ON p._key = d._key WHERE p.path = ?
+                ORDER BY d._gopip""",
+            path,
+        )
+        return self._stubs(rows, "position_in_parent")
+
+    def _objects_by_type(self, portal_type):
+        rows = self._select("SELECT _path, _key FROM documents WHERE _type = ?", portal_type)
+        return [dict(path=path, _key=key) for path, key in rows]
+
+    def _positions_by_type(self, portal_type):
+        rows = self._select("SELECT _path, _gopip FROM documents WHERE _type = ?", portal_type)
+        return [dict(path=path, position=position) for path, position in rows]
+
+    def _positions_by_parent(self, parent_path):
+        rows = self._select(
+            "SELECT _path, _gopip FROM documents WHERE _parent_path = ?", parent_path
+        )
+        return [dict(path=path, position=position) for path, position in rows]
+
+    def _document(self, key, fields):
+        doc = self.get(key)
+        return [] if doc is None else [_keep(doc, fields)]
+
+    def _documents(self, keys, fields):
+        return [_keep(doc, fields) for doc in self.get_many(keys)]
+
+    def _documents_without_binaries(self, keys):
+        return [strip_binary_data(doc) for doc in self.get_many(keys)]
+
+    def get(self, key):
+        rows = self._select(
+            "SELECT _key, filename FROM documents WHERE _key = ?", key
+        )
+        return self._load(*rows[0]) if rows else None
+
+    def get_many(self, keys):
+        keys = list(keys)
+        locations = dict()
+        # stay below SQLITE_MAX_VARIABLE_NUMBER
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._select(
+                "SELECT _key, filename FROM documents "
+                f"WHERE _key IN ({', '.join('?' * len(chunk))})",
+                *chunk,
+            )
+            locations.update((row[0], row) for row in rows)
+        return [self._load(*locations[key]) for key in keys if key in locations]
+
+    def report(self, log):
+        for name, stats in sorted(self.stats.items()):
+            average = stats["total"] / stats["count"] * 1000
+            log.info(
+                f'Query {name}: {stats["count"]} calls, {stats["total"]:.2f} s total, {average:.2f} ms average'
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _keep(doc, fields):
+    """ AQL KEEP() """
+    return dict((k, doc[k]) for k in fields if k in doc)
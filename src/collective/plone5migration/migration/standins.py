@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+# Local stand-ins for the Plone target site and ArangoDB (benchmarks)
+
+import collections
+import http.server
+import json
+import threading
+import time
+
+from .blobstore import strip_binary_data
+from .queries import QUERIES
+from .queries import SKELETON_QUERIES
+from .sink import NullSink
+
+
+class StandInPlone:
+    """ Local HTTP server answering the provisioning API (@@...) and
+        plone.restapi requests like a successful Plone site would (see
+        `NullSink`). Each request is delayed by `latency` seconds. The
+        number of requests and bytes received per endpoint are counted.
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.requests = collections.Counter()
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._responder = NullSink()
+
+        plone = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # send each response with a single write without Nagle delays
+            disable_nagle_algorithm = True
+            wbufsize = 65536
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                url = f"http://{self.headers['Host']}{self.path}"
+                status_code, result, headers = plone._respond(self.command, url, body)
+
+                content = b""
+                if result is not None:
+                    content = json.dumps(result).encode("utf-8")
+                self.send_response(status_code)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if content:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                if content and self.command != "HEAD":
+                    self.wfile.write(content)
+
+            do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _respond(self, method, url, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests[f"{method} {self._responder._endpoint(url) or 'content'}"] += 1
+            self.bytes_received += len(body)
+        return self._responder._respond(method, url, body)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes_received = 0
+
+
+def _keep(doc, fields):
+    """ AQL KEEP() """
+    return dict((k, doc[k]) for k in fields if k in doc)
+
+
+def _stub(doc, *fields):
+    stub = dict(
+        path=doc["_path"],
+        portal_type=doc["_type"],
+        id=doc["_id"],
+        title=doc.get("title"),
+        _key=doc["_key"],
+    )
+    if "parent_path" in fields:
+        stub["parent_path"] = doc["_parent_path"]
+    if "position_in_parent" in fields:
+        stub["position_in_parent"] = doc.get("_gopip")
+    return stub
+
+
+class InMemoryCollection:
+    """ The subset of `arango.collection.StandardCollection` used by the migration """
+
+    def __init__(self, name, documents):
+        self.name = name
+        self.documents = collections.OrderedDict()
+        for doc in documents:
+            doc.setdefault("_id", f"{name}/{doc['_key']}")
+            self.documents[doc["_key"]] = doc
+
+    def get(self, document):
+        key = document["_key"] if isinstance(document, dict) else document
+        return self.documents.get(key)
+
+    def get_many(self, documents):
+        result = list()
+        for document in documents:
+            doc = self.get(document)
+            if doc is not None:
+                result.append(doc)
+        return result
+
+    def __iter__(self):
+        return iter(self.documents.values())
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def _skeleton_stub(entry, documents, *fields):
+    stub = dict(
+        path=entry["_path"],
+        portal_type=entry["_type"],
+        id=f"{documents}/{entry['_key']}",
+        title=entry.get("title"),
+        _key=entry["_key"],
+    )
+    if "parent_path" in fields:
+        stub["parent_path"] = entry["_parent_path"]
+    if "position_in_parent" in fields:
+        stub["position_in_parent"] = entry.get("_gopip")
+    if "depth" in fields:
+        stub["depth"] = entry["depth"]
+    return stub
+
+
+def _in_subtree(entry, path, include_root=True):
+    """ Range and prefix condition on `_tree_key` of the skeleton queries """
+    prefix = path + "/"
+    if entry["_tree_key"] == prefix:
+        return include_root
+    return prefix <= entry["_tree_key"] < path + "0" and entry["_tree_key"].startswith(prefix)
+
+
+class InMemoryAQL:
+    """ Executes the named queries of `queries.QUERIES` and
+        `queries.SKELETON_QUERIES` (identified by their query string) in Python
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._implementations = dict(
+            (QUERIES[name], getattr(self, f"_{name}")) for name in QUERIES
+        )
+        self._implementations.update(
+            (SKELETON_QUERIES[name], getattr(self, f"_skeleton_{name}"))
+            for name in SKELETON_QUERIES
+        )
+
+    def execute(self, query, bind_vars=None, cache=False, batch_size=None):
+        bind_vars = dict(bind_vars or {})
+        collection = self.db[bind_vars.pop("@collection")]
+        try:
+            implementation = self._implementations[query]
+        except KeyError:
+            raise NotImplementedError(f"Unsupported query: {query}")
+        return iter(list(implementation(collection, **bind_vars)))
+
+    def _object_by_path(self, collection, path):
+        return [_stub(doc) for doc in collection if doc["_path"] == path]
+
+    def _subtree(self, collection, path):
+        return [
+            _stub(doc, "parent_path", "position_in_parent")
+            for doc in collection
+            if doc["_path"] == path or path in doc.get("_paths_all", ())
+        ]
+
+    def _children_by_position(self, collection, path):
+        docs = [doc for doc in collection if path in doc.get("_paths_all", ())]
+        docs.sort(key=lambda doc: doc.get("_gopip") or 0)
+        return [_stub(doc, "position_in_parent") for doc in docs]
+
+    def _objects_by_type(self, collection, portal_type):
+        return [
+            dict(path=doc["_path"], _key=doc["_key"])
+            for doc in collection
+            if doc["_type"] == portal_type
+        ]
+
+    def _positions_by_type(self, collection, portal_type):
+        return [
+            dict(path=doc["_path"], position=doc.get("_gopip"))
+            for doc in collection
+            if doc["_type"] == portal_type
+        ]
+
+    def _positions_by_parent(self, collection, parent_path):
+        return [
+            dict(path=doc["_path"], position=doc.get("_gopip"))
+            for doc in collection
+            if doc.get("_parent_path") == parent_path
+        ]
+
+    def _skeleton_object_by_path(self, collection, path, documents):
+        return [
+            _skeleton_stub(entry, documents) for entry in collection if entry["_path"] == path
+        ]
+
+    def _skeleton_subtree(self, collection, path, documents):
+        entries = [entry for entry in collection if _in_subtree(entry, path)]
+        entries.sort(key=lambda entry: entry["_tree_key"])
+        return [
+            _skeleton_stub(entry, documents, "parent_path", "position_in_parent", "depth")
+            for entry in entries
+        ]
+
+    def _skeleton_children_by_position(self, collection, path, documents):
+        entries = [entry for entry in collection if _in_subtree(entry, path, False)]
+        entries.sort(key=lambda entry: entry.get("_gopip") or 0)
+        return [_skeleton_stub(entry, documents, "position_in_parent") for entry in entries]
+
+    def _skeleton_objects_by_type(self, collection, portal_type):
+        return self._objects_by_type(collection, portal_type)
+
+    def _skeleton_positions_by_type(self, collection, portal_type):
+        return self._positions_by_type(collection, portal_type)
+
+    def _skeleton_positions_by_parent(self, collection, parent_path):
+        result = self._positions_by_parent(collection, parent_path)
+        result.sort(key=lambda row: row["position"] or 0)
+        return result
+
+    def _document(self, collection, key, fields):
+        doc = collection.get(key)
+        return [] if doc is None else [_keep(doc, fields)]
+
+    def _documents(self, collection, keys, fields):
+        return [_keep(doc, fields) for doc in collection.get_many(keys)]
+
+    def _documents_without_binaries(self, collection, keys):
+        return [strip_binary_data(doc) for doc in collection.get_many(keys)]
+
+
+class InMemoryDatabase:
+    """ The subset of `arango.database.StandardDatabase` used by the migration """
+
+    def __init__(self, collections):
+        self.collections = dict(
+            (name, InMemoryCollection(name, documents))
+            for name, documents in collections.items()
+        )
+        self.aql = InMemoryAQL(self)
+
+    def has_collection(self, name):
+        return name in self.collections
+
+    def __getitem__(self, name):
+        return self.collections[name]
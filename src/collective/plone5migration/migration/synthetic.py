@@ -0,0 +1,544 @@
+# -*- coding: utf-8 -*-
+
+# Seeded generator for synthetic collective.jsonify exports (benchmarks and
+# scale tests of import-jsondump-into-arangodb and migration-import)
+#
+# The export is generated in two stages: a cheap sequential pass decides the
+# structure (paths, types, positions, UIDs, relations) and a second pass
+# builds the content of each object from an object specific random
+# generator. The second pass can therefore run in parallel and the output
+# only depends on the seed and the options.
+
+import argparse
+import base64
+import datetime
+import functools
+import json
+import math
+import multiprocessing
+import os
+import random
+import struct
+import time
+import uuid
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# relative frequency of the generated content types (besides folders)
+TYPE_WEIGHTS = {
+    "Document": 40,
+    "News Item": 15,
+    "Image": 15,
+    "File": 10,
+    "Link": 8,
+    "Event": 8,
+    "FormFolder": 2,
+    "Topic": 2,
+}
+
+PFG_FIELD_TYPES = [
+    "FormStringField",
+    "FormTextField",
+    "FormLinesField",
+    "FormIntegerField",
+    "FormFixedPointField",
+    "FormDateField",
+    "FormBooleanField",
+    "FormFileField",
+    "FormSelectionField",
+    "FormMultiSelectionField",
+]
+
+PFG_ADAPTER_TYPES = ["FormMailerAdapter", "FormSaveDataAdapter", "FormThanksPage"]
+
+TOPIC_CRITERIA_TYPES = [
+    "ATPortalTypeCriterion",
+    "ATSortCriterion",
+    "ATSelectionCriterion",
+    "ATSimpleStringCriterion",
+    "ATDateCriteria",
+]
+
+PORTLET_MANAGERS = ["plone.leftcolumn", "plone.rightcolumn"]
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo"
+).split()
+
+# number of prepared paragraphs texts are assembled from
+PARAGRAPHS = 512
+
+# number of recent UIDs relatedItems are chosen from
+RELATED_CANDIDATES = 10000
+
+START_DATE = datetime.datetime(2010, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=1)))
+
+
+def _png(width, height, rng):
+    """ PNG image with random RGB pixels """
+
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    rows = b"".join(
+        b"\x00" + rng.getrandbits(24 * width).to_bytes(3 * width, "little")
+        for _ in range(height)
+    )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+class ExportGenerator:
+    """ Generate `count` objects (including FormFolder and Topic children)
+        of a collective.jsonify export below `/<site_id>/<root_id>`.
+
+        - `depth` - maximum folder depth below the root folder
+        - `fanout` - average number of objects per folder
+        - `type_weights` - relative frequency of the content types
+        - `blob_median`, `blob_sigma`, `blob_max` - log-normal size
+          distribution (bytes) of files and images
+        - `text_size` - approximate size of rich texts (characters)
+        - `related_density` - fraction of objects with relatedItems
+        - `portlet_density` - fraction of folders and documents with portlets
+
+        Iterating yields the exported objects (parents before children).
+    """
+
+    def __init__(
+        self,
+        count,
+        seed=0,
+        site_id="plone_portal",
+        root_id="benchmark",
+        depth=6,
+        fanout=20,
+        type_weights=None,
+        blob_median=16384,
+        blob_sigma=1.0,
+        blob_max=50 * 1024 * 1024,
+        text_size=2000,
+        related_density=0.1,
+        portlet_density=0.02,
+    ):
+        self.count = count
+        self.seed = seed
+        self.site_id = site_id
+        self.root_id = root_id
+        self.depth = depth
+        self.fanout = fanout
+        self.type_weights = type_weights or TYPE_WEIGHTS
+        self.blob_median = blob_median
+        self.blob_sigma = blob_sigma
+        self.blob_max = blob_max
+        self.text_size = text_size
+        self.related_density = related_density
+        self.portlet_density = portlet_density
+        self._paragraphs = None
+
+    # structure
+
+    def structure(self):
+        """ Sequential pass: yield one small record per object with path,
+            type, position, UID and relations
+        """
+
+        rng = random.Random(self.seed)
+        positions = dict()  # folder path -> number of children
+        recent_uids = list()  # candidates for relatedItems
+
+        def record(index, portal_type, parent_path, object_id, **kw):
+            position = positions.get(parent_path, 0)
+            positions[parent_path] = position + 1
+            uid = uuid.UUID(int=rng.getrandbits(128), version=4).hex
+            related = []
+            if recent_uids and rng.random() < self.related_density:
+                related = rng.sample(recent_uids, min(len(recent_uids), rng.randint(1, 3)))
+            if len(recent_uids) < RELATED_CANDIDATES:
+                recent_uids.append(uid)
+            else:
+                recent_uids[rng.randrange(RELATED_CANDIDATES)] = uid
+            return dict(
+                index=index,
+                portal_type=portal_type,
+                path=f"{parent_path}/{object_id}",
+                id=object_id,
+                position=position,
+                uid=uid,
+                related=related,
+                portlets=portal_type in ("Folder", "Document") and rng.random() < self.portlet_density,
+                **kw,
+            )
+
+        root_parent = f"/{self.site_id}"
+        yield record(0, "Folder", root_parent, self.root_id)
+        folders = [(f"{root_parent}/{self.root_id}", 0)]
+
+        portal_types = list(self.type_weights)
+        cum_weights = list()
+        total = 0
+        for portal_type in portal_types:
+            total += self.type_weights[portal_type]
+            cum_weights.append(total)
+
+        index = 1
+        while index < self.count:
+            parent_path, depth = folders[rng.randrange(len(folders))]
+            if depth < self.depth and rng.random() < 1.0 / self.fanout:
+                data = record(index, "Folder", parent_path, f"folder-{index}")
+                folders.append((data["path"], depth + 1))
+                yield data
+                index += 1
+                continue
+
+            portal_type = rng.choices(portal_types, cum_weights=cum_weights)[0]
+            object_id = f"{portal_type.lower().replace(' ', '-')}-{index}"
+            data = record(index, portal_type, parent_path, object_id)
+            yield data
+            index += 1
+
+            # subobjects of forms and collections
+            if portal_type == "FormFolder":
+                child_types = rng.sample(PFG_FIELD_TYPES, rng.randint(2, 8)) + PFG_ADAPTER_TYPES
+            elif portal_type == "Topic":
+                child_types = rng.sample(TOPIC_CRITERIA_TYPES, rng.randint(1, len(TOPIC_CRITERIA_TYPES)))
+            else:
+                continue
+            for child_type in child_types[: self.count - index]:
+                yield record(index, child_type, data["path"], f"{child_type.lower()}-{index}")
+                index += 1
+
+    # content
+
+    def _words(self, rng, n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    def _text(self, rng):
+        if self._paragraphs is None:
+            paragraph_rng = random.Random(self.seed)
+            self._paragraphs = [
+                f"<p>{self._words(paragraph_rng, paragraph_rng.randint(20, 60)).capitalize()}.</p>"
+                for _ in range(PARAGRAPHS)
+            ]
+        paragraphs = list()
+        size = 0
+        while size < self.text_size:
+            paragraph = rng.choice(self._paragraphs)
+            paragraphs.append(paragraph)
+            size += len(paragraph)
+        return "\n".join(paragraphs)
+
+    def _date(self, rng):
+        return START_DATE + datetime.timedelta(seconds=rng.randint(0, 10 * 365 * 86400))
+
+    def _zope_date(self, dt):
+        """ String representation of Zope DateTime (used for Archetypes fields) """
+        hours = int(dt.utcoffset().total_seconds() // 3600)
+        return dt.strftime("%Y/%m/%d %H:%M:%S.000 ") + f"GMT{hours:+d}"
+
+    def _blob_size(self, rng):
+        size = rng.lognormvariate(math.log(self.blob_median), self.blob_sigma)
+        return max(1, min(int(size), self.blob_max))
+
+    def _portlets(self, rng):
+        manager = rng.choice(PORTLET_MANAGERS)
+        return {
+            manager: [
+                dict(
+                    name="<plone.portlet.static.static.Assignment at static-portlet>",
+                    data=dict(
+                        header=self._words(rng, 3).title(),
+                        text=self._text(rng)[:500],
+                        omit_border=False,
+                    ),
+                )
+            ]
+        }
+
+    def content(self, record):
+        """ Second pass: the exported object for a structure record """
+
+        rng = random.Random(f"{self.seed}-{record['index']}")
+        portal_type = record["portal_type"]
+        object_id = record["id"]
+        created = self._date(rng)
+        modified = created + datetime.timedelta(days=rng.randint(0, 365))
+
+        data = {
+            "_id": object_id,
+            "id": object_id,
+            "_path": record["path"],
+            "_type": portal_type,
+            "_uid": record["uid"],
+            "_gopip": record["position"],
+            "_owner": "admin",
+            "_layout": None,
+            "_directly_provided": [],
+            "_ac_local_roles": {"admin": ["Owner"]},
+            "_ac_local_roles_block": False,
+            "_permissions": {},
+            "_portlets_blacklist": {},
+            "title": self._words(rng, rng.randint(2, 8)).title(),
+            "description": self._words(rng, rng.randint(5, 30)),
+            "subject": [rng.choice(WORDS) for _ in range(rng.randint(0, 3))],
+            "creators": ["admin"],
+            "contributors": [],
+            "language": "de",
+            "location": "",
+            "excludeFromNav": False,
+            "review_state": rng.choice(("published", "published", "private")),
+            "creation_date": created.isoformat(),
+            "modification_date": modified.isoformat(),
+            "effectiveDate": self._zope_date(created),
+            "expirationDate": "None",
+            "relatedItems": record["related"],
+        }
+        if record["portlets"]:
+            data["_portlets"] = self._portlets(rng)
+
+        if portal_type == "Folder":
+            data.update(
+                constrainTypesMode=-1,
+                immediatelyAddableTypes=[],
+                locallyAllowedTypes=[],
+            )
+        elif portal_type in ("Document", "News Item"):
+            data["text"] = self._text(rng)
+        elif portal_type == "Event":
+            start = self._date(rng)
+            data.update(
+                text=self._text(rng),
+                startDate=start.isoformat(),
+                endDate=(start + datetime.timedelta(hours=2)).isoformat(),
+                eventUrl="https://example.org/event",
+                contactEmail="info@example.org",
+                contactName=self._words(rng, 2).title(),
+                contactPhone="+49 7071 123456",
+            )
+        elif portal_type == "Link":
+            data["remoteUrl"] = f"https://example.org/{object_id}"
+        elif portal_type == "File":
+            size = self._blob_size(rng)
+            data["_datafield_file"] = {
+                "data": base64.b64encode(rng.getrandbits(8 * size).to_bytes(size, "little")).decode("ascii"),
+                "content_type": "application/octet-stream",
+                "filename": f"{object_id}.bin",
+                "size": size,
+            }
+        elif portal_type == "Image":
+            # (hardly compressible) RGB pixel data of about the blob size
+            side = max(1, int((self._blob_size(rng) / 3) ** 0.5))
+            png = _png(side, side, rng)
+            data["_datafield_image"] = {
+                "data": base64.b64encode(png).decode("ascii"),
+                "content_type": "image/png",
+                "filename": f"{object_id}.png",
+                "size": len(png),
+            }
+        elif portal_type == "FormFolder":
+            data.update(
+                formPrologue=self._text(rng)[:300],
+                formEpilogue="",
+            )
+        elif portal_type == "Topic":
+            data.update(
+                text=self._text(rng)[:300],
+                itemCount=rng.choice((0, 10, 20)),
+                customViewFields=["Title", "Creator", "ModificationDate"],
+            )
+        elif portal_type in PFG_FIELD_TYPES:
+            data.update(
+                required=rng.random() < 0.3,
+                hidden=False,
+                fgStringValidator=rng.choice(("", "", "isEmail")),
+                fgTDefault="",
+                fgTValidator="",
+                fgTEnabled="",
+                serverSide=False,
+            )
+            if portal_type in ("FormSelectionField", "FormMultiSelectionField"):
+                data["fgVocabulary"] = [
+                    f"{word}|{word.title()}" for word in rng.sample(WORDS, rng.randint(2, 6))
+                ]
+                data["fgTVocabulary"] = ""
+                data["fgFormat"] = rng.choice(("select", "radio"))
+        elif portal_type == "FormMailerAdapter":
+            data.update(
+                body_pre="",
+                body_post="",
+                body_footer="",
+                cc_recipients=[],
+                bcc_recipients=[],
+                additional_headers=[],
+                show_fields=[],
+                execCondition="",
+                bccOverride="",
+                ccOverride="",
+                recipientOverride="",
+                senderOverride="",
+                subjectOverride="",
+                recipient_email="info@example.org",
+                recipient_name="Webmaster",
+                replyto_field="",
+                subject_field="",
+                to_field="#NONE#",
+            )
+        elif portal_type == "FormThanksPage":
+            data.update(
+                thanksPrologue="<p>Thank you</p>",
+                thanksEpilogue="",
+                showAll=True,
+                showFields=[],
+                includeEmpties=False,
+            )
+        elif portal_type == "ATPortalTypeCriterion":
+            data.update(field="portal_type", value=rng.sample(["Document", "News Item", "Event"], 2))
+        elif portal_type == "ATSortCriterion":
+            data.update(field="effective", reversed=True)
+        elif portal_type == "ATSelectionCriterion":
+            data.update(field="Subject", value=rng.sample(WORDS, 2), operator=rng.choice(("or", "and")))
+        elif portal_type == "ATSimpleStringCriterion":
+            data.update(field="SearchableText", value=rng.choice(WORDS))
+        elif portal_type == "ATDateCriteria":
+            data.update(field="effective", operation=rng.choice(("more", "less")), value=rng.choice((0, 7, 30)))
+        return data
+
+    def __iter__(self):
+        for record in self.structure():
+            yield self.content(record)
+
+
+def _dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode("utf-8")
+
+
+def export_filename(output_directory, index):
+    """ collective.jsonify layout: one directory per 1000 objects """
+    return os.path.join(output_directory, str(index // 1000), f"{index}.json")
+
+
+def write_records(generator, output_directory, records):
+    """ Write the exported objects for `records` as JSON files """
+
+    for record in records:
+        filename = export_filename(output_directory, record["index"])
+        with open(filename, "wb") as fp:
+            fp.write(_dumps(generator.content(record)))
+    return len(records)
+
+
+def _batches(records, size):
+    batch = list()
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = list()
+    if batch:
+        yield batch
+
+
+def parse_type_weights(s):
+    """ "Document=40,News Item=15" -> dict """
+    weights = dict()
+    for item in s.split(","):
+        name, weight = item.rsplit("=", 1)
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic collective.jsonify export (seeded, deterministic)"
+    )
+    parser.add_argument("-o", "--output-directory", required=True, help="Output directory")
+    parser.add_argument("-n", "--objects", type=int, default=10000, help="Number of objects")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--site-id", default="plone_portal", help="Id of the exported Plone site")
+    parser.add_argument("--root-id", default="content", help="Id of the root folder")
+    parser.add_argument("--depth", type=int, default=6, help="Maximum folder depth")
+    parser.add_argument("--fanout", type=int, default=20, help="Average number of objects per folder")
+    parser.add_argument(
+        "--types",
+        type=parse_type_weights,
+        default=TYPE_WEIGHTS,
+        help='Portal type mix e.g. "Document=40,News Item=15,Image=15,File=10,FormFolder=2,Topic=2"',
+    )
+    parser.add_argument(
+        "--blob-median", type=int, default=16384, help="Median size (bytes) of files and images"
+    )
+    parser.add_argument(
+        "--blob-sigma", type=float, default=1.0, help="Sigma of the log-normal blob size distribution"
+    )
+    parser.add_argument(
+        "--blob-max", type=int, default=50 * 1024 * 1024, help="Maximum size (bytes) of files and images"
+    )
+    parser.add_argument("--text-size", type=int, default=2000, help="Size of rich texts (characters)")
+    parser.add_argument(
+        "--related-density", type=float, default=0.1, help="Fraction of objects with relatedItems"
+    )
+    parser.add_argument(
+        "--portlet-density", type=float, default=0.02, help="Fraction of folders/documents with portlets"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes"
+    )
+    args = parser.parse_args()
+
+    generator = ExportGenerator(
+        args.objects,
+        seed=args.seed,
+        site_id=args.site_id,
+        root_id=args.root_id,
+        depth=args.depth,
+        fanout=args.fanout,
+        type_weights=args.types,
+        blob_median=args.blob_median,
+        blob_sigma=args.blob_sigma,
+        blob_max=args.blob_max,
+        text_size=args.text_size,
+        related_density=args.related_density,
+        portlet_density=args.portlet_density,
+    )
+
+    for i in range(args.objects // 1000 + 1):
+        os.makedirs(os.path.join(args.output_directory, str(i)), exist_ok=True)
+
+    ts = time.time()
+    written = 0
+    write = functools.partial(write_records, generator, args.output_directory)
+    batches = _batches(generator.structure(), 1000)
+    if args.workers > 1:
+        with multiprocessing.Pool(args.workers) as pool:
+            for n in pool.imap_unordered(write, batches):
+                written += n
+                print(f"{written}/{args.objects} objects", end="\r", flush=True)
+    else:
+        for batch in batches:
+            written += write(batch)
+            print(f"{written}/{args.objects} objects", end="\r", flush=True)
+
+    duration = time.time() - ts
+    print(f"{written} objects written to {args.output_directory} in {duration:.1f} s ({written / duration:.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -52,9 +52,21 @@ class TopicMigrator:
         self.object_data = object_data
         self.child_keys = child_keys
         self.migrator = migrator
+        self._children = None
         self.log = log
         self.query = list()
 
+    @property
+    def children(self):
+        """ Exported data of all child objects (fetched once in chunks) """
+        if self._children is None:
+            self._children = [
+                child_data
+                for child_data in self.migrator._objects_by_keys(self.child_keys)
+                if child_data is not None
+            ]
+        return self._children
+
     def add_query(self, sub_query):
         self.query.append(sub_query)
 
@@ -68,8 +80,7 @@ class TopicMigrator:
         self.log.info(f'customViewFields: {self.object_data["customViewFields"]} -> {customViewFields}')
         self.migration_data["customViewFields"] = customViewFields
 
-        for _key in self.child_keys:
-            child_data = self.migrator._object_by_key(_key)
+        for child_data in self.children:
 
             migrator_method = getattr(self, "migrate_" + child_data["_type"], None)
             if not migrator_method:
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Helpers for streamed (chunked) uploads of binary data
+
+import base64
+
+
+def _strip(b64_data):
+    """ Remove whitespace (line breaks) from base64 data """
+    if "\n" in b64_data or " " in b64_data:
+        b64_data = "".join(b64_data.split())
+    return b64_data
+
+
+def base64_length(b64_data):
+    """ Length of the decoded data of the base64 string `b64_data` """
+    b64_data = _strip(b64_data)
+    return len(b64_data) // 4 * 3 - b64_data[-2:].count("=")
+
+
+def iter_base64_chunks(b64_data, chunk_size):
+    """ Decode the base64 string `b64_data` in chunks of (about) `chunk_size`
+        bytes without decoding the complete data at once
+    """
+
+    b64_data = _strip(b64_data)
+    # 4 base64 characters encode 3 bytes
+    step = max(chunk_size // 3, 1) * 4
+    for i in range(0, len(b64_data), step):
+        yield base64.b64decode(b64_data[i:i + step])
+
+
+def tus_metadata(**metadata):
+    """ TUS `Upload-Metadata` header value for the given key/value pairs """
+    return ",".join(
+        f"{key} {base64.b64encode(value.encode('utf-8')).decode('ascii')}"
+        for key, value in metadata.items()
+    )
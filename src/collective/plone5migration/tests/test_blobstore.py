@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Tests for the content-addressed blob store of binary data."""
+from collective.plone5migration.migration.blobstore import BlobStore
+from collective.plone5migration.migration.blobstore import externalize_blobs
+from collective.plone5migration.migration.blobstore import field_base64
+from collective.plone5migration.migration.blobstore import field_bytes
+from collective.plone5migration.migration.blobstore import field_size
+from collective.plone5migration.migration.blobstore import iter_field_chunks
+from collective.plone5migration.migration.blobstore import strip_binary_data
+
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+
+DATA = bytes(range(256)) * 20
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = BlobStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put(self):
+        digest = self.store.put(DATA)
+        self.assertEqual(digest, hashlib.sha256(DATA).hexdigest())
+        self.assertEqual(self.store.put(DATA), digest)
+        self.assertEqual(
+            self.store.path(digest), os.path.join(self.directory, digest[:2], digest[2:4], digest)
+        )
+        self.assertTrue(self.store.has(digest))
+        self.assertEqual(self.store.size(digest), len(DATA))
+        # no temporary files are left behind
+        self.assertEqual(os.listdir(os.path.dirname(self.store.path(digest))), [digest])
+
+    def test_read(self):
+        digest = self.store.put(DATA)
+        self.assertEqual(self.store.read(digest), DATA)
+        self.assertEqual(self.store.read(digest, 10), DATA[:10])
+        with self.store.open(digest) as data:
+            self.assertEqual(data[:], DATA)
+        self.assertEqual(b"".join(self.store.iter_chunks(digest, 1000)), DATA)
+
+        empty = self.store.put(b"")
+        with self.store.open(empty) as data:
+            self.assertEqual(data, b"")
+        self.assertEqual(list(self.store.iter_chunks(empty, 1000)), [])
+
+    def test_externalize_blobs(self):
+        b64_data = base64.b64encode(DATA).decode("ascii")
+        data = dict(
+            _path="/plone/file",
+            _datafield_file=dict(data=b64_data, filename="file.bin"),
+            _datafield_image=dict(data=None),
+            title="_datafield_",
+        )
+        self.assertEqual(externalize_blobs(data, self.store), len(b64_data))
+        self.assertEqual(
+            data["_datafield_file"],
+            dict(filename="file.bin", sha256=hashlib.sha256(DATA).hexdigest(), size=len(DATA)),
+        )
+        self.assertEqual(data["_datafield_image"], dict(data=None))
+
+        field = data["_datafield_file"]
+        self.assertEqual(field_size(field), len(DATA))
+        self.assertEqual(field_bytes(field, self.store), DATA)
+        self.assertEqual(field_bytes(field, self.store, 16), DATA[:16])
+        self.assertEqual(field_base64(field, self.store), b64_data)
+        self.assertEqual(b"".join(iter_field_chunks(field, 1000, self.store)), DATA)
+        with self.assertRaises(ValueError):
+            field_bytes(field)
+
+
+class TestInlineFields(unittest.TestCase):
+
+    def test_field_bytes(self):
+        for b64_data in (
+            base64.b64encode(DATA).decode("ascii"),
+            base64.encodebytes(DATA).decode("ascii"),
+            base64.encodebytes(DATA).decode("ascii").replace("\n", "\r\n"),
+        ):
+            field = dict(data=b64_data)
+            self.assertEqual(field_size(field), len(DATA))
+            self.assertEqual(field_bytes(field), DATA)
+            self.assertEqual(field_base64(field), b64_data)
+            self.assertEqual(b"".join(iter_field_chunks(field, 1000)), DATA)
+            # only the leading base64 characters are decoded
+            for size in (0, 1, 2, 3, 4, 32, 100, 1000, len(DATA), len(DATA) + 1):
+                self.assertEqual(field_bytes(field, size=size), DATA[:size])
+
+    def test_strip_binary_data(self):
+        data = dict(
+            _path="/plone/file",
+            _datafield_file=dict(data="eHh4", content_type="text/plain"),
+            _datafield_image=dict(sha256="abc", size=3),
+        )
+        stripped = strip_binary_data(data)
+
+        self.assertEqual(stripped["_datafield_file"], dict(content_type="text/plain"))
+        self.assertEqual(stripped["_datafield_image"], dict(sha256="abc", size=3))
+        self.assertEqual(stripped["_path"], "/plone/file")
+        # the original document is unchanged
+        self.assertEqual(data["_datafield_file"]["data"], "eHh4")
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Tests for check-images against the in-memory ArangoDB stand-in."""
+from collective.plone5migration.migration.benchmark import _config
+from collective.plone5migration.migration.blobstore import BlobStore
+from collective.plone5migration.migration.blobstore import externalize_blobs
+from collective.plone5migration.migration.check_images import ImageChecker
+from collective.plone5migration.migration.sniffing import PIL
+from collective.plone5migration.tests.test_migration_import import export
+from collective.plone5migration.tests.test_migration_import import InMemoryMigrator
+from collective.plone5migration.tests.test_sniffing import image
+
+import argparse
+import base64
+import shutil
+import tempfile
+import unittest
+
+
+class InMemoryImageChecker(ImageChecker, InMemoryMigrator):
+    """ ImageChecker reading the documents passed as `args.documents` """
+
+
+def image_document(path, data, content_type="image/png"):
+    field = dict(data=base64.b64encode(data).decode("ascii"), content_type=content_type, filename="image")
+    return export(path, "Image", _datafield_image=field)
+
+
+@unittest.skipIf(PIL is None, "Pillow is not installed")
+class TestCheckChunk(unittest.TestCase):
+
+    def setUp(self):
+        png = image("PNG", (600, 400))
+        self.documents = [
+            image_document("/plone/png", png),
+            image_document("/plone/truncated", png[: len(png) // 2]),
+            image_document("/plone/tiff", image("TIFF"), "image/jpeg"),
+            image_document("/plone/text", b"no image"),
+            export("/plone/no-data", "Image"),
+        ]
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        stored = image_document("/plone/stored", png)
+        externalize_blobs(stored, BlobStore(self.directory))
+        self.documents.append(stored)
+
+    def _check(self, **options):
+        options.setdefault("verify", False)
+        options.setdefault("blob_store", None)
+        args = argparse.Namespace(documents=self.documents, chunk_size=100, number_processes=1, **options)
+        checker = InMemoryImageChecker(_config("http://localhost:1", "/plone"), args)
+        self.addCleanup(checker.close)
+        rows = checker._query("objects_by_type", portal_type="Image")
+        errors = checker.check_chunk(sorted(rows, key=lambda row: row["path"]))
+        return dict((error.split(": ", 2)[1], error) for error in errors)
+
+    def test_check_chunk(self):
+        errors = self._check()
+        self.assertEqual(sorted(errors), ["/plone/no-data", "/plone/stored", "/plone/text", "/plone/tiff"])
+        self.assertEqual(errors["/plone/tiff"], "ERROR: /plone/tiff: TIFF disguised as image/jpeg")
+        # no --blob-store: reported for the image, the chunk is checked
+        self.assertIn("no blob store is configured", errors["/plone/stored"])
+        self.assertIn("_datafield_image", errors["/plone/no-data"])
+
+    def test_verify(self):
+        errors = self._check(verify=True, blob_store=self.directory)
+        self.assertEqual(sorted(errors), ["/plone/no-data", "/plone/text", "/plone/tiff", "/plone/truncated"])
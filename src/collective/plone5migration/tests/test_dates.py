@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Tests for the date normalization of collective.jsonify exports."""
+from collective.plone5migration.migration import dates
+
+import datetime
+import logging
+import unittest
+
+
+UTC = datetime.timezone.utc
+CEST = datetime.timezone(datetime.timedelta(hours=2))
+
+
+class TestParseDate(unittest.TestCase):
+
+    def setUp(self):
+        dates.parse_date.cache_clear()
+
+    def test_iso(self):
+        self.assertEqual(
+            dates.parse_date("2020-08-25T17:00:00+02:00"),
+            datetime.datetime(2020, 8, 25, 17, 0, tzinfo=CEST),
+        )
+        self.assertEqual(
+            dates.parse_date("2020-08-25T15:00:00Z"),
+            datetime.datetime(2020, 8, 25, 15, 0, tzinfo=UTC),
+        )
+        self.assertEqual(dates.parse_date(" 2020-08-25 "), datetime.datetime(2020, 8, 25))
+
+    def test_zope_datetime(self):
+        self.assertEqual(
+            dates.parse_date("2020/08/25 17:00:00.123 GMT+2"),
+            datetime.datetime(2020, 8, 25, 17, 0, 0, 123000, tzinfo=CEST),
+        )
+        self.assertEqual(
+            dates.parse_date("2020/08/25 17:00:00 GMT-5:30"),
+            datetime.datetime(
+                2020, 8, 25, 17, 0, tzinfo=datetime.timezone(-datetime.timedelta(hours=5, minutes=30))
+            ),
+        )
+        self.assertEqual(
+            dates.parse_date("2020/8/5 09:15 GMT"),
+            datetime.datetime(2020, 8, 5, 9, 15, tzinfo=UTC),
+        )
+        self.assertEqual(dates.parse_date("2020/08/25"), datetime.datetime(2020, 8, 25))
+
+    def test_fallback(self):
+        before = dates.stats()
+        self.assertEqual(dates.parse_date("25. August 2020"), datetime.datetime(2020, 8, 25))
+        # invalid dates in a strict format are handed over as well
+        self.assertIsNone(dates.parse_date("2020/02/30 GMT"))
+        self.assertIsNone(dates.parse_date("no date"))
+
+        after = dates.stats()
+        self.assertEqual(after["dateparser"] - before["dateparser"], 1)
+        self.assertEqual(after["failed"] - before["failed"], 2)
+
+    def test_stats(self):
+        before = dates.stats()
+        dates.parse_date("2020-08-25T17:00:00+02:00")
+        dates.parse_date("2020-08-25T17:00:00+02:00")
+        dates.parse_date("2020/08/25 17:00:00 GMT+2")
+
+        after = dates.stats()
+        self.assertEqual(after["iso"] - before["iso"], 1)
+        self.assertEqual(after["zope"] - before["zope"], 1)
+        self.assertEqual(after["hits"], 1)
+        self.assertEqual(after["misses"], 2)
+        self.assertEqual(after["cached"], 2)
+
+        with self.assertLogs("test_dates", level="INFO") as logs:
+            dates.report(logging.getLogger("test_dates"))
+        self.assertIn("Dates: 1 cache hits, 2 misses", logs.output[0])
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Tests for the streaming reader of collective.jsonify exports."""
+from collective.plone5migration.migration.export_reader import ExportReader
+from collective.plone5migration.migration.export_reader import open_stream
+from collective.plone5migration.migration.export_reader import zstandard
+
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+
+OBJECTS = {
+    "1.json": dict(_path="/plone/folder"),
+    "sub/2.json": dict(_path="/plone/folder/doc"),
+}
+
+
+def raw(name):
+    return json.dumps(OBJECTS[name]).encode("utf-8")
+
+
+class TestExportReader(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _tar(self, name, mode):
+        path = self._path(name)
+        with tarfile.open(path, mode) as tar:
+            for member_name in OBJECTS:
+                info = tarfile.TarInfo(member_name)
+                info.size = len(raw(member_name))
+                info.mtime = 1000
+                tar.addfile(info, io.BytesIO(raw(member_name)))
+            info = tarfile.TarInfo("README.txt")
+            tar.addfile(info, io.BytesIO(b""))
+        return path
+
+    def test_directory(self):
+        export = self._path("export")
+        for name in OBJECTS:
+            os.makedirs(os.path.dirname(os.path.join(export, name)), exist_ok=True)
+            with open(os.path.join(export, name), "wb") as fp:
+                fp.write(raw(name))
+        with open(os.path.join(export, "README.txt"), "w") as fp:
+            fp.write("no export")
+
+        reader = ExportReader(export)
+        entries = sorted(reader)
+        self.assertEqual(entries, sorted((os.path.join(export, name), None) for name in OBJECTS))
+        self.assertEqual(len(reader.seen), 2)
+
+        # unchanged files (same size and mtime) are skipped
+        reader = ExportReader(export, dict(reader.seen))
+        self.assertEqual(list(reader), [])
+        self.assertEqual((reader.unchanged, len(reader.seen)), (2, 2))
+
+    def test_tar(self):
+        for name, mode in (
+            ("export.tar", "w"),
+            ("export.tar.gz", "w:gz"),
+            ("export.tgz", "w:gz"),
+            ("export.tar.bz2", "w:bz2"),
+            ("export.tar.xz", "w:xz"),
+        ):
+            path = self._tar(name, mode)
+            reader = ExportReader(path)
+            self.assertEqual(
+                list(reader), [(f"{path}:{member}", raw(member)) for member in OBJECTS], name
+            )
+            self.assertEqual(reader.seen[f"{path}:1.json"], (len(raw("1.json")), 1000.0))
+
+            # members with the same size and mtime are skipped
+            imported = {f"{path}:1.json": reader.seen[f"{path}:1.json"] + ("sha256", "key")}
+            reader = ExportReader(path, imported)
+            self.assertEqual(list(reader), [(f"{path}:sub/2.json", raw("sub/2.json"))])
+            self.assertEqual(reader.unchanged, 1)
+
+    def test_zip(self):
+        path = self._path("export.zip")
+        with zipfile.ZipFile(path, "w") as archive:
+            for name in OBJECTS:
+                archive.writestr(name, raw(name))
+            archive.writestr("README.txt", "no export")
+
+        reader = ExportReader(path)
+        self.assertEqual(list(reader), [(f"{path}:{name}", raw(name)) for name in OBJECTS])
+        reader = ExportReader(path, dict(reader.seen))
+        self.assertEqual(list(reader), [])
+        self.assertEqual(reader.unchanged, 2)
+
+    def test_json_lines(self):
+        path = self._path("export.jsonl.gz")
+        with gzip.open(path, "wb") as fp:
+            fp.write(raw("1.json") + b"\n\n" + raw("sub/2.json") + b"\n")
+
+        reader = ExportReader(path)
+        entries = list(reader)
+        self.assertEqual(entries, [(f"{path}:1", raw("1.json")), (f"{path}:3", raw("sub/2.json"))])
+
+        # lines have no mtime: they are always read again
+        imported = dict((name, size + (None,)) for name, size in reader.seen.items())
+        reader = ExportReader(path, imported)
+        self.assertEqual(list(reader), entries)
+        self.assertEqual(reader.unchanged, 0)
+
+    def test_single_file(self):
+        for name, compress in (
+            ("object.json", lambda data: data),
+            ("object.json.gz", gzip.compress),
+            ("object.json.bz2", bz2.compress),
+            ("object.json.xz", lzma.compress),
+        ):
+            path = self._path(name)
+            with open(path, "wb") as fp:
+                fp.write(compress(raw("1.json")))
+            self.assertEqual(list(ExportReader(path)), [(path, raw("1.json"))], name)
+            with open_stream(path) as stream:
+                self.assertEqual(stream.read(), raw("1.json"))
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstandard(self):
+        path = self._path("export.jsonl.zst")
+        with open(path, "wb") as fp:
+            fp.write(zstandard.ZstdCompressor().compress(raw("1.json") + b"\n"))
+        self.assertEqual(list(ExportReader(path)), [(f"{path}:1", raw("1.json"))])
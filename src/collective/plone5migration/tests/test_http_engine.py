@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Tests for the asyncio based httpx transport."""
+from collective.plone5migration.migration.http_engine import AsyncHTTPEngine
+from requests.auth import HTTPBasicAuth
+
+import base64
+import unittest
+
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncHTTPEngine(unittest.TestCase):
+
+    def _engine(self, *responses, **kw):
+        """ Engine answering the requests with `responses` (status codes or
+            exceptions), the requests are collected in `self.requests`
+        """
+
+        self.requests = list()
+        responses = list(responses)
+
+        def handler(request):
+            self.requests.append(request)
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return httpx.Response(response, text="body")
+
+        engine = AsyncHTTPEngine(backoff_factor=0, transport=httpx.MockTransport(handler), **kw)
+        self.addCleanup(engine.close)
+        return engine
+
+    def test_request(self):
+        engine = self._engine(201)
+        hooked = list()
+        engine.hooks.append(hooked.append)
+
+        response = engine.post(
+            "http://plone/site", auth=HTTPBasicAuth("admin", "secret"), data='{"id": "doc"}'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(hooked, [response])
+        (request,) = self.requests
+        self.assertEqual(request.content, b'{"id": "doc"}')
+        self.assertEqual(
+            request.headers["Authorization"],
+            "Basic " + base64.b64encode(b"admin:secret").decode("ascii"),
+        )
+
+    def test_retry_status(self):
+        engine = self._engine(503, 502, 200)
+        hooked = list()
+        engine.hooks.append(hooked.append)
+
+        self.assertEqual(engine.post("http://plone/site").status_code, 200)
+        self.assertEqual(len(self.requests), 3)
+        # hooks see the final response only
+        self.assertEqual([response.status_code for response in hooked], [200])
+
+    def test_retries_exhausted(self):
+        engine = self._engine(503, 503, 503, retries=2)
+        self.assertEqual(engine.get("http://plone/site").status_code, 503)
+        self.assertEqual(len(self.requests), 3)
+
+        engine = self._engine(httpx.ReadError("failed"), httpx.ReadError("failed"), retries=1)
+        with self.assertRaises(httpx.ReadError):
+            engine.put("http://plone/site")
+
+    def test_patch_not_retried(self):
+        # same as the requests transport: PATCH (TUS chunks) is not idempotent
+        engine = self._engine(503, 204)
+        self.assertEqual(engine.patch("http://plone/site/@tus-upload/1").status_code, 503)
+        self.assertEqual(len(self.requests), 1)
+
+        engine = self._engine(httpx.ReadError("failed"), 204)
+        with self.assertRaises(httpx.ReadError):
+            engine.patch("http://plone/site/@tus-upload/1")
+        self.assertEqual(len(self.requests), 1)
+
+    def test_patch_connect_error(self):
+        # nothing has been sent: connection errors are always retried
+        engine = self._engine(httpx.ConnectError("refused"), 204)
+        self.assertEqual(engine.patch("http://plone/site/@tus-upload/1").status_code, 204)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_submit(self):
+        engine = self._engine(200, 200, 200)
+        futures = [engine.submit("GET", f"http://plone/site/{i}") for i in range(3)]
+        self.assertEqual([future.result().status_code for future in futures], [200] * 3)
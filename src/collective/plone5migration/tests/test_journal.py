@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Tests for the checkpoint journal of resumable migrations."""
+from collective.plone5migration.migration.journal import MigrationJournal
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestMigrationJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "journal.db")
+        self.journal = MigrationJournal(self.filename)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def test_phases(self):
+        self.assertFalse(self.journal.is_done("k1", "created"))
+        self.journal.mark("k1", "created", "folder/doc")
+        self.journal.mark("k1", "created", "folder/doc")
+        self.journal.mark("k2", "created")
+        self.journal.mark("k1", "metadata")
+
+        self.assertTrue(self.journal.is_done("k1", "created"))
+        self.assertTrue(self.journal.is_done("k1", "metadata"))
+        self.assertFalse(self.journal.is_done("k2", "metadata"))
+        self.assertEqual(self.journal.count("created"), 2)
+        self.assertEqual(self.journal.count("metadata"), 1)
+
+    def test_deferred(self):
+        self.journal.record("_deferred_default_pages", "k1", "index_html")
+        self.journal.record("_all_related_items", "uid1", ["uid2", "uid3"])
+        self.journal.record("_deferred_default_pages", "k1", "front-page")
+
+        self.assertEqual(
+            self.journal.load("_deferred_default_pages"), {"k1": "front-page"}
+        )
+        self.assertEqual(
+            self.journal.load("_all_related_items"), {"uid1": ["uid2", "uid3"]}
+        )
+        self.assertEqual(self.journal.load("_content_with_portlets"), {})
+
+    def test_resume(self):
+        self.journal.mark("k1", "created", "folder/doc")
+        self.journal.record("_content_with_portlets", "k1", "folder/doc")
+        self.journal.close()
+
+        self.journal = MigrationJournal(self.filename)
+        self.assertTrue(self.journal.is_done("k1", "created"))
+        self.assertEqual(
+            self.journal.load("_content_with_portlets"), {"k1": "folder/doc"}
+        )
+
+    def test_empty_and_reset(self):
+        self.assertTrue(self.journal.is_empty())
+        self.journal.record("_deferred_default_pages", "k1", "index_html")
+        self.assertFalse(self.journal.is_empty())
+        self.journal.mark("k1", "created")
+
+        self.journal.reset()
+        self.assertTrue(self.journal.is_empty())
+        self.assertFalse(self.journal.is_done("k1", "created"))
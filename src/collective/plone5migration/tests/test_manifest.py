@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Tests for the manifest of incremental imports."""
+from collective.plone5migration.migration.import_jsondump_into_arangodb import BatchImporter
+from collective.plone5migration.migration.import_jsondump_into_arangodb import document_key
+from collective.plone5migration.migration.import_jsondump_into_arangodb import load_document
+from collective.plone5migration.migration.manifest import ImportManifest
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestImportManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "manifest.db")
+        self.manifest = ImportManifest(self.filename)
+
+    def tearDown(self):
+        self.manifest.close()
+        shutil.rmtree(self.directory)
+
+    def test_update_and_remove(self):
+        self.assertEqual(self.manifest.load(), {})
+        self.manifest.update(
+            [("a.json", 10, 1.5, "sha-a", "key-a"), ("b.json", 20, 2.5, "sha-b", "key-b")]
+        )
+        self.manifest.update([("a.json", 11, 3.5, "sha-a2", "key-a")])
+
+        self.assertEqual(
+            self.manifest.load(),
+            {"a.json": (11, 3.5, "sha-a2", "key-a"), "b.json": (20, 2.5, "sha-b", "key-b")},
+        )
+        self.manifest.remove(["b.json", "unknown.json"])
+        self.assertEqual(list(self.manifest.load()), ["a.json"])
+
+    def test_persistence_and_reset(self):
+        self.manifest.update([("a.json", 10, 1.5, "sha-a", "key-a")])
+        self.manifest.close()
+
+        self.manifest = ImportManifest(self.filename)
+        self.assertEqual(self.manifest.load(), {"a.json": (10, 1.5, "sha-a", "key-a")})
+        self.manifest.reset()
+        self.assertEqual(self.manifest.load(), {})
+
+
+class TestLoadDocument(unittest.TestCase):
+
+    def test_load_document(self):
+        raw = json.dumps(dict(_path="/plone/folder/doc", _id="doc", _type="Document")).encode()
+        filename, document, size, digest, error = load_document(("doc.json", raw))
+
+        self.assertIsNone(error)
+        self.assertEqual(filename, "doc.json")
+        self.assertEqual(size, len(raw))
+        self.assertEqual(digest, hashlib.sha256(raw).hexdigest())
+        # the key only depends on the path (re-imports replace the document)
+        self.assertEqual(document["_key"], document_key("/plone/folder/doc"))
+        self.assertEqual(document["_json_filename"], "doc.json")
+
+    def test_invalid_document(self):
+        filename, document, size, digest, error = load_document(("bad.json", b"{"))
+        self.assertEqual((filename, document, size, digest), ("bad.json", None, 0, None))
+        self.assertTrue(error)
+
+
+class FakeCollection:
+    """ Collection recording the bulk imports and deletions """
+
+    def __init__(self, errors=0):
+        self.errors = errors
+        self.documents = dict()
+        self.deleted = list()
+
+    def import_bulk(self, documents, **kw):
+        for document in documents:
+            self.documents[document["_key"]] = document
+        return dict(created=len(documents) - self.errors, errors=self.errors, details=[])
+
+    def delete_many(self, documents):
+        self.deleted.extend(document["_key"] for document in documents)
+
+
+def loaded(filename, path, title="Doc"):
+    raw = json.dumps(dict(_path=path, _id=path.rsplit("/", 1)[-1], _type="Document", title=title))
+    return load_document((filename, raw.encode()))
+
+
+class TestBatchImporter(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = FakeCollection()
+        self.skeleton = FakeCollection()
+        unchanged = loaded("unchanged.json", "/plone/unchanged")
+        touched = loaded("touched.json", "/plone/touched")
+        changed = loaded("changed.json", "/plone/changed")
+        moved = loaded("moved.json", "/plone/old")
+        # name -> (size, mtime, sha256, _key) of the previous import
+        self.imported = dict(
+            (fn, (size, 1.0, digest, document["_key"]))
+            for fn, document, size, digest, _ in (unchanged, touched, changed, moved)
+        )
+        self.imported["removed.json"] = (10, 1.0, "sha", document_key("/plone/removed"))
+        self.imported["replaced.json"] = (10, 1.0, "sha", document_key("/plone/replaced"))
+        self.batch = [
+            # unchanged.json (same size and mtime) is skipped by the reader
+            touched,
+            loaded("changed.json", "/plone/changed", title="Changed"),
+            loaded("moved.json", "/plone/new"),
+            loaded("added.json", "/plone/added"),
+            # the object of replaced.json is now exported to another file
+            loaded("added2.json", "/plone/replaced"),
+            ("bad.json", None, 0, None, "Expecting value"),
+        ]
+        self.seen = dict((fn, (size, 2.0)) for fn, _, size, _, _ in self.batch)
+        self.seen["unchanged.json"] = self.imported["unchanged.json"][:2]
+        self.importer = BatchImporter(self.collection, self.skeleton, self.imported, self.seen)
+
+    def test_import_batch(self):
+        entries, errors = self.importer.import_batch(self.batch)
+
+        self.assertEqual(errors, 0)
+        importer = self.importer
+        self.assertEqual(
+            (importer.num_added, importer.num_changed, importer.num_unchanged),
+            (2, 2, 1),
+        )
+        self.assertEqual((importer.num_imported, importer.num_errors), (4, 1))
+        written = sorted(document["_path"] for document in self.collection.documents.values())
+        self.assertEqual(written, ["/plone/added", "/plone/changed", "/plone/new", "/plone/replaced"])
+        self.assertEqual(sorted(self.skeleton.documents), sorted(self.collection.documents))
+        # entries of all parsed files, the touched file keeps its _key
+        self.assertEqual(
+            [(entry[0], entry[1:3], entry[4]) for entry in entries],
+            [
+                ("touched.json", self.seen["touched.json"], document_key("/plone/touched")),
+                ("changed.json", self.seen["changed.json"], document_key("/plone/changed")),
+                ("moved.json", self.seen["moved.json"], document_key("/plone/new")),
+                ("added.json", self.seen["added.json"], document_key("/plone/added")),
+                ("added2.json", self.seen["added2.json"], document_key("/plone/replaced")),
+            ],
+        )
+        self.assertEqual(importer.stale_keys, {document_key("/plone/old")})
+
+    def test_remove(self):
+        self.importer.import_batch(self.batch)
+        removed = self.importer.remove(batch_size=1)
+
+        self.assertEqual(sorted(removed), ["removed.json", "replaced.json"])
+        # the object of replaced.json has just been written: it is kept
+        expected = sorted([document_key("/plone/old"), document_key("/plone/removed")])
+        self.assertEqual(self.collection.deleted, expected)
+        self.assertEqual(self.skeleton.deleted, expected)
+
+    def test_import_errors(self):
+        self.collection.errors = 1
+        batch = [loaded("added.json", "/plone/added")]
+        self.seen["added.json"] = (10, 2.0)
+        entries, errors = self.importer.import_batch(batch)
+
+        self.assertEqual((len(entries), errors), (1, 1))
+        self.assertEqual((self.importer.num_imported, self.importer.num_errors), (0, 1))
+
+        # nothing to write: no bulk import
+        self.collection.documents.clear()
+        unchanged = loaded("touched.json", "/plone/touched")
+        self.assertEqual(self.importer.import_batch([unchanged])[1], 0)
+        self.assertEqual(self.collection.documents, {})
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Tests for the metrics registry of the migration."""
+from collective.plone5migration.migration.metrics import Metric
+from collective.plone5migration.migration.metrics import MetricsRegistry
+from collective.plone5migration.migration.metrics import RESERVOIR_SIZE
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import urllib.request
+
+
+class TestMetric(unittest.TestCase):
+
+    def test_observe(self):
+        metric = Metric()
+        for i in range(1, 101):
+            metric.observe(i / 100, sent=10, received=20)
+
+        self.assertEqual(metric.count, 100)
+        self.assertEqual(metric.bytes_sent, 1000)
+        self.assertEqual(metric.bytes_received, 2000)
+        self.assertEqual(metric.percentiles(), {0.5: 0.51, 0.95: 0.96, 0.99: 1.0})
+        self.assertEqual(metric.as_dict()["p95"], 0.96)
+        self.assertEqual(metric.as_dict()["total"], 50.5)
+
+    def test_reservoir(self):
+        metric = Metric()
+        self.assertEqual(metric.percentiles(), {0.5: 0.0, 0.95: 0.0, 0.99: 0.0})
+        for i in range(RESERVOIR_SIZE * 2):
+            metric.observe(1.0)
+        self.assertEqual(metric.count, RESERVOIR_SIZE * 2)
+        self.assertEqual(len(metric.samples), RESERVOIR_SIZE)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.registry.observe("http", "@@bulk-create", 0.5, sent=100, received=10)
+        self.registry.observe("http", "@@bulk-create", 1.5)
+        self.registry.observe("type", 'Document "x"', 0.25)
+
+    def tearDown(self):
+        self.registry.stop()
+
+    def test_snapshot(self):
+        metrics = self.registry.snapshot()["metrics"]
+        self.assertEqual(sorted(metrics), ["http", "type"])
+        bulk = metrics["http"]["@@bulk-create"]
+        self.assertEqual((bulk["count"], bulk["total"]), (2, 2.0))
+        self.assertEqual((bulk["bytes_sent"], bulk["bytes_received"]), (100, 10))
+
+        self.registry.reset()
+        self.assertEqual(self.registry.snapshot()["metrics"], {})
+
+    def test_prometheus(self):
+        lines = self.registry.to_prometheus().splitlines()
+        self.assertIn("# TYPE plone5migration_http_seconds summary", lines)
+        self.assertIn('plone5migration_http_seconds_count{name="@@bulk-create"} 2', lines)
+        self.assertIn('plone5migration_http_bytes_sent_total{name="@@bulk-create"} 100', lines)
+        # label values are escaped
+        self.assertIn('plone5migration_type_seconds_sum{name="Document \\"x\\""} 0.25', lines)
+
+    def test_write_json(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "metrics.json")
+            self.registry.write_json(filename)
+            with open(filename) as fp:
+                data = json.load(fp)
+            self.assertEqual(data["metrics"]["http"]["@@bulk-create"]["count"], 2)
+            self.assertEqual(os.listdir(directory), ["metrics.json"])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_server(self):
+        self.registry.start_server(0)
+        port = self.registry._server.server_address[1]
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json") as response:
+            data = json.load(response)
+        self.assertEqual(data["metrics"]["type"]['Document "x"']["count"], 1)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            self.assertIn(b"plone5migration_http_seconds_count", response.read())
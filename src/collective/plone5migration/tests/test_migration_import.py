@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Tests for the Migrator against the in-memory ArangoDB stand-in."""
+from collective.plone5migration.migration.benchmark import _config
+from collective.plone5migration.migration.benchmark import BenchmarkMigrator
+from collective.plone5migration.migration.import_jsondump_into_arangodb import prepare_document
+from collective.plone5migration.migration.migration_import import get_parser
+from collective.plone5migration.migration.migration_import import Migrator
+from collective.plone5migration.migration.migration_import import to_iso8601
+from collective.plone5migration.migration.sources import ArangoSource
+from collective.plone5migration.migration.standins import InMemoryDatabase
+
+import argparse
+import base64
+import datetime
+import unittest
+
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+FILE_DATA = base64.b64encode(b"x" * 1000).decode("ascii")
+
+
+def export(path, portal_type, **kw):
+    data = dict(
+        _path=path,
+        _id=path.rsplit("/", 1)[-1],
+        _type=portal_type,
+        _uid=path.replace("/", "-"),
+        _gopip=0,
+        _owner="admin",
+        _layout=None,
+        _directly_provided=[],
+        _ac_local_roles={"admin": ["Owner"]},
+        _permissions={},
+        title=path,
+        **kw,
+    )
+    return prepare_document(data, f"{path}.json")
+
+
+class TestDocumentPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = [
+            export("/plone/folder", "Folder"),
+            export(
+                "/plone/folder/file",
+                "File",
+                _datafield_file=dict(
+                    data=FILE_DATA, content_type="text/plain", filename="file.txt"
+                ),
+            ),
+        ]
+        self.folder_key, self.file_key = [doc["_key"] for doc in self.documents]
+        args = get_parser().parse_args(["--config", "test", "--fetch-chunk-size", "1"])
+        self.migrator = BenchmarkMigrator(
+            _config("http://localhost:1", "/plone/folder"), args, self.documents
+        )
+
+    def tearDown(self):
+        self.migrator.close()
+
+    def test_prefetch_without_binary_data(self):
+        folder, file_, unknown = self.migrator._objects_by_keys(
+            [self.folder_key, self.file_key, "unknown"]
+        )
+
+        self.assertEqual(folder["_path"], "/plone/folder")
+        self.assertIsNone(unknown)
+        self.assertEqual(
+            file_["_datafield_file"], dict(content_type="text/plain", filename="file.txt")
+        )
+        # the documents of the source are unchanged
+        self.assertEqual(self.documents[1]["_datafield_file"]["data"], FILE_DATA)
+
+    def test_binary_field_fetched_per_object(self):
+        (file_,) = self.migrator._objects_by_keys([self.file_key])
+        field = self.migrator._binary_field(self.file_key, file_, "_datafield_file")
+        self.assertEqual(field["data"], FILE_DATA)
+        self.assertEqual(field["filename"], "file.txt")
+
+        # complete documents are used as they are
+        full = self.migrator.fetch(self.file_key)
+        self.assertIs(
+            self.migrator._binary_field(self.file_key, full, "_datafield_file"),
+            full["_datafield_file"],
+        )
+
+
+class FailingSession:
+    """ HTTP transport answering every request with an error """
+
+    def __init__(self):
+        self.requests = list()
+
+    def _respond(self, method, url, **kw):
+        self.requests.append((method, url))
+        return type("Response", (), dict(status_code=500, text="Internal Server Error"))()
+
+    def post(self, url, **kw):
+        return self._respond("POST", url, **kw)
+
+    def close(self):
+        pass
+
+
+class TestLargeUploads(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = [
+            export("/plone/folder", "Folder"),
+            export(
+                "/plone/folder/file",
+                "File",
+                _datafield_file=dict(
+                    data=FILE_DATA, content_type="text/plain", filename="file.txt"
+                ),
+            ),
+            export("/plone/folder/doc", "Document", text="text"),
+        ]
+        self.file_key = self.documents[1]["_key"]
+        args = get_parser().parse_args(["--config", "test", "--upload-threshold", "100"])
+        self.migrator = BenchmarkMigrator(
+            _config("http://localhost:1", "/plone/folder"), args, self.documents
+        )
+        self.migrator._http_engine = FailingSession()
+
+    def tearDown(self):
+        self.migrator.close()
+
+    def test_failed_creation_releases_upload(self):
+        with self.assertRaises(Exception):
+            self.migrator._create_object("folder/file", self.file_key)
+        self.assertEqual(self.migrator._pending_uploads, {})
+
+    def test_bulk_creation_continues_after_failed_upload(self):
+        items = [("folder/file", self.file_key), ("folder/doc", self.documents[2]["_key"])]
+        with self.assertLogs("migration.log", level="INFO") as logs:
+            self.migrator._create_objects_bulk(items)
+
+        self.assertEqual(self.migrator._pending_uploads, {})
+        self.assertTrue(any("MigrationError: folder/file" in line for line in logs.output))
+        # the document is still sent (@@bulk-create) after the failed file
+        self.assertTrue(self.migrator._http_engine.requests[-1][1].endswith("@@bulk-create"))
+
+
+class InMemoryMigrator(Migrator):
+    """ Migrator reading the documents passed as `args.documents` """
+
+    def _connect(self):
+        self.client = None
+        db = InMemoryDatabase({"portal": self.args.documents})
+        self.source = ArangoSource(db, "portal")
+
+
+class TestOtherCommandLines(unittest.TestCase):
+    """ check-images and fix-object-ordering-after-migration create a
+        Migrator from their own command line options
+    """
+
+    def setUp(self):
+        self.documents = [export("/plone/folder", "Folder")]
+
+    def _migrator(self, **options):
+        args = argparse.Namespace(documents=self.documents, **options)
+        migrator = InMemoryMigrator(_config("http://localhost:1", "/plone/folder"), args)
+        self.addCleanup(migrator.close)
+        return migrator
+
+    def test_check_images_options(self):
+        migrator = self._migrator(
+            config="migration.yml",
+            number_processes=1,
+            chunk_size=100,
+            verify=False,
+            blob_store=None,
+            verbose=False,
+        )
+        self.assertIsNone(migrator.journal)
+        self.assertFalse(migrator._resume_object("folder", self.documents[0]["_key"]))
+
+    def test_fix_object_ordering_options(self):
+        migrator = self._migrator(config="migration.yml")
+        result = migrator._query("positions_by_type", portal_type="Folder")
+        self.assertEqual(list(result), [dict(path="/plone/folder", position=0)])
+
+
+class TestEventDates(unittest.TestCase):
+
+    def setUp(self):
+        self.event = export(
+            "/plone/folder/event",
+            "Event",
+            startDate="2020/08/25 17:00:00 GMT+2",
+            endDate="2020/12/24 18:30:00 GMT+1",
+            eventUrl="",
+            contactEmail="",
+            contactName="",
+            contactPhone="",
+            text="text",
+        )
+        args = get_parser().parse_args(["--config", "test"])
+        self.migrator = BenchmarkMigrator(
+            _config("http://localhost:1", "/plone/folder"), args, [self.event]
+        )
+
+    def tearDown(self):
+        self.migrator.close()
+
+    def test_to_iso8601(self):
+        self.assertEqual(to_iso8601("2020/08/25 17:00:00 GMT+2"), "2020-08-25T17:00:00+02:00")
+        self.assertEqual(to_iso8601("2020-08-25T17:00:00+02:00"), "2020-08-25T17:00:00+02:00")
+
+    def test_event_start_end(self):
+        _, data, _ = self.migrator._prepare_object(
+            "folder/event", self.event["_key"]
+        )
+        start = datetime.datetime.fromisoformat(data["start"])
+        end = datetime.datetime.fromisoformat(data["end"])
+        self.assertEqual(
+            start.astimezone(datetime.timezone.utc),
+            datetime.datetime(2020, 8, 25, 15, 0, tzinfo=datetime.timezone.utc),
+        )
+        self.assertEqual(
+            end.astimezone(datetime.timezone.utc),
+            datetime.datetime(2020, 12, 24, 17, 30, tzinfo=datetime.timezone.utc),
+        )
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestHTTPEngineOptions(unittest.TestCase):
+
+    def _migrator(self, *options):
+        options = ["--config", "test", "--http-engine", "httpx"] + list(options)
+        migrator = BenchmarkMigrator(
+            _config("http://localhost:1", "/plone/folder"),
+            get_parser().parse_args(options),
+            [export("/plone/folder", "Folder")],
+        )
+        self.addCleanup(migrator.close)
+        return migrator
+
+    def test_workers_unchanged(self):
+        # the transport does not switch to the parallel migration
+        migrator = self._migrator()
+        self.assertEqual(migrator.args.workers, 1)
+        self.assertEqual(migrator.requests_session.concurrency, 1)
+
+        migrator = self._migrator("--workers", "4", "--concurrency", "2")
+        self.assertEqual(migrator.args.workers, 4)
+        self.assertEqual(migrator.requests_session.concurrency, 2)
+
+    def test_concurrency_exceeds_workers(self):
+        with self.assertLogs("migration.log", level="WARNING") as logs:
+            migrator = self._migrator("--concurrency", "8")
+        self.assertEqual(migrator.args.workers, 1)
+        self.assertIn("--concurrency 8 exceeds --workers 1", logs.output[0])
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Tests for @@bulk-create of the provisioning API."""
+from Acquisition import aq_base
+from Acquisition import aq_parent
+from Acquisition import Implicit
+from collective.plone5migration.browser import provisioning_api
+from collective.plone5migration.browser.provisioning_api import API
+from unittest import mock
+
+import contextlib
+import json
+import unittest
+
+
+class Content(Implicit):
+
+    def __init__(self, id_, container=None):
+        self.id = id_
+        self.container = container
+        self.reindexed = list()
+        self.security_reindexed = 0
+
+    def getPhysicalPath(self):
+        return ("", "plone", self.container, self.id)
+
+    def UID(self):
+        return f"uid-{self.id}"
+
+    def reindexObject(self, idxs=()):
+        self.reindexed.append(idxs)
+
+    def reindexObjectSecurity(self):
+        self.security_reindexed += 1
+
+
+class Response:
+
+    def setStatus(self, status):
+        self.status = status
+
+    def setHeader(self, name, value):
+        pass
+
+
+class Request:
+
+    def __init__(self, body=""):
+        self.BODY = body
+        self.response = Response()
+
+
+class Savepoint:
+    """ Restores the objects of all containers on rollback """
+
+    def __init__(self, containers):
+        self.containers = containers
+        self.state = dict((path, dict(objects)) for path, objects in containers.items())
+        self.rolled_back = False
+
+    def rollback(self):
+        self.rolled_back = True
+        for path, objects in self.state.items():
+            self.containers[path].clear()
+            self.containers[path].update(objects)
+
+
+class BulkCreateAPI(API):
+    """ API with containers (path -> objects) instead of a Plone site """
+
+    def __init__(self, containers, body):
+        super().__init__(Content("plone"), Request(json.dumps(body)))
+        self.containers = containers
+
+    def _lookup(self, path):
+        return path if path in self.containers else None
+
+    def _create_content(self, container, data):
+        obj = self.containers[container][data["id"]] = Content(data["id"], container)
+        if data.get("title") == "invalid":
+            # fails after the object has been added
+            raise ValueError("invalid title")
+        return obj
+
+    def _apply_uid(self, obj, uid):
+        raise ValueError(f"duplicate UID {uid}")
+
+
+class TestBulkCreate(unittest.TestCase):
+
+    def _bulk_create(self, containers, items):
+        savepoints = list()
+
+        def savepoint():
+            savepoints.append(Savepoint(containers))
+            return savepoints[-1]
+
+        api = BulkCreateAPI(containers, dict(items=items))
+        with mock.patch.object(provisioning_api.transaction, "savepoint", savepoint):
+            result = json.loads(api.bulk_create())
+        self.assertEqual(api.request.response.status, 200)
+        return result, savepoints
+
+    def test_failing_item_rolled_back(self):
+        containers = dict(folder=dict())
+        result, _ = self._bulk_create(
+            containers,
+            [
+                dict(container="folder", data={"@type": "Document", "id": "doc1"}),
+                dict(container="folder", data={"@type": "Document", "id": "doc2", "title": "invalid"}),
+                dict(container="missing", data={"@type": "Document", "id": "doc3"}),
+                dict(container="folder", data={"@type": "Document", "id": "doc4"}),
+            ],
+        )
+
+        self.assertEqual(sorted(containers["folder"]), ["doc1", "doc4"])
+        self.assertEqual(
+            [(item["index"], item["path"], item["uid"]) for item in result["created"]],
+            [(0, "/plone/folder/doc1", "uid-doc1"), (3, "/plone/folder/doc4", "uid-doc4")],
+        )
+        self.assertEqual(
+            [(error["index"], error["container"], error["id"]) for error in result["errors"]],
+            [(1, "folder", "doc2"), (2, "missing", "doc3")],
+        )
+        self.assertEqual(result["errors"][0]["error"], "ValueError: invalid title")
+        self.assertTrue(result["errors"][1]["error"].startswith("NotFound"))
+
+    def test_metadata_errors(self):
+        containers = dict(folder=dict())
+        result, savepoints = self._bulk_create(
+            containers,
+            [
+                dict(
+                    container="folder",
+                    data={"@type": "Document", "id": "doc"},
+                    metadata=dict(owner=[["acl_users"], "admin"], uid="abc", layout=""),
+                ),
+            ],
+        )
+
+        (created,) = result["created"]
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(created["metadata_errors"], {"uid": "ValueError: duplicate UID abc"})
+        # only the failed setting is rolled back, the object is kept
+        self.assertEqual([savepoint.rolled_back for savepoint in savepoints], [False, False, True])
+        obj = containers["folder"]["doc"]
+        self.assertEqual(obj._owner, [["acl_users"], "admin"])
+        self.assertEqual(obj.reindexed, [])
+        self.assertEqual(obj.security_reindexed, 1)
+
+
+class TestCreateContent(unittest.TestCase):
+
+    def test_acquisition_wrapped_deserialization(self):
+        container = Content("folder")
+        obj = Content("doc")
+        calls = list()
+
+        def deserializer(**kw):
+            wrapped = calls[-1]
+            # tools and vocabularies are acquired from the container
+            self.assertIs(aq_parent(wrapped), container)
+            calls.append(kw)
+
+        def query_multi_adapter(objects, interface):
+            calls.append(objects[0])
+            return deserializer
+
+        def add(container, obj, rename=True):
+            calls.append((obj, rename))
+            return obj
+
+        api = API(container, Request())
+        with contextlib.ExitStack() as stack:
+            for name, value in (
+                ("create", lambda *args, **kw: obj),
+                ("queryMultiAdapter", query_multi_adapter),
+                ("add", add),
+                ("notify", lambda event: None),
+            ):
+                stack.enter_context(mock.patch.object(provisioning_api, name, value))
+            api._create_content(container, {"@type": "Document", "id": "doc", "title": "Doc"})
+
+        wrapped, deserialized, (added, rename) = calls
+        self.assertIs(aq_base(wrapped), obj)
+        self.assertEqual(deserialized["data"], {"id": "doc", "title": "Doc"})
+        # the unwrapped object is added to the container
+        self.assertIs(added, obj)
+        self.assertIsNone(aq_parent(added))
+        self.assertFalse(rename)
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""Tests for the catalog of named AQL queries."""
+from collective.plone5migration.migration.import_jsondump_into_arangodb import prepare_document
+from collective.plone5migration.migration.queries import QUERIES
+from collective.plone5migration.migration.queries import QueryCatalog
+from collective.plone5migration.migration.queries import SKELETON_QUERIES
+from collective.plone5migration.migration.skeleton import SKELETON_INDEXES
+from collective.plone5migration.migration.skeleton import skeleton_entry
+
+import logging
+import os
+import unittest
+import uuid
+
+
+try:
+    import arango
+except ImportError:
+    arango = None
+
+# the AQL is executed by a real ArangoDB only (skipped without ARANGO_URL)
+ARANGO_URL = os.environ.get("ARANGO_URL")
+
+
+PATHS = [
+    ("/plone/folder", "Folder", 0),
+    ("/plone/folder/doc2", "Document", 1),
+    ("/plone/folder/doc1", "Document", 0),
+    ("/plone/folder/sub", "Folder", 2),
+    ("/plone/folder/sub/image", "Image", 0),
+    ("/plone/folder-archive", "Folder", 1),
+    ("/plone/folder-archive/doc", "Document", 0),
+    ("/plone/News", "Folder", 2),
+    ("/plone/News/event", "Event", 0),
+    ("/plone/news", "Folder", 3),
+    ("/plone/news/image", "Image", 0),
+]
+
+
+def documents():
+    result = list()
+    for path, portal_type, position in PATHS:
+        data = dict(
+            _path=path,
+            _id=path.rsplit("/", 1)[-1],
+            _type=portal_type,
+            _gopip=position,
+            title=path,
+        )
+        result.append(prepare_document(data, f"{path}.json"))
+    return result
+
+
+def paths(result):
+    return [row["path"] for row in result]
+
+
+class RecordingAQL:
+    """ Records the executed queries, returns no results """
+
+    def __init__(self):
+        self.calls = list()
+
+    def execute(self, query, bind_vars=None, cache=False, batch_size=None):
+        self.calls.append(dict(query=query, bind_vars=bind_vars, cache=cache, batch_size=batch_size))
+        return iter([])
+
+
+class RecordingDatabase:
+
+    def __init__(self):
+        self.aql = RecordingAQL()
+
+
+class TestQueryCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.db = RecordingDatabase()
+        self.queries = QueryCatalog(self.db, "portal", cache=True)
+
+    def test_bind_vars(self):
+        self.queries.execute("object_by_path", path="/plone/folder")
+        self.queries.execute("documents", batch_size=50, keys=["k1"], fields=["_path"])
+
+        first, second = self.db.aql.calls
+        self.assertEqual(first["query"], QUERIES["object_by_path"])
+        self.assertEqual(first["bind_vars"], {"path": "/plone/folder", "@collection": "portal"})
+        self.assertEqual((first["cache"], first["batch_size"]), (True, None))
+        self.assertEqual(second["query"], QUERIES["documents"])
+        self.assertEqual(
+            second["bind_vars"], {"keys": ["k1"], "fields": ["_path"], "@collection": "portal"}
+        )
+        self.assertEqual(second["batch_size"], 50)
+
+    def test_unknown_query(self):
+        with self.assertRaises(KeyError):
+            self.queries.execute("unknown")
+        self.assertEqual(self.db.aql.calls, [])
+        self.assertEqual(dict(self.queries.stats), {})
+
+    def test_stats(self):
+        self.queries.execute("object_by_path", path="/plone/folder")
+        self.queries.execute("object_by_path", path="/plone/folder/sub")
+        self.assertEqual(self.queries.stats["object_by_path"]["count"], 2)
+
+        with self.assertLogs("test_queries", level="INFO") as logs:
+            self.queries.report(logging.getLogger("test_queries"))
+        self.assertIn("AQL object_by_path: 2 calls", logs.output[0])
+
+
+@unittest.skipIf(arango is None or not ARANGO_URL, "ArangoDB is not available (ARANGO_URL)")
+class TestQueriesArangoDB(unittest.TestCase):
+    """ The AQL of `QUERIES` executed by the ArangoDB at ARANGO_URL
+        (ARANGO_DATABASE, ARANGO_USERNAME and ARANGO_PASSWORD are optional).
+        Every test uses its own temporary collections.
+    """
+
+    def setUp(self):
+        client = arango.ArangoClient(hosts=ARANGO_URL)
+        self.addCleanup(client.close)
+        self.db = client.db(
+            os.environ.get("ARANGO_DATABASE", "_system"),
+            username=os.environ.get("ARANGO_USERNAME", "root"),
+            password=os.environ.get("ARANGO_PASSWORD", ""),
+        )
+        self.collection_name = f"test_queries_{uuid.uuid4().hex}"
+        self.documents = documents()
+        self._create_collection(self.collection_name, self.documents)
+        self.queries = QueryCatalog(self.db, self.collection_name)
+
+    def _create_collection(self, name, entries):
+        collection = self.db.create_collection(name)
+        self.addCleanup(self.db.delete_collection, name)
+        collection.import_bulk(entries)
+        return collection
+
+    def test_object_by_path(self):
+        (stub,) = self.queries.execute("object_by_path", path="/plone/folder/sub")
+        self.assertEqual(stub["portal_type"], "Folder")
+        self.assertEqual(stub["id"], f'{self.collection_name}/{stub["_key"]}')
+
+    def test_subtree(self):
+        result = list(self.queries.execute("subtree", path="/plone/folder"))
+        self.assertEqual(
+            sorted(paths(result)),
+            [
+                "/plone/folder",
+                "/plone/folder/doc1",
+                "/plone/folder/doc2",
+                "/plone/folder/sub",
+                "/plone/folder/sub/image",
+            ],
+        )
+        parent_paths = dict((row["path"], row["parent_path"]) for row in result)
+        self.assertEqual(parent_paths["/plone/folder/sub/image"], "/plone/folder/sub")
+
+    def test_children_by_position(self):
+        result = list(self.queries.execute("children_by_position", path="/plone/folder/sub"))
+        self.assertEqual(paths(result), ["/plone/folder/sub/image"])
+
+        result = list(self.queries.execute("children_by_position", path="/plone/folder"))
+        positions = [row["position_in_parent"] for row in result]
+        self.assertEqual(positions, sorted(positions))
+        self.assertEqual(len(result), 4)
+        self.assertNotIn("/plone/folder", paths(result))
+
+    def test_positions(self):
+        result = self.queries.execute("positions_by_parent", parent_path="/plone/folder")
+        self.assertEqual(
+            sorted((row["position"], row["path"]) for row in result),
+            [(0, "/plone/folder/doc1"), (1, "/plone/folder/doc2"), (2, "/plone/folder/sub")],
+        )
+        result = self.queries.execute("positions_by_type", portal_type="Image")
+        self.assertEqual(
+            sorted((row["path"], row["position"]) for row in result),
+            [("/plone/folder/sub/image", 0), ("/plone/news/image", 0)],
+        )
+
+    def test_objects_by_type(self):
+        result = self.queries.execute("objects_by_type", portal_type="Document")
+        self.assertEqual(
+            sorted(paths(result)),
+            ["/plone/folder-archive/doc", "/plone/folder/doc1", "/plone/folder/doc2"],
+        )
+
+    def test_documents(self):
+        keys = [doc["_key"] for doc in self.documents]
+
+        (doc,) = self.queries.execute("document", key=keys[0], fields=["_key", "_type"])
+        self.assertEqual(doc, dict(_key=keys[0], _type="Folder"))
+        result = self.queries.execute("document", key="unknown", fields=["_key"])
+        self.assertEqual(list(result), [])
+
+        result = self.queries.execute("documents", keys=keys[:3] + ["unknown"], fields=["_path"])
+        self.assertEqual(list(result), [dict(_path=path) for path, _, _ in PATHS[:3]])
+
+    def test_documents_without_binaries(self):
+        key = self.documents[0]["_key"]
+        self.db[self.collection_name].update(
+            dict(_key=key, _datafield_file=dict(data="eHh4", filename="x.txt"), _datafield_x=None)
+        )
+
+        (doc,) = self.queries.execute("documents_without_binaries", keys=[key])
+        self.assertEqual(doc["_datafield_file"], dict(filename="x.txt"))
+        self.assertIsNone(doc["_datafield_x"])
+        self.assertEqual(doc["_path"], "/plone/folder")
+
+
+class TestSkeletonRouting(unittest.TestCase):
+
+    def setUp(self):
+        self.db = RecordingDatabase()
+        self.queries = QueryCatalog(self.db, "portal", skeleton_name="portal_skeleton")
+
+    def test_structural_queries(self):
+        self.queries.execute("subtree", path="/plone/folder")
+        self.queries.execute("positions_by_parent", parent_path="/plone")
+
+        subtree, positions = self.db.aql.calls
+        self.assertEqual(subtree["query"], SKELETON_QUERIES["subtree"])
+        self.assertEqual(
+            subtree["bind_vars"],
+            {"path": "/plone/folder", "@collection": "portal_skeleton", "documents": "portal"},
+        )
+        # `documents` is only bound if used by the query
+        self.assertEqual(
+            positions["bind_vars"], {"parent_path": "/plone", "@collection": "portal_skeleton"}
+        )
+
+    def test_document_queries(self):
+        self.queries.execute("document", key="k1", fields=["_path"])
+        (call,) = self.db.aql.calls
+        self.assertEqual(call["query"], QUERIES["document"])
+        self.assertEqual(call["bind_vars"]["@collection"], "portal")
+
+
+@unittest.skipIf(arango is None or not ARANGO_URL, "ArangoDB is not available (ARANGO_URL)")
+class TestSkeletonQueriesArangoDB(TestQueriesArangoDB):
+    """ The AQL of `SKELETON_QUERIES` executed by ArangoDB has the same
+        results as the corresponding `QUERIES`. ArangoDB compares strings
+        by ICU collation, so siblings like `/plone/folder-archive` and
+        `/plone/News` may fall into the `_tree_key` range of
+        `/plone/folder` and `/plone/news`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        skeleton = self._create_collection(
+            f"{self.collection_name}_skeleton",
+            [skeleton_entry(document) for document in self.documents],
+        )
+        for fields, unique in SKELETON_INDEXES:
+            skeleton.add_persistent_index(fields=fields, unique=unique)
+        self.document_queries = self.queries
+        self.queries = QueryCatalog(self.db, self.collection_name, skeleton_name=skeleton.name)
+
+    def test_same_results(self):
+        for name, bind_vars in (
+            ("object_by_path", dict(path="/plone/folder-archive")),
+            ("objects_by_type", dict(portal_type="Folder")),
+            ("positions_by_type", dict(portal_type="Document")),
+            ("positions_by_parent", dict(parent_path="/plone")),
+        ):
+            expected = self.document_queries.execute(name, **bind_vars)
+            result = self.queries.execute(name, **bind_vars)
+            self.assertEqual(
+                sorted(result, key=lambda row: row["path"]),
+                sorted(expected, key=lambda row: row["path"]),
+                name,
+            )
+
+    def test_siblings(self):
+        for name in ("subtree", "children_by_position"):
+            for path in ("/plone/folder", "/plone/news", "/plone/News", "/plone/folder/doc1"):
+                expected = list(self.document_queries.execute(name, path=path))
+                result = list(self.queries.execute(name, path=path))
+                self.assertEqual(
+                    sorted(paths(result)), sorted(paths(expected)), f"{name} {path}"
+                )
+
+        result = paths(self.queries.execute("subtree", path="/plone/folder"))
+        self.assertNotIn("/plone/folder-archive", result)
+        self.assertNotIn("/plone/folder-archive/doc", result)
+        result = paths(self.queries.execute("subtree", path="/plone/news"))
+        self.assertEqual(result, ["/plone/news", "/plone/news/image"])
+        result = paths(self.queries.execute("children_by_position", path="/plone/News"))
+        self.assertEqual(result, ["/plone/News/event"])
+
+    def test_subtree_order(self):
+        result = list(self.queries.execute("subtree", path="/plone/folder"))
+        # parents before children
+        self.assertEqual(paths(result)[0], "/plone/folder")
+        self.assertLess(
+            paths(result).index("/plone/folder/sub"), paths(result).index("/plone/folder/sub/image")
+        )
+        self.assertEqual(result[0]["depth"], 2)
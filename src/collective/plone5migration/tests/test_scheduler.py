@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Tests for the dependency-aware creation scheduler."""
+from collective.plone5migration.migration.scheduler import CreationScheduler
+
+import threading
+import unittest
+
+
+def item(path, position=0):
+    return dict(
+        path=path,
+        parent_path=path.rsplit("/", 1)[0],
+        position_in_parent=position,
+    )
+
+
+class TestCreationScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.created = list()
+        self.lock = threading.Lock()
+
+    def create(self, item):
+        with self.lock:
+            self.created.append(item["path"])
+
+    def test_parents_before_children(self):
+        items = [
+            item("/plone/a/b/c"),
+            item("/plone/a/b"),
+            item("/plone/x/y"),
+            item("/plone/a"),
+            item("/plone/x"),
+        ]
+        stats = CreationScheduler(self.create, workers=4).run(items)
+
+        self.assertEqual(stats["created"], 5)
+        self.assertEqual(sorted(self.created), sorted(i["path"] for i in items))
+        for path in self.created:
+            parent = path.rsplit("/", 1)[0]
+            if parent in self.created:
+                self.assertLess(self.created.index(parent), self.created.index(path))
+
+    def test_siblings_in_position_order(self):
+        items = [item(f"/plone/f/doc{i}", position=9 - i) for i in range(10)]
+        CreationScheduler(self.create, workers=4).run(items)
+        self.assertEqual(self.created, [f"/plone/f/doc{i}" for i in reversed(range(10))])
+
+    def test_failed_item_skips_subtree(self):
+        def create(item):
+            if item["path"] == "/plone/a":
+                raise ValueError("boom")
+            self.create(item)
+
+        items = [
+            item("/plone/a"),
+            item("/plone/a/b"),
+            item("/plone/a/b/c"),
+            item("/plone/d"),
+        ]
+        stats = CreationScheduler(create, workers=2).run(items)
+
+        self.assertEqual(self.created, ["/plone/d"])
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["skipped"], 2)
+
+    def test_empty(self):
+        stats = CreationScheduler(self.create).run([])
+        self.assertEqual(dict(stats), {})
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Tests for the request sinks of dry runs (--sink null|file)."""
+from collective.plone5migration.migration.sink import FileSink
+from collective.plone5migration.migration.sink import NullSink
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+
+SITE = "http://localhost:8080/plone"
+
+
+class TestNullSink(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = NullSink()
+
+    def _response(self, method, path, **kw):
+        return self.sink.request(method, SITE + path, **kw)
+
+    def test_responses(self):
+        for method, path, status_code, result in (
+            ("HEAD", "/folder/doc", 404, None),
+            ("GET", "/folder/doc/@@remote-exists", 404, None),
+            ("DELETE", "/folder/doc", 204, None),
+            ("GET", "/@vocabularies/plone.app.vocabularies.Keywords", 200, dict(items=[])),
+            ("GET", "/@@inventory", 200, dict(items=[], total=0, next=None)),
+            ("POST", "/@@recreate-plone-site", 201, None),
+            ("POST", "/folder/doc/@@apply-migration-metadata", 200, dict(errors={})),
+            ("POST", "/folder/@@prepare", 200, {}),
+            ("POST", "/folder/@@fixup", 200, {}),
+            ("POST", "/folder/doc/@workflow/publish", 200, {}),
+            ("POST", "/folder", 201, {"@id": SITE + "/folder"}),
+            ("PATCH", "/folder/doc", 204, None),
+            ("PUT", "/folder/doc", 204, None),
+        ):
+            response = self._response(method, path)
+            self.assertEqual(response.status_code, status_code, f"{method} {path}")
+            if result is None:
+                self.assertEqual(response.text, "", f"{method} {path}")
+            else:
+                self.assertEqual(response.json(), result, f"{method} {path}")
+
+    def test_tus_upload(self):
+        response = self._response("POST", "/folder/file/@tus-replace")
+        self.assertEqual(response.status_code, 201)
+        location = response.headers["Location"]
+        self.assertEqual(location, SITE + "/folder/file/@tus-replace/upload")
+        response = self.sink.patch(location, data=b"\x00\x01")
+        self.assertEqual(response.status_code, 204)
+
+    def test_bulk_create(self):
+        items = [dict(container="folder", data={"@type": "Document", "id": f"doc{i}"}) for i in range(3)]
+        response = self._response("POST", "/@@bulk-create", json=dict(items=items))
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["errors"], [])
+        self.assertEqual([item["index"] for item in result["created"]], [0, 1, 2])
+        self.assertEqual(result["created"][0], dict(index=0, path="", uid="", metadata_errors={}))
+
+    def test_request(self):
+        hooked = list()
+        self.sink.hooks["response"].append(hooked.append)
+
+        response = self.sink.get(SITE + "/@@inventory", params=dict(b_start=100))
+        self.assertEqual(hooked, [response])
+        self.assertEqual(response.request.method, "GET")
+        self.assertEqual(response.request.url, SITE + "/@@inventory?b_start=100")
+        self.assertEqual(response.request.body, b"")
+
+        response = self.sink.post(SITE + "/folder", data='{"title": "ä"}')
+        self.assertEqual(response.request.body, '{"title": "ä"}'.encode("utf-8"))
+        response = self.sink.post(SITE + "/folder", json=dict(id="doc"))
+        self.assertEqual(json.loads(response.request.body), dict(id="doc"))
+
+
+class TestFileSink(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, "requests.jsonl")
+
+    def test_file_format(self):
+        sink = FileSink(self.filename)
+        response = sink.post(SITE + "/folder", json={"@type": "Document", "id": "doc"})
+        self.assertEqual(response.status_code, 201)
+        sink.patch(SITE + "/folder/file/@tus-replace/upload", data=b"\x89PNG\x00" * 10)
+        sink.delete(SITE + "/folder/doc")
+        sink.close()
+
+        with open(self.filename) as fp:
+            lines = fp.read().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                dict(method="POST", url=SITE + "/folder", body={"@type": "Document", "id": "doc"}),
+                # binary data is recorded by size only
+                dict(method="PATCH", url=SITE + "/folder/file/@tus-replace/upload", body=dict(size=50)),
+                dict(method="DELETE", url=SITE + "/folder/doc", body=None),
+            ],
+        )
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Tests for the identification of binary data from its leading bytes."""
+from collective.plone5migration.migration.sniffing import HEADER_SIZE
+from collective.plone5migration.migration.sniffing import image_info
+from collective.plone5migration.migration.sniffing import mime_type
+from collective.plone5migration.migration.sniffing import PIL
+from collective.plone5migration.migration.sniffing import verify_image
+
+import io
+import os
+import threading
+import unittest
+
+
+def image(format, size=(40, 30)):
+    """ Noise image (incompressible) as bytes """
+    img = PIL.Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    data = io.BytesIO()
+    img.save(data, format=format)
+    return data.getvalue()
+
+
+class TestMimeType(unittest.TestCase):
+
+    def test_mime_type(self):
+        self.assertEqual(mime_type(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"), "application/pdf")
+        self.assertEqual(mime_type(b"plain text\n"), "text/plain")
+
+    @unittest.skipIf(PIL is None, "Pillow is not installed")
+    def test_header_only(self):
+        data = image("PNG", (400, 300))
+        self.assertGreater(len(data), 1024)
+        self.assertEqual(mime_type(data[:1024]), "image/png")
+
+    def test_threads(self):
+        results = []
+
+        def sniff():
+            results.append(mime_type(b"%PDF-1.4\n"))
+
+        threads = [threading.Thread(target=sniff) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["application/pdf"] * 4)
+
+
+@unittest.skipIf(PIL is None, "Pillow is not installed")
+class TestImageInfo(unittest.TestCase):
+
+    def test_image_info(self):
+        for format in ("PNG", "JPEG", "GIF"):
+            data = image(format)
+            info = image_info(data[:HEADER_SIZE])
+            self.assertEqual((info.format, info.width, info.height), (format, 40, 30))
+            self.assertEqual(repr(info), f"<ImageInfo {format} 40x30>")
+
+    def test_image_info_from_header(self):
+        # the dimensions are read from the header, the pixel data is not needed
+        data = image("PNG", (600, 400))
+        self.assertGreater(len(data), HEADER_SIZE)
+        info = image_info(data[:HEADER_SIZE])
+        self.assertEqual((info.width, info.height), (600, 400))
+
+    def test_verify_image(self):
+        data = image("PNG")
+        self.assertEqual(verify_image(data).format, "PNG")
+        with self.assertRaises(Exception):
+            verify_image(data[: len(data) // 2])
+        with self.assertRaises(OSError):
+            image_info(b"no image")
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Tests for the filesystem source reading a collective.jsonify export."""
+from collective.plone5migration.migration.import_jsondump_into_arangodb import document_key
+from collective.plone5migration.migration.import_jsondump_into_arangodb import prepare_document
+from collective.plone5migration.migration.queries import QueryCatalog
+from collective.plone5migration.migration.sources import FilesystemSource
+from collective.plone5migration.tests.test_queries import arango
+from collective.plone5migration.tests.test_queries import ARANGO_URL
+from collective.plone5migration.tests.test_queries import PATHS
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import uuid
+
+
+LOG = logging.getLogger("test_sources")
+
+
+def exported(path, portal_type, position, **kw):
+    data = dict(_path=path, _id=path.rsplit("/", 1)[-1], _type=portal_type, _gopip=position, title=path)
+    data.update(kw)
+    return data
+
+
+def paths(result):
+    return sorted(row["path"] for row in result)
+
+
+class FilesystemSourceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.export = os.path.join(self.directory, "export")
+        self.index = os.path.join(self.directory, "index.db")
+        for i, (path, portal_type, position) in enumerate(PATHS):
+            self._write(f"{i}.json", exported(path, portal_type, position))
+
+    def _write(self, name, data):
+        filename = os.path.join(self.export, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as fp:
+            json.dump(data, fp)
+
+    def _source(self):
+        source = FilesystemSource(self.export, self.index, log=LOG)
+        self.addCleanup(source.close)
+        return source
+
+
+class TestIndexUpdate(FilesystemSourceTestCase):
+
+    def test_incremental_update(self):
+        with self.assertLogs("test_sources", level="INFO") as logs:
+            self._source().close()
+        self.assertIn(f"{len(PATHS)} files indexed, 0 removed, 0 errors", logs.output[0])
+
+        # unchanged files are not read again
+        with self.assertLogs("test_sources", level="INFO") as logs:
+            self._source().close()
+        self.assertIn("0 files indexed, 0 removed, 0 errors", logs.output[0])
+
+        # changed, moved, added, removed and broken files
+        self._write("0.json", exported("/plone/folder", "Folder", 0, title="changed"))
+        self._write("2.json", exported("/plone/folder/sub/doc1", "Document", 0))
+        self._write("new.json", exported("/plone/folder/new", "Document", 5))
+        os.remove(os.path.join(self.export, "1.json"))
+        with open(os.path.join(self.export, "broken.json"), "w") as fp:
+            fp.write("{")
+
+        with self.assertLogs("test_sources", level="INFO") as logs:
+            source = self._source()
+        self.assertIn("Unable to parse", logs.output[0])
+        self.assertIn("3 files indexed, 1 removed, 1 errors", logs.output[-1])
+
+        (stub,) = source.query("object_by_path", path="/plone/folder")
+        self.assertEqual(stub["title"], "changed")
+        self.assertEqual(list(source.query("object_by_path", path="/plone/folder/doc2")), [])
+        self.assertEqual(list(source.query("object_by_path", path="/plone/folder/doc1")), [])
+        self.assertEqual(
+            paths(source.query("subtree", path="/plone/folder")),
+            [
+                "/plone/folder",
+                "/plone/folder/new",
+                "/plone/folder/sub",
+                "/plone/folder/sub/doc1",
+                "/plone/folder/sub/image",
+            ],
+        )
+        self.assertEqual(
+            paths(source.query("children_by_position", path="/plone/folder/sub")),
+            ["/plone/folder/sub/doc1", "/plone/folder/sub/image"],
+        )
+
+    def test_old_schema_rebuilt(self):
+        db = sqlite3.connect(self.index)
+        db.execute("CREATE TABLE documents (_key TEXT PRIMARY KEY, offset INTEGER)")
+        db.commit()
+        db.close()
+
+        source = self._source()
+        self.assertEqual(paths(source.query("subtree", path="/plone/news")), ["/plone/news", "/plone/news/image"])
+
+    def test_documents(self):
+        source = self._source()
+        key = document_key("/plone/folder/doc1")
+
+        document = source.get(key)
+        expected = prepare_document(exported("/plone/folder/doc1", "Document", 0), document["_json_filename"])
+        expected["_id"] = f"filesystem/{key}"
+        self.assertEqual(document, expected)
+        self.assertIsNone(source.get("unknown"))
+        self.assertEqual(
+            [doc["_path"] for doc in source.get_many([key, "unknown", document_key("/plone/folder")])],
+            ["/plone/folder/doc1", "/plone/folder"],
+        )
+        (doc,) = source.query("document", key=key, fields=["_path", "_type"])
+        self.assertEqual(doc, dict(_path="/plone/folder/doc1", _type="Document"))
+
+
+class TestStructuralQueries(FilesystemSourceTestCase):
+    """ Same results as the `QUERIES` of the ArangoDB source """
+
+    def setUp(self):
+        super().setUp()
+        self.source = self._source()
+
+    def test_subtree(self):
+        result = list(self.source.query("subtree", path="/plone/folder"))
+        self.assertEqual(
+            paths(result),
+            [
+                "/plone/folder",
+                "/plone/folder/doc1",
+                "/plone/folder/doc2",
+                "/plone/folder/sub",
+                "/plone/folder/sub/image",
+            ],
+        )
+        image = [row for row in result if row["path"] == "/plone/folder/sub/image"][0]
+        self.assertEqual(
+            image,
+            dict(
+                path="/plone/folder/sub/image",
+                parent_path="/plone/folder/sub",
+                portal_type="Image",
+                id=f'filesystem/{document_key("/plone/folder/sub/image")}',
+                title="/plone/folder/sub/image",
+                _key=document_key("/plone/folder/sub/image"),
+                position_in_parent=0,
+            ),
+        )
+        self.assertEqual(paths(self.source.query("subtree", path="/plone/News")), ["/plone/News", "/plone/News/event"])
+
+    def test_children_by_position(self):
+        result = list(self.source.query("children_by_position", path="/plone/folder"))
+        positions = [row["position_in_parent"] for row in result]
+        self.assertEqual(positions, sorted(positions))
+        self.assertEqual(
+            paths(result),
+            ["/plone/folder/doc1", "/plone/folder/doc2", "/plone/folder/sub", "/plone/folder/sub/image"],
+        )
+        self.assertNotIn("parent_path", result[0])
+        self.assertEqual(list(self.source.query("children_by_position", path="/plone/folder/doc1")), [])
+
+    def test_unknown_query(self):
+        with self.assertRaises(KeyError):
+            self.source.query("unknown")
+
+
+@unittest.skipIf(arango is None or not ARANGO_URL, "ArangoDB is not available (ARANGO_URL)")
+class TestQueriesParity(FilesystemSourceTestCase):
+    """ The filesystem source and the AQL of `QUERIES` executed by the
+        ArangoDB at ARANGO_URL return the same stubs (see test_queries.py)
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.source = self._source()
+        client = arango.ArangoClient(hosts=ARANGO_URL)
+        self.addCleanup(client.close)
+        db = client.db(
+            os.environ.get("ARANGO_DATABASE", "_system"),
+            username=os.environ.get("ARANGO_USERNAME", "root"),
+            password=os.environ.get("ARANGO_PASSWORD", ""),
+        )
+        name = f"test_sources_{uuid.uuid4().hex}"
+        collection = db.create_collection(name)
+        self.addCleanup(db.delete_collection, name)
+        documents = self.source.get_many(document_key(path) for path, _, _ in PATHS)
+        for document in documents:
+            del document["_id"]
+        collection.import_bulk(documents)
+        self.queries = QueryCatalog(db, name)
+
+    def _compare(self, name, **bind_vars):
+        def normalized(result):
+            # the ids name the collection of the source
+            rows = [dict(row, id=row["_key"]) if "id" in row else row for row in result]
+            return sorted(rows, key=lambda row: row["path"])
+
+        expected = list(self.queries.execute(name, **bind_vars))
+        result = list(self.source.query(name, **bind_vars))
+        self.assertEqual(normalized(result), normalized(expected), f"{name} {bind_vars}")
+        return result
+
+    def test_parity(self):
+        for path in ("/plone/folder", "/plone/folder/sub", "/plone/news", "/plone/News", "/plone/folder/doc1"):
+            self._compare("subtree", path=path)
+            result = self._compare("children_by_position", path=path)
+            positions = [row["position_in_parent"] for row in result]
+            self.assertEqual(positions, sorted(positions))
+            self._compare("object_by_path", path=path)
+        self._compare("objects_by_type", portal_type="Document")
+        self._compare("positions_by_parent", parent_path="/plone")
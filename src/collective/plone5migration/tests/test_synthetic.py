@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Tests for the generator of synthetic collective.jsonify exports."""
+from collective.plone5migration.migration.synthetic import export_filename
+from collective.plone5migration.migration.synthetic import ExportGenerator
+from collective.plone5migration.migration.synthetic import write_records
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+def generator(seed):
+    return ExportGenerator(300, seed=seed, depth=3, fanout=8, blob_median=512, text_size=200)
+
+
+class TestExportGenerator(unittest.TestCase):
+
+    def test_same_seed_same_export(self):
+        export = list(generator(1))
+        self.assertEqual(len(export), len(list(generator(1).structure())))
+        self.assertGreaterEqual(len(export), 300)
+        self.assertEqual(list(generator(1)), export)
+        self.assertNotEqual(list(generator(2)), export)
+
+    def test_content_independent_of_order(self):
+        # worker processes generate the content of their batches only
+        records = list(generator(1).structure())
+        expected = [generator(1).content(record) for record in records]
+        other = generator(1)
+        self.assertEqual([other.content(record) for record in reversed(records)], expected[::-1])
+
+    def test_written_files(self):
+        records = list(generator(1).structure())
+        middle = len(records) // 2
+        batches = [records[:middle], records[middle:]]
+        written = list()
+        # batches are written by the workers in any order
+        for order in (batches, batches[::-1]):
+            directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, directory)
+            for i in range(len(records) // 1000 + 1):
+                os.makedirs(os.path.join(directory, str(i)))
+            worker = generator(1)
+            for batch in order:
+                write_records(worker, directory, batch)
+            written.append(directory)
+
+        for record in records:
+            contents = list()
+            for directory in written:
+                with open(export_filename(directory, record["index"]), "rb") as fp:
+                    contents.append(fp.read())
+            self.assertEqual(contents[0], contents[1], record["index"])
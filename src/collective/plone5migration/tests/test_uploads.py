@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Tests for the helpers of chunked uploads."""
+from collective.plone5migration.migration.uploads import base64_length
+from collective.plone5migration.migration.uploads import iter_base64_chunks
+from collective.plone5migration.migration.uploads import tus_metadata
+
+import base64
+import unittest
+
+
+class TestUploads(unittest.TestCase):
+
+    def test_base64_length(self):
+        for size in (0, 1, 2, 3, 4, 100, 1001):
+            b64_data = base64.b64encode(b"x" * size).decode("ascii")
+            self.assertEqual(base64_length(b64_data), size)
+
+    def test_base64_length_with_line_breaks(self):
+        b64_data = base64.encodebytes(b"x" * 1000).decode("ascii")
+        self.assertIn("\n", b64_data)
+        self.assertEqual(base64_length(b64_data), 1000)
+        self.assertEqual(base64_length(b64_data.replace("\n", "\r\n")), 1000)
+
+    def test_iter_base64_chunks(self):
+        data = bytes(range(256)) * 40
+        b64_data = base64.b64encode(data).decode("ascii")
+        chunks = list(iter_base64_chunks(b64_data, 1000))
+
+        self.assertEqual(b"".join(chunks), data)
+        self.assertTrue(all(len(chunk) <= 1000 for chunk in chunks))
+        self.assertEqual(len(chunks), 11)
+
+    def test_iter_base64_chunks_with_line_breaks(self):
+        data = bytes(range(256)) * 10
+        b64_data = base64.encodebytes(data).decode("ascii")
+        self.assertEqual(b"".join(iter_base64_chunks(b64_data, 100)), data)
+        self.assertEqual(list(iter_base64_chunks("", 100)), [])
+
+    def test_tus_metadata(self):
+        self.assertEqual(
+            tus_metadata(filename="ä.txt", content_type="text/plain"),
+            "filename w6QudHh0,content_type dGV4dC9wbGFpbg==",
+        )